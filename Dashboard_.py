@@ -1,15 +1,11 @@
 import streamlit as st
 import hashlib
+import time
 from pathlib import Path
 from datetime import datetime
 
-# Supabase client helpers (from your supabase_client.py)
-
-from gsheet_client import (
-    list_activities_for_user,
-    list_all_activities,
-    delete_activity,
-)
+# Storage helpers are imported after the login gate below, so the login
+# screen paints without loading the sheet client.
 
 # --- Function to hash passwords (kept as-is) ---
 def hash_password(password):
@@ -46,6 +42,20 @@ if not st.session_state.authenticated:
 
     st.stop()  # Prevent rest of dashboard until logged in
 
+from gsheet_client import (
+    query_activities,
+    delete_activity,
+    get_aggregate_counts,
+    rebuild_aggregates,
+    breaker_status,
+    replica_status,
+    view_max_age,
+    search_activities,
+    catalog_duplicates,
+    data_quality_report,
+)
+from form_options import SEKTOR_OPTIONS, STATUS_OPTIONS
+
 # --- ✅ Sidebar / Logout (kept as-is) ---
 st.sidebar.markdown(f"👤 **Logged in as:** {st.session_state.username}")
 st.sidebar.markdown(f"🛡️ **Role:** {st.session_state.role}")
@@ -56,62 +66,145 @@ if st.sidebar.button("🚪 Logout"):
 
 st.set_page_config(page_title="Activity Dashboard", page_icon="📋", layout="wide")
 
-# === Fetch activities from Supabase ===
-# For non-verifier: list user's own activities
-# For verifier: show submitted activities (you can change to show all if you add list_all in supabase_client)
+st.title("📋 Activity Dashboard")
+st.markdown("View and manage your saved or submitted activities below.")
+
+api = breaker_status()
+if api["state"] != "closed":
+    st.warning("⚠️ Koneksi ke Google Sheets sedang terganggu: data ditampilkan dari cache dan simpanan diantrekan.")
+
+# === Summary header (precomputed counters, no sheet scan) ===
 if st.session_state.role == "verifier":
-    activities = list_all_activities()
-else:
-    activities = list_activities_for_user(st.session_state.user_id)
+    counts = get_aggregate_counts()
+    by_status = counts.get("status", {})
+    cols = st.columns(len(STATUS_OPTIONS) + 1)
+    cols[0].metric("Total", sum(by_status.values()))
+    for col, status_name in zip(cols[1:], STATUS_OPTIONS):
+        col.metric(status_name.replace("_", " ").title(), by_status.get(status_name, 0))
 
-# st.write("DEBUG - Raw activities from Supabase:", activities)
+    with st.expander("📊 Statistik per sektor / tahun / owner", expanded=False):
+        s1, s2, s3 = st.columns(3)
+        for col, dim, label in [(s1, "sektor", "Sektor"), (s2, "tahun", "Tahun"), (s3, "owner", "Owner")]:
+            with col:
+                rows = sorted(counts.get(dim, {}).items(), key=lambda kv: -kv[1])
+                st.dataframe(
+                    [{label: value or "-", "Jumlah": n} for value, n in rows],
+                    hide_index=True,
+                    use_container_width=True,
+                )
+        if st.button("🔄 Hitung ulang statistik"):
+            rebuild_aggregates()
+            st.rerun()
 
-# Normalize entries into the shape your UI expects (fallbacks for older/local JSON)
-form_list = []
-for row in activities:
-    data = row.get("data") or {}
+    with st.expander("🧬 Variabel / indikator dengan ejaan berbeda", expanded=False):
+        dup_kind = st.radio("Jenis", ["variabel", "indikator"], horizontal=True, key="dash_dup_kind")
+        # the expander body runs on every rerun, so the report is opt-in
+        if st.toggle("Tampilkan kelompok", key="dash_dup_show"):
+            groups = catalog_duplicates(dup_kind)
+            st.caption(f"{len(groups)} kelompok nama yang hampir sama")
+            st.dataframe(
+                [
+                    {
+                        "Nama": " / ".join(sorted(g["names"], key=lambda n: -g["names"][n])),
+                        "Kegiatan": len({e["activity_id"] for e in g["entries"]}),
+                        "Entri": len(g["entries"]),
+                    }
+                    for g in groups
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
 
-    activity_id = (
-        row.get("activity_id")
-        or row.get("id")
-        or data.get("activity_id")
-    )
+    with st.expander("🧪 Laporan kualitas data", expanded=False):
+        dq_statuses = st.multiselect("Status", STATUS_OPTIONS, default=["submitted"], key="dash_dq_status")
+        # reads the whole sheet, so opt-in like the groups above
+        if st.toggle("Jalankan pemeriksaan", key="dash_dq_show"):
+            dq = data_quality_report(dq_statuses or None)
+            bad = sum(1 for a in dq["activities"] if a["errors"])
+            st.caption(f"{dq['checked']} kegiatan diperiksa, {bad} dengan error, {len(dq['activities']) - bad} hanya peringatan")
+            st.dataframe(
+                [{"Rule": r["message"], "Tingkat": r["severity"], "Jumlah": r["count"]} for r in dq["rules"]],
+                hide_index=True,
+                use_container_width=True,
+            )
+            st.dataframe(
+                [
+                    {
+                        "Judul": a["judul"] or "-",
+                        "Owner": a["user_id"],
+                        "Status": a["status"],
+                        "Error": a["errors"],
+                        "Peringatan": a["warnings"],
+                        "Masalah": "; ".join(p["message"] for p in a["problems"]),
+                    }
+                    for a in dq["activities"]
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
 
-    owner = (
-        row.get("user_id")
-        or data.get("owner")
-        or "unknown"
+    sync = replica_status()
+    if sync and sync["lag"] is not None:
+        st.caption(f"🗄️ Replika lokal: {sync['rows']} kegiatan, sinkron terakhir {sync['lag']:.0f} detik lalu")
+    st.caption(
+        f"🔌 Google API: {api['state']} · gagal {api['failures']} · timeout {api['timeouts']} "
+        f"· ditolak {api['short_circuited']} dari {api['calls']} panggilan"
     )
 
-    status = (
-        row.get("status")
-        or data.get("status")
-        or "draft"
-    ).title()
+# === Query one page of activities ===
+# Filtering, sorting and paging happen in gsheet_client.query_activities;
+# only the visible page is turned into widgets.
+PAGE_SIZE = 20
+st.session_state.setdefault("dash_page", 0)
 
-    title = (
-        data.get("halaman_awal", {}).get("judul")
-        or data.get("judul")
-        or f"Activity {activity_id}"
-    )
+def reset_page():
+    st.session_state.dash_page = 0
 
-    last_saved = (
-        data.get("last_saved")
-        or row.get("updated_at")
-        or "Unknown"
-    )
+f1, f2, f3, f4, f5 = st.columns([0.2, 0.3, 0.12, 0.2, 0.18])
+with f1:
+    status_filter = st.selectbox("Status", ["(semua)"] + STATUS_OPTIONS, key="dash_status", on_change=reset_page)
+with f2:
+    sektor_filter = st.selectbox("Sektor", ["(semua)"] + SEKTOR_OPTIONS, key="dash_sektor", on_change=reset_page)
+with f3:
+    tahun_filter = st.text_input("Tahun", key="dash_tahun", on_change=reset_page)
+with f4:
+    if st.session_state.role == "verifier":
+        owner_filter = st.text_input("Owner", key="dash_owner", on_change=reset_page)
+    else:
+        owner_filter = st.session_state.user_id
+with f5:
+    newest_first = st.toggle("Terbaru dulu", value=True, key="dash_sort")
+
+page_items, total = query_activities(
+    user_id=owner_filter or None,
+    status=None if status_filter == "(semua)" else status_filter,
+    sektor=None if sektor_filter == "(semua)" else sektor_filter,
+    tahun=tahun_filter.strip() or None,
+    sort_by="last_saved",
+    descending=newest_first,
+    page=st.session_state.dash_page,
+    page_size=PAGE_SIZE,
+    max_age=view_max_age("dashboard"),
+)
+
+if not page_items and st.session_state.dash_page > 0:
+    # e.g. the last item of the last page was deleted
+    st.session_state.dash_page = max((total - 1) // PAGE_SIZE, 0)
+    st.rerun()
+
+# Normalize entries into the shape your UI expects
+form_list = []
+for row in page_items:
+    activity_id = row.get("activity_id")
 
     form_list.append({
         "activity_id": activity_id,
-        "owner": owner,
-        "status": status,
-        "title": title,
-        "last_saved": last_saved,
-        "raw": row,
+        "owner": row.get("user_id") or "unknown",
+        "status": (row.get("status") or "draft").title(),
+        "title": row.get("judul") or f"Activity {activity_id}",
+        "last_saved": row.get("last_saved") or "Unknown",
     })
 
-# st.write("RAW ACTIVITIES:", activities)
-
 # UI helpers
 def status_color(status):
     if status.lower() == "draft":
@@ -125,12 +218,41 @@ def status_color(status):
     else:
         return "❓"
 
-st.title("📋 Activity Dashboard")
-st.markdown("View and manage your saved or submitted activities below.")
+# === Full-text search (judul, latar belakang, variabel, indikator) ===
+SEARCH_KIND_LABELS = {"variabel": "Variabel", "indikator": "Indikator"}
+
+search_query = st.text_input(
+    "🔎 Cari kegiatan, variabel atau indikator",
+    key="dash_search",
+    placeholder="mis. pengeluaran rumah tangga",
+)
+if search_query.strip():
+    started = time.perf_counter()
+    hits = search_activities(
+        search_query,
+        user_id=None if st.session_state.role == "verifier" else st.session_state.user_id,
+        limit=30,
+    )
+    st.caption(f"{len(hits)} hasil · {(time.perf_counter() - started) * 1000:.0f} ms")
+    for idx, hit in enumerate(hits):
+        c1, c2 = st.columns([0.85, 0.15])
+        with c1:
+            line = f"{status_color(hit['status'] or '')} **{hit['judul'] or 'Untitled'}**"
+            if hit["kind"] in SEARCH_KIND_LABELS:
+                line += f" — {SEARCH_KIND_LABELS[hit['kind']]}: {hit['label'] or '-'}"
+            st.markdown(line)
+        with c2:
+            if st.button("✏️ Edit", key=f"search_edit_{idx}"):
+                st.session_state.edit_activity_id = hit["activity_id"]
+                st.switch_page("pages/1_Form_Page_.py")
+    st.markdown("---")
 
 if not form_list:
     st.info("No activities yet. Click **New Activity** below to start.")
 else:
+    page_count = (total - 1) // PAGE_SIZE + 1
+    st.caption(f"{total} activities · page {st.session_state.dash_page + 1} of {page_count}")
+
     for idx, item in enumerate(form_list):
         activity_title = item.get("title", "(Untitled Activity)")
         status = item.get("status", "Draft")
@@ -161,6 +283,16 @@ else:
                             st.error("Failed to delete activity.")
                         st.rerun()
 
+    p1, p2, _ = st.columns([0.15, 0.15, 0.7])
+    with p1:
+        if st.button("⬅️ Prev", disabled=st.session_state.dash_page == 0):
+            st.session_state.dash_page -= 1
+            st.rerun()
+    with p2:
+        if st.button("Next ➡️", disabled=st.session_state.dash_page >= page_count - 1):
+            st.session_state.dash_page += 1
+            st.rerun()
+
 st.markdown("---")
 
 if st.button("➕ New Activity"):
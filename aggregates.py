@@ -0,0 +1,290 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import datetime
+import logging
+
+import local_store
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("aggregates")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# `dims` remembers the last counted values of every activity, so a write
+# only has to say what changed: the old value is decremented and the new
+# one incremented in the same transaction, without reading the sheet.
+# `times` keeps the sort keys of every activity, so the Dashboard query
+# can filter, sort and page here and read only the rows of one page.
+DB_NAME = "aggregates.sqlite3"
+DIMENSIONS = ("status", "sektor", "tahun", "owner")
+SORT_FIELDS = ("last_saved", "updated_at")
+STORE_VERSION = "2"         # a store rebuilt by an older version is rebuilt again
+
+# sort_by -> expression; last_saved falls back to updated_at like the summaries
+SORT_COLUMNS = {
+    "last_saved": "COALESCE(t.last_saved, t.updated_at, '')",
+    "updated_at": "COALESCE(t.updated_at, '')",
+    "sektor": "d.sektor",
+    "tahun": "d.tahun",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dims (
+    activity_id TEXT PRIMARY KEY,
+    status TEXT, sektor TEXT, tahun TEXT, owner TEXT
+);
+CREATE TABLE IF NOT EXISTS counters (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+);
+CREATE INDEX IF NOT EXISTS idx_dims_status ON dims (status, owner);
+CREATE TABLE IF NOT EXISTS times (
+    activity_id TEXT PRIMARY KEY,
+    last_saved TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _connect():
+    return local_store.connect(DB_NAME, SCHEMA)
+
+
+def _bump(conn, dimension: str, value: str, delta: int) -> None:
+    conn.execute(
+        "INSERT INTO counters (dimension, value, n) VALUES (?, ?, ?) "
+        "ON CONFLICT (dimension, value) DO UPDATE SET n = n + excluded.n",
+        (dimension, value, delta),
+    )
+
+
+def _normalize(values: Dict[str, Any]) -> Dict[str, str]:
+    return {d: "" if values.get(d) is None else str(values[d]) for d in DIMENSIONS if d in values}
+
+
+def _ts(value: Any) -> Optional[str]:
+    # last_saved "YYYY-MM-DD HH:MM:SS" (form) and updated_at ISO "...T..."
+    # are stored in one format, so they compare in time order
+    if value is None or not str(value).strip():
+        return None
+    try:
+        ts = datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ts.isoformat(sep=" ")
+
+
+def _put_times(conn, activity_id: str, values: Dict[str, Any]) -> None:
+    times = {f: _ts(values[f]) for f in SORT_FIELDS if f in values}
+    if not times:
+        return
+    conn.execute(
+        "INSERT INTO times (activity_id, last_saved, updated_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (activity_id) DO UPDATE SET "
+        "last_saved = COALESCE(excluded.last_saved, last_saved), "
+        "updated_at = COALESCE(excluded.updated_at, updated_at)",
+        (activity_id, times.get("last_saved"), times.get("updated_at")),
+    )
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def record(activity_id: str, changes: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Perbarui penghitung untuk satu kegiatan. `changes` hanya berisi dimensi
+    yang berubah (plus SORT_FIELDS, yang tidak dihitung); `defaults`
+    dipakai bila kegiatan belum pernah tercatat. Kegiatan yang belum
+    tercatat dan tidak diketahui owner-nya dilewati.
+    """
+    times = {f: changes[f] for f in SORT_FIELDS if f in changes}
+    changes = _normalize(changes)
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        old = conn.execute("SELECT * FROM dims WHERE activity_id = ?", (activity_id,)).fetchone()
+
+        if old is None and "owner" not in changes and not (defaults or {}).get("owner"):
+            # status-only change of an activity never counted here: the next
+            # rebuild or reconcile brings it in with its owner and sector
+            conn.execute("ROLLBACK")
+            return
+        if old is None:
+            new = {d: "" for d in DIMENSIONS}
+            new.update(_normalize(defaults or {}))
+            new.update(changes)
+            for d in DIMENSIONS:
+                _bump(conn, d, new[d], 1)
+        else:
+            new = {d: old[d] for d in DIMENSIONS}
+            new.update(changes)
+            for d in DIMENSIONS:
+                if old[d] != new[d]:
+                    _bump(conn, d, old[d], -1)
+                    _bump(conn, d, new[d], 1)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO dims (activity_id, status, sektor, tahun, owner) VALUES (?, ?, ?, ?, ?)",
+            (activity_id, new["status"], new["sektor"], new["tahun"], new["owner"]),
+        )
+        _put_times(conn, activity_id, times)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def remove(activity_id: str) -> None:
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        old = conn.execute("SELECT * FROM dims WHERE activity_id = ?", (activity_id,)).fetchone()
+        if old is not None:
+            for d in DIMENSIONS:
+                _bump(conn, d, old[d], -1)
+            conn.execute("DELETE FROM dims WHERE activity_id = ?", (activity_id,))
+        conn.execute("DELETE FROM times WHERE activity_id = ?", (activity_id,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def counts() -> Dict[str, Dict[str, int]]:
+    """{dimension: {value: jumlah}}, tanpa membaca sheet."""
+    conn = _connect()
+    try:
+        out: Dict[str, Dict[str, int]] = {d: {} for d in DIMENSIONS}
+        for row in conn.execute("SELECT dimension, value, n FROM counters WHERE n > 0"):
+            out[row["dimension"]][row["value"]] = row["n"]
+        return out
+    finally:
+        conn.close()
+
+
+def heads() -> Dict[str, Tuple[str, str]]:
+    """activity_id -> (status, owner) untuk semua kegiatan yang tercatat."""
+    conn = _connect()
+    try:
+        return {r["activity_id"]: (r["status"], r["owner"]) for r in conn.execute("SELECT activity_id, status, owner FROM dims")}
+    finally:
+        conn.close()
+
+
+def query(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    sektor: Optional[str] = None,
+    tahun: Optional[str] = None,
+    sort_by: str = "last_saved",
+    descending: bool = True,
+    page: int = 0,
+    page_size: int = 20,
+) -> Optional[Tuple[List[str], int]]:
+    """
+    (activity_id satu halaman, jumlah yang lolos filter), difilter dan
+    diurutkan di sini. None bila `sort_by` tidak didukung.
+    """
+    order = SORT_COLUMNS.get(sort_by)
+    if order is None:
+        return None
+
+    clauses, params = [], []
+    for column, value in (("owner", user_id), ("status", status), ("sektor", sektor), ("tahun", tahun)):
+        if value:
+            clauses.append(f"d.{column} = ?")
+            params.append(str(value))
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    direction = "DESC" if descending else "ASC"
+
+    conn = _connect()
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM dims d{where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT d.activity_id FROM dims d LEFT JOIN times t ON t.activity_id = d.activity_id{where} "
+            f"ORDER BY {order} {direction}, d.activity_id {direction} LIMIT ? OFFSET ?",
+            (*params, page_size, max(page, 0) * page_size),
+        ).fetchall()
+        return [r["activity_id"] for r in rows], total
+    finally:
+        conn.close()
+
+
+def last_rebuilt() -> Optional[str]:
+    """Waktu rebuild penuh terakhir; None berarti penghitung belum pernah dibangun (oleh versi ini)."""
+    conn = _connect()
+    try:
+        version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if not version or version["value"] != STORE_VERSION:
+            return None
+        row = conn.execute("SELECT value FROM meta WHERE key = 'rebuilt_at'").fetchone()
+        return row["value"] if row else None
+    finally:
+        conn.close()
+
+
+def rebuild(summaries: Iterable[Dict[str, Any]]) -> int:
+    """Hitung ulang semuanya dari ringkasan kegiatan (memperbaiki drift)."""
+    summaries = [s for s in summaries if s.get("activity_id")]
+    rows = [
+        (
+            s["activity_id"],
+            s.get("status") or "",
+            s.get("sektor") or "",
+            "" if s.get("tahun") is None else str(s["tahun"]),
+            s.get("user_id") or "",
+        )
+        for s in summaries
+    ]
+
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM dims")
+        conn.execute("DELETE FROM counters")
+        conn.execute("DELETE FROM times")
+        conn.executemany(
+            "INSERT OR REPLACE INTO dims (activity_id, status, sektor, tahun, owner) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO times (activity_id, last_saved, updated_at) VALUES (?, ?, ?)",
+            [(s["activity_id"], _ts(s.get("last_saved")), _ts(s.get("updated_at"))) for s in summaries],
+        )
+        for d in DIMENSIONS:
+            conn.execute(
+                f"INSERT INTO counters (dimension, value, n) "
+                f"SELECT ?, {d}, COUNT(*) FROM dims GROUP BY {d}",
+                (d,),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('rebuilt_at', ?), ('version', ?)",
+            (datetime.datetime.utcnow().isoformat(), STORE_VERSION),
+        )
+        conn.execute("COMMIT")
+        logger.info(f"aggregates rebuilt from {len(rows)} activities")
+        return len(rows)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
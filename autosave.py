@@ -0,0 +1,238 @@
+from typing import Any, Dict, List
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gsheet_client import SECTIONS, make_json_safe, save_activity
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("autosave")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Settings
+# -------------------------------------------------
+DEBOUNCE_SECONDS = 3.0      # quiet period before a write is issued
+MAX_INFLIGHT_WRITES = 2     # concurrent sheet writes per process
+SETTLED_TTL_SECONDS = 600.0 # a state with nothing left to write is dropped this long after its final flush
+
+# One shared pool: its size is the in-flight cap for the whole process,
+# extra flushes simply wait in the executor queue.
+_executor = ThreadPoolExecutor(max_workers=MAX_INFLIGHT_WRITES, thread_name_prefix="autosave")
+_lock = threading.Lock()
+_states: Dict[str, Dict[str, Any]] = {}
+
+
+# -------------------------------------------------
+# Helpers
+# -------------------------------------------------
+def _digest(value) -> str:
+    raw = json.dumps(make_json_safe(value), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def section_digests(entry: Dict[str, Any]) -> Dict[str, str]:
+    return {sec: _digest(entry.get(sec)) for sec in SECTIONS}
+
+
+def _new_state(activity_id: str) -> Dict[str, Any]:
+    return {
+        "activity_id": activity_id,
+        "user_id": None,
+        "digests": {},          # digests of the last payload handed to the saver
+        "payload": None,        # latest payload waiting for a write
+        "dirty": set(),         # sections changed since the last write started
+        "timer": None,
+        "inflight": False,
+        "status": "idle",       # idle | pending | saving | saved | queued | error
+        "last_saved_at": None,
+        "error": None,
+        "writes": 0,
+        "coalesced": 0,
+        "settled_at": None,     # set when the final flush finished and nothing is pending
+    }
+
+
+def _settle(state: Dict[str, Any]) -> None:
+    # caller holds _lock
+    idle = state["payload"] is None and not state["inflight"] and state["timer"] is None
+    state["settled_at"] = time.time() if idle else None
+
+
+def _evict_settled() -> None:
+    # caller holds _lock; closed sessions never come back for their state
+    cutoff = time.time() - SETTLED_TTL_SECONDS
+    for activity_id in [a for a, s in _states.items() if s["settled_at"] is not None and s["settled_at"] < cutoff]:
+        del _states[activity_id]
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def prime(activity_id: str, entry: Dict[str, Any]) -> None:
+    """Catat isi yang sudah tersimpan sebagai titik awal (tidak dianggap dirty)."""
+    with _lock:
+        _evict_settled()
+        if activity_id in _states:
+            return
+        state = _new_state(activity_id)
+        state["digests"] = section_digests(entry or {})
+        _settle(state)
+        _states[activity_id] = state
+
+
+def schedule_save(activity_id: str, user_id: str, entry: Dict[str, Any]) -> List[str]:
+    """
+    Daftarkan isi form terbaru. Hanya section yang berubah yang memicu
+    penyimpanan; perubahan beruntun dalam jendela debounce digabung
+    menjadi satu tulisan.
+    """
+    digests = section_digests(entry)
+
+    with _lock:
+        _evict_settled()
+        state = _states.setdefault(activity_id, _new_state(activity_id))
+        changed = [sec for sec in SECTIONS if state["digests"].get(sec) != digests[sec]]
+        if not changed:
+            return []
+
+        if state["payload"] is not None:
+            state["coalesced"] += 1
+
+        state["user_id"] = user_id
+        state["payload"] = make_json_safe(entry)
+        state["digests"] = digests
+        state["dirty"].update(changed)
+        state["status"] = "pending"
+        state["error"] = None
+        _arm_timer(state)
+        _settle(state)
+
+    return changed
+
+
+def mark_saved(activity_id: str, entry: Dict[str, Any]) -> None:
+    """
+    Dipanggil setelah simpan manual: section yang ada di `entry` sudah
+    tersimpan dan tidak dikirim lagi. Autosave yang tertunda dibatalkan
+    bila tidak ada section lain yang masih dirty.
+    """
+    saved = [sec for sec in SECTIONS if sec in entry]
+    with _lock:
+        _evict_settled()
+        state = _states.setdefault(activity_id, _new_state(activity_id))
+        state["digests"].update({sec: _digest(entry[sec]) for sec in saved})
+        state["dirty"].difference_update(saved)
+        if not state["dirty"]:
+            if state["timer"]:
+                state["timer"].cancel()
+                state["timer"] = None
+            state["payload"] = None
+        state["status"] = "pending" if state["payload"] is not None else "saved"
+        state["last_saved_at"] = time.time()
+        _settle(state)
+
+
+def get_status(activity_id: str) -> Dict[str, Any]:
+    with _lock:
+        state = _states.get(activity_id)
+        if not state:
+            return {"status": "idle", "last_saved_at": None, "pending_sections": [], "error": None}
+        return {
+            "status": state["status"],
+            "last_saved_at": state["last_saved_at"],
+            "pending_sections": sorted(state["dirty"]),
+            "error": state["error"],
+            "writes": state["writes"],
+            "coalesced": state["coalesced"],
+        }
+
+
+# -------------------------------------------------
+# Internals
+# -------------------------------------------------
+def _arm_timer(state: Dict[str, Any]) -> None:
+    # caller holds _lock
+    if state["timer"]:
+        state["timer"].cancel()
+    timer = threading.Timer(DEBOUNCE_SECONDS, _flush, args=(state["activity_id"],))
+    timer.daemon = True
+    state["timer"] = timer
+    timer.start()
+
+
+def _flush(activity_id: str) -> None:
+    with _lock:
+        state = _states.get(activity_id)
+        if not state:
+            return
+        state["timer"] = None
+
+        if state["payload"] is None:
+            _settle(state)
+            return
+        if state["inflight"]:
+            # _write re-arms once the running write for this activity finishes
+            return
+
+        payload = state["payload"]
+        sections = sorted(state["dirty"])
+        user_id = state["user_id"]
+        state["payload"] = None
+        state["dirty"] = set()
+        state["inflight"] = True
+        state["status"] = "saving"
+
+    _executor.submit(_write, activity_id, user_id, payload, sections)
+
+
+def _write(activity_id: str, user_id: str, payload: Dict[str, Any], sections: List[str]) -> None:
+    try:
+        # only the dirty sections travel; untouched columns are not rewritten.
+        # status=None keeps the row's workflow status: autosave runs without
+        # a user action and must not send a submitted / verified row back to draft
+        outcome, _ = save_activity(
+            activity_id=activity_id,
+            user_id=user_id,
+            sections={sec: payload[sec] for sec in sections if sec in payload},
+            meta={k: v for k, v in payload.items() if k not in SECTIONS},
+            status=None,
+            merge=False,
+        )
+    except Exception:
+        logger.exception("autosave write failed")
+        outcome = "failed"
+    ok = outcome == "committed"
+    queued = outcome == "pending"
+
+    with _lock:
+        state = _states[activity_id]
+        state["inflight"] = False
+        state["writes"] += 1
+
+        if ok:
+            state["last_saved_at"] = time.time()
+            state["status"] = "pending" if state["payload"] is not None else "saved"
+            logger.info(f"autosave activity_id={activity_id} sections={sections}")
+        elif queued:
+            # safe in the local journal; the flusher sends it when the sheet is back
+            state["status"] = "pending" if state["payload"] is not None else "queued"
+        else:
+            # forget the digests so the next rerun sees these sections as dirty again
+            state["error"] = "Gagal menyimpan otomatis"
+            state["status"] = "error"
+            for sec in sections:
+                state["digests"][sec] = None
+
+        if state["payload"] is not None and state["timer"] is None:
+            _arm_timer(state)
+        _settle(state)
@@ -0,0 +1,102 @@
+"""
+Cold start benchmark.
+
+Measures, each in a fresh interpreter so nothing is cached in sys.modules:
+  * import time of the page-facing modules (gsheet_client, form_options)
+    and whether gspread / google-auth were pulled in at import;
+  * time to first paint of the login screen in Dashboard_.py, using
+    Streamlit's AppTest runner with dummy secrets (no sheet access).
+
+Usage:
+    python bench_cold_start.py [--runs 5] [--output bench_output.txt]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+HEAVY_MODULES = ["gspread", "google.oauth2.service_account"]
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import gsheet_client, form_options
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy_loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+_PAINT_PROBE = """
+import json, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("Dashboard_.py", default_timeout=60)
+at.secrets["users"] = {}
+at.secrets["roles"] = {}
+at.run()
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "seconds": elapsed,
+    "title": [t.value for t in at.title],
+    "exception": [e.value for e in at.exception],
+}))
+"""
+
+
+def _probe(code: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or f"probe exited with {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _summary(samples) -> str:
+    ms = [s * 1000 for s in samples]
+    return (f"median={statistics.median(ms):.1f}ms  min={min(ms):.1f}ms  "
+            f"max={max(ms):.1f}ms  (n={len(ms)})")
+
+
+def run(runs: int):
+    lines = []
+
+    imports = [_probe(_IMPORT_PROBE % (HEAVY_MODULES,)) for _ in range(runs)]
+    lines.append("import gsheet_client + form_options: " + _summary([r["seconds"] for r in imports]))
+    heavy = sorted({m for r in imports for m in r["heavy_loaded"]})
+    lines.append("  heavy modules loaded at import: " + (", ".join(heavy) if heavy else "none"))
+
+    try:
+        paints = [_probe(_PAINT_PROBE) for _ in range(runs)]
+    except RuntimeError as e:
+        lines.append(f"login first paint: skipped ({str(e).splitlines()[-1]})")
+    else:
+        lines.append("login first paint (AppTest): " + _summary([r["seconds"] for r in paints]))
+        last = paints[-1]
+        lines.append(f"  title={last['title']} exceptions={len(last['exception'])}")
+
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    lines = run(args.runs)
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
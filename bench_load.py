@@ -0,0 +1,512 @@
+"""
+Multi-session load test.
+
+Drives N simulated browser sessions through Streamlit's AppTest runner,
+all in this process, against an in-memory fake of the Google Sheet, and
+reports for each concurrency level:
+  * latency percentiles of a rerun (one AppTest run = one user action),
+    overall and per action;
+  * throughput (reruns and finished sessions per second);
+  * memory growth per live session (process RSS);
+  * storage calls, in total and per action (the per-action table comes
+    from one editor and one verifier session run alone, so every call is
+    attributed to the action that made it).
+
+Editors log in, open the Dashboard, fill Halaman Awal, add variables and
+an indicator, save everything and submit. Verifiers log in, open the
+Verification page, open a submitted activity and accept it. Every fake
+API call sleeps --api-latency ms, so the breaker's worker pool, the
+single-flight reads and the list caches are exercised as they are in
+production. The first level whose p95 exceeds --slo is reported as the
+point to scale out (more processes / hosts).
+
+Usage:
+    python bench_load.py [--sessions 1,5,10,20] [--iterations 2] [--verifiers 0.2]
+                         [--seed 200] [--api-latency 200] [--slo 1.0] [--output bench_load.txt]
+"""
+import argparse
+import gc
+import hashlib
+import json
+import math
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+DASHBOARD = "Dashboard_.py"
+FORM_PAGE = "pages/1_Form_Page_.py"
+VERIFICATION_PAGE = "pages/2_Verification_.py"
+
+PASSWORD = "beban"
+READ_METHODS = {"get", "get_all_values", "batch_get", "row_values", "col_values", "worksheet"}
+
+
+# -------------------------------------------------
+# Fake storage backend
+# -------------------------------------------------
+def _col_index(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - ord("A") + 1
+    return n - 1
+
+
+def _col_letters(index: int) -> str:
+    out = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        out = chr(ord("A") + rem) + out
+    return out
+
+
+class FakeWorksheet:
+    """The part of gspread.Worksheet that gsheet_client uses, kept in memory."""
+
+    def __init__(self, book, title):
+        self.book = book
+        self.title = title
+        self.rows = []
+
+    # --- ranges ---
+    def _cell(self, ref):
+        match = re.fullmatch(r"([A-Z]+)(\d*)", ref)
+        return (int(match.group(2)) if match.group(2) else None), _col_index(match.group(1))
+
+    def _range(self, rng):
+        start, _, end = rng.split("!")[-1].partition(":")
+        r1, c1 = self._cell(start)
+        r2, c2 = self._cell(end) if end else (r1, c1)
+        return r1 or 1, c1, r2, c2
+
+    def _grow(self, n_rows, n_cols):
+        while len(self.rows) < n_rows:
+            self.rows.append([])
+        for row in self.rows:
+            row.extend([""] * (n_cols - len(row)))
+
+    # --- reads ---
+    def get_all_values(self):
+        self.book.tick("get_all_values")
+        with self.book.lock:
+            width = max([len(r) for r in self.rows] + [0])
+            return [r + [""] * (width - len(r)) for r in self.rows]
+
+    def get(self, rng):
+        self.book.tick("get")
+        return self._get(rng)
+
+    def _get(self, rng):
+        r1, c1, r2, c2 = self._range(rng)
+        with self.book.lock:
+            out = []
+            for row in self.rows[r1 - 1:r2 or len(self.rows)]:
+                values = row[c1:c2 + 1]
+                while values and values[-1] == "":
+                    values.pop()
+                out.append(values)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def batch_get(self, ranges):
+        self.book.tick("batch_get")
+        return [self._get(rng) for rng in ranges]
+
+    def row_values(self, index):
+        self.book.tick("row_values")
+        with self.book.lock:
+            values = list(self.rows[index - 1]) if index <= len(self.rows) else []
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def col_values(self, index):
+        self.book.tick("col_values")
+        with self.book.lock:
+            return [r[index - 1] if len(r) >= index else "" for r in self.rows]
+
+    # --- writes ---
+    def update(self, rng, values=None, **kwargs):
+        self.book.tick("update")
+        self._update(rng, values)
+
+    def _update(self, rng, values):
+        if values is None:
+            rng, values = "A1", rng
+        if isinstance(values, str):
+            values = [[values]]
+        r1, c1, _, _ = self._range(rng)
+        with self.book.lock:
+            for i, row in enumerate(values):
+                self._grow(r1 + i, c1 + len(row))
+                self.rows[r1 + i - 1][c1:c1 + len(row)] = list(row)
+
+    def batch_update(self, data, **kwargs):
+        self.book.tick("batch_update")
+        for item in data:
+            self._update(item["range"], item["values"])
+
+    def append_row(self, row, **kwargs):
+        self.book.tick("append_row")
+        with self.book.lock:
+            self.rows.append(list(row))
+            n = len(self.rows)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{n}:{_col_letters(len(row) - 1)}{n}"}}
+
+    def append_rows(self, rows, **kwargs):
+        self.book.tick("append_rows")
+        with self.book.lock:
+            first = len(self.rows) + 1
+            self.rows.extend(list(r) for r in rows)
+            last = len(self.rows)
+        width = max([len(r) for r in rows] + [1])
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:{_col_letters(width - 1)}{last}"}}
+
+    def delete_rows(self, index, end_index=None):
+        self.book.tick("delete_rows")
+        with self.book.lock:
+            del self.rows[index - 1:(end_index or index)]
+
+    def insert_rows(self, values, row=1, **kwargs):
+        self.book.tick("insert_rows")
+        with self.book.lock:
+            self.rows[row - 1:row - 1] = [list(r) for r in values]
+
+    def clear(self):
+        self.book.tick("clear")
+        with self.book.lock:
+            self.rows = []
+
+
+class FakeSpreadsheet:
+    """In-memory spreadsheet; every call is counted and delayed by `latency` seconds."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.sheets = {}
+        self.calls = Counter()
+
+    def tick(self, method):
+        with self.lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def split_calls(self):
+        with self.lock:
+            reads = sum(n for m, n in self.calls.items() if m in READ_METHODS)
+            return reads, sum(self.calls.values()) - reads
+
+    def worksheet(self, title):
+        import gspread
+
+        self.tick("worksheet")
+        with self.lock:
+            if title not in self.sheets:
+                raise gspread.exceptions.WorksheetNotFound(title)
+            return self.sheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.tick("add_worksheet")
+        with self.lock:
+            return self.sheets.setdefault(title, FakeWorksheet(self, title))
+
+
+def _install_backend(latency: float, seed: int) -> FakeSpreadsheet:
+    """Point gsheet_client at a fresh fake spreadsheet holding `seed` submitted activities."""
+    import aggregates
+    import gsheet_client as g
+    from form_options import SEKTOR_OPTIONS
+
+    book = FakeSpreadsheet()
+    main = book.add_worksheet(g.WORKSHEET_NAME)
+    main.rows.append(list(g.COLUMNS))
+    for i in range(seed):
+        activity_id = f"seed-{i:05d}"
+        owner = f"legacy{i % 25}"
+        payload = {
+            "activity_id": activity_id,
+            "owner": owner,
+            "halaman_awal": {
+                "judul": f"Survei Contoh {i}",
+                "tahun": 2020 + i % 6,
+                "sektor": SEKTOR_OPTIONS[i % len(SEKTOR_OPTIONS)],
+                "cara_pengumpulan": "Survei",
+            },
+            "variables": [{"name": f"Variabel {j}", "concept": "", "definition": "", "reference": ""} for j in range(5)],
+            "indicators": [],
+        }
+        root, sections = g._split_payload(payload)
+        main.rows.append(
+            [activity_id, owner, "submitted", g._dumps(root), g._now()]
+            + [g._dumps(sections[sec]) if sec in sections else "" for sec in g.SECTIONS]
+        )
+        aggregates.record(activity_id, {"status": "submitted", "owner": owner, **g._halaman_awal_dims(sections)})
+
+    book.calls.clear()
+    book.latency = latency
+    g._open_spreadsheet = lambda: g._Guarded(book)
+    return book
+
+
+# -------------------------------------------------
+# Simulated sessions
+# -------------------------------------------------
+class Recorder:
+    def __init__(self, book: FakeSpreadsheet):
+        self.book = book
+        self.lock = threading.Lock()
+        self.samples = []          # (action, seconds, ok)
+        self.calls = defaultdict(list)
+        self.sessions = 0
+
+    def act(self, action, fn):
+        """Run one user action (one rerun); raise when the page errored so the session stops."""
+        calls_before = self.book.total_calls()
+        started = time.perf_counter()
+        at = fn()
+        elapsed = time.perf_counter() - started
+        ok = not at.exception
+        with self.lock:
+            self.samples.append((action, elapsed, ok))
+            self.calls[action].append(self.book.total_calls() - calls_before)
+        if not ok:
+            raise RuntimeError(f"{action}: {at.exception[0].value}")
+        return at
+
+
+def _find(widgets, label=None, key=None, key_prefix=None):
+    for widget in widgets:
+        if label is not None and widget.label == label:
+            return widget
+        if key is not None and widget.key == key:
+            return widget
+        if key_prefix is not None and (widget.key or "").startswith(key_prefix):
+            return widget
+    return None
+
+
+def _new_session(users, roles, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / DASHBOARD), default_timeout=timeout)
+    at.secrets["users"] = users
+    at.secrets["roles"] = roles
+    return at
+
+
+def _login(rec, at, username):
+    rec.act("login_page", at.run)
+    _find(at.text_input, label="Username").input(username)
+    _find(at.text_input, label="Password").input(PASSWORD)
+    # Login reruns straight into the Dashboard
+    rec.act("login_dashboard", _find(at.button, label="Login").click().run)
+
+
+def editor_session(rec, at, username, n_variables=3):
+    _login(rec, at, username)
+    rec.act("open_form", lambda: at.switch_page(FORM_PAGE).run())
+
+    at.text_input(key="judul").input(f"Survei Beban {username} {time.time():.0f}")
+    at.number_input(key="tahun").set_value(2025)
+    rec.act("save_halaman_awal", _find(at.button, label="💾 Simpan Halaman Awal").click().run)
+
+    for i in range(n_variables):
+        rec.act("add_variable", _find(at.button, label="➕ Tambah Variabel").click().run)
+        at.text_input(key=f"var_name_{i}").input(f"Variabel {i}")
+        at.text_input(key=f"var_concept_{i}").input(f"Konsep variabel {i}")
+
+    rec.act("add_indicator", _find(at.button, label="➕ Tambah Indikator").click().run)
+    at.text_input(key="ind_nama_0").input("Indikator Beban")
+
+    rec.act("save_all", _find(at.button, label="💾 Simpan Semua Progress").click().run)
+    rec.act("submit", _find(at.button, label="📤 Submit").click().run)
+    rec.act("back_to_dashboard", lambda: at.switch_page(DASHBOARD).run())
+
+
+def verifier_session(rec, at, username):
+    _login(rec, at, username)
+    rec.act("open_verification", lambda: at.switch_page(VERIFICATION_PAGE).run())
+
+    open_button = next((b for b in at.button if (b.key or "").startswith("open_") and "Open" in b.label), None)
+    if open_button is None:
+        return      # queue empty or every item claimed by another verifier
+    rec.act("open_item", open_button.click().run)
+
+    accept = _find(at.button, key_prefix="accept_")
+    if accept is not None:
+        rec.act("accept", accept.click().run)
+
+
+# -------------------------------------------------
+# Runner
+# -------------------------------------------------
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    # nearest rank
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def _rss_mib():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # peak, not current
+
+
+def run_level(book, n_sessions, n_verifiers, iterations, timeout):
+    names = [f"verifier{i}" for i in range(n_verifiers)] + [f"editor{i}" for i in range(n_sessions - n_verifiers)]
+    hashed = hashlib.sha256(PASSWORD.encode()).hexdigest()   # same hash as Dashboard_.hash_password
+    users = {name: hashed for name in names}
+    roles = {name: "verifier" for name in names if name.startswith("verifier")}
+
+    rec = Recorder(book)
+    live = {}       # the last AppTest of each simulated user, kept for the memory reading
+    errors = []
+
+    def worker(name):
+        for _ in range(iterations):
+            at = _new_session(users, roles, timeout)
+            live[name] = at
+            try:
+                if name.startswith("verifier"):
+                    verifier_session(rec, at, name)
+                else:
+                    editor_session(rec, at, name)
+                with rec.lock:
+                    rec.sessions += 1
+            except Exception as e:
+                errors.append(f"{name}: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+
+    gc.collect()
+    rss_before = _rss_mib()
+    reads_before, writes_before = book.split_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_sessions) as pool:
+        list(pool.map(worker, names))
+    wall = time.perf_counter() - started
+    gc.collect()
+    rss_after = _rss_mib()
+    reads, writes = book.split_calls()
+
+    return {
+        "rec": rec,
+        "wall": wall,
+        "errors": errors,
+        "memory_per_session": max(0.0, rss_after - rss_before) / max(1, len(live)),
+        "reads": reads - reads_before,
+        "writes": writes - writes_before,
+    }
+
+
+def _latency_line(seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    return (f"p50={_percentile(ms, 50):.0f}ms  p90={_percentile(ms, 90):.0f}ms  "
+            f"p95={_percentile(ms, 95):.0f}ms  p99={_percentile(ms, 99):.0f}ms  max={ms[-1]:.0f}ms")
+
+
+def run(levels, iterations, verifier_share, seed, latency, slo, timeout):
+    import breaker
+
+    book = _install_backend(latency, seed)
+    lines = [f"fake sheet: {seed} seeded activities, {latency * 1000:.0f}ms per API call"]
+
+    # per-action storage calls: one editor, then one verifier, each alone
+    lines.append("")
+    lines.append("storage calls per action (single session):")
+    for n_verifiers in (0, 1):
+        solo = run_level(book, 1, n_verifiers, 1, timeout)
+        for action, counts in solo["rec"].calls.items():
+            lines.append(f"  {action:<20} {statistics.mean(counts):5.1f}")
+        lines.extend(f"  ! {e}" for e in solo["errors"])
+
+    summary = []
+    for n in levels:
+        n_verifiers = min(n - 1, round(n * verifier_share)) if n > 1 else 0
+        result = run_level(book, n, n_verifiers, iterations, timeout)
+        rec = result["rec"]
+        seconds = [s for _, s, _ in rec.samples]
+        failed = sum(1 for _, _, ok in rec.samples if not ok)
+        reruns = len(rec.samples)
+        p95 = _percentile(sorted(seconds), 95)
+
+        lines.append("")
+        lines.append(f"== {n} concurrent sessions ({n - n_verifiers} editors, {n_verifiers} verifiers) x {iterations} ==")
+        if not seconds:
+            lines.append("  no reruns completed")
+            lines.extend(f"  ! {e}" for e in result["errors"][:5])
+            continue
+        lines.append(f"  reruns={reruns}  failed={failed}  sessions={rec.sessions}  wall={result['wall']:.1f}s")
+        lines.append(f"  throughput: {reruns / result['wall']:.1f} reruns/s, "
+                     f"{rec.sessions / result['wall'] * 60:.1f} sessions/min")
+        lines.append("  rerun latency: " + _latency_line(seconds))
+        by_action = defaultdict(list)
+        for action, s, _ in rec.samples:
+            by_action[action].append(s)
+        for action, values in by_action.items():
+            lines.append(f"    {action:<20} n={len(values):<4} " + _latency_line(values))
+        lines.append(f"  memory: {result['memory_per_session']:.1f} MiB RSS per live session")
+        lines.append(f"  storage calls: {result['reads']} reads, {result['writes']} writes "
+                     f"({(result['reads'] + result['writes']) / reruns:.1f} per rerun)")
+        lines.extend(f"  ! {e}" for e in result["errors"][:5])
+
+        summary.append((n, reruns / result["wall"], p95, result["memory_per_session"], failed + len(result["errors"])))
+
+    lines.append("")
+    lines.append(f"breaker: {json.dumps({k: v for k, v in breaker.status().items() if k != 'opened_at'})}")
+    lines.append("")
+    lines.append("sessions  reruns/s   p95      MiB/session  errors")
+    for n, throughput, p95, memory, errors in summary:
+        lines.append(f"{n:>8}  {throughput:>8.1f}  {p95 * 1000:>6.0f}ms  {memory:>11.1f}  {errors:>6}")
+    over = next((n for n, _, p95, _, _ in summary if p95 > slo), None)
+    if over is None:
+        lines.append(f"p95 stayed under {slo:g}s up to {levels[-1]} concurrent sessions")
+    else:
+        lines.append(f"p95 exceeds {slo:g}s at {over} concurrent sessions: scale out before that")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,5,10,20", help="comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=2, help="scripted visits per simulated user")
+    parser.add_argument("--verifiers", type=float, default=0.2, help="share of sessions that verify")
+    parser.add_argument("--seed", type=int, default=200, help="submitted activities in the fake sheet")
+    parser.add_argument("--api-latency", type=float, default=200, help="milliseconds per fake API call")
+    parser.add_argument("--slo", type=float, default=1.0, help="p95 rerun latency target in seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per rerun in seconds")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    # journal / aggregates / caches of this run live in a throwaway directory
+    os.environ["MS_FORM_LOCAL_DIR"] = tempfile.mkdtemp(prefix="ms_form_load_")
+    sys.path.insert(0, str(ROOT))
+
+    levels = sorted({int(n) for n in args.sessions.split(",") if n.strip()})
+    lines = run(levels, args.iterations, args.verifiers, args.seed, args.api_latency / 1000, args.slo, args.timeout)
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
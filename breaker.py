@@ -0,0 +1,132 @@
+from typing import Any, Callable, Dict
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("breaker")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Settings
+# -------------------------------------------------
+CALL_TIMEOUT = 30.0         # deadline of a single Google API call
+FAILURE_THRESHOLD = 5       # consecutive failures / timeouts that open the breaker
+RESET_SECONDS = 30.0        # open -> half-open: one trial call is let through
+MAX_WORKERS = 8
+
+# Calls run on this pool so the caller (a Streamlit script thread) stops
+# waiting at the deadline. A hung call keeps its worker until the HTTP
+# timeout frees it; once enough calls fail the breaker opens and new
+# calls fail fast instead of queueing behind it.
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="gapi")
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "state": "closed",          # closed | open | half_open
+    "consecutive_failures": 0,
+    "opened_at": None,
+    "trial_inflight": False,
+    "calls": 0,
+    "failures": 0,
+    "timeouts": 0,
+    "short_circuited": 0,
+    "opened": 0,
+}
+
+
+class BreakerOpen(Exception):
+    """Google API calls are suspended after repeated failures."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """A Google API call did not answer before its deadline."""
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def call(fn: Callable[..., Any], *args, timeout: float = CALL_TIMEOUT,
+         is_failure: Callable[[BaseException], bool] = lambda e: True, **kwargs) -> Any:
+    """
+    Run fn(*args, **kwargs) with a deadline. Raises BreakerOpen without
+    calling fn while the breaker is open. Exceptions for which
+    `is_failure` is False (e.g. "worksheet not found") do not count.
+    """
+    trial = _admit()
+    try:
+        future = _executor.submit(fn, *args, **kwargs)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeout:
+            _failed(trial, timed_out=True)
+            raise DeadlineExceeded(f"{getattr(fn, '__name__', 'call')} exceeded {timeout:g}s")
+        except Exception as e:
+            if is_failure(e):
+                _failed(trial)
+            else:
+                _succeeded(trial)
+            raise
+    except BaseException:
+        with _lock:
+            if trial:
+                _state["trial_inflight"] = False
+        raise
+
+    _succeeded(trial)
+    return result
+
+
+def is_open() -> bool:
+    with _lock:
+        return _state["state"] == "open" and time.time() - _state["opened_at"] < RESET_SECONDS
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        return dict(_state)
+
+
+# -------------------------------------------------
+# Internals
+# -------------------------------------------------
+def _admit() -> bool:
+    """True when this call is the half-open trial."""
+    with _lock:
+        _state["calls"] += 1
+        if _state["state"] == "closed":
+            return False
+        if _state["state"] == "open" and time.time() - _state["opened_at"] >= RESET_SECONDS:
+            _state["state"] = "half_open"
+        if _state["state"] == "half_open" and not _state["trial_inflight"]:
+            _state["trial_inflight"] = True
+            return True
+        _state["short_circuited"] += 1
+    raise BreakerOpen("Google Sheets calls are suspended")
+
+
+def _succeeded(trial: bool) -> None:
+    with _lock:
+        _state["consecutive_failures"] = 0
+        if trial or _state["state"] != "closed":
+            logger.info("circuit breaker closed")
+        _state.update(state="closed", opened_at=None, trial_inflight=False)
+
+
+def _failed(trial: bool, timed_out: bool = False) -> None:
+    with _lock:
+        _state["failures"] += 1
+        if timed_out:
+            _state["timeouts"] += 1
+        _state["consecutive_failures"] += 1
+        if trial or _state["consecutive_failures"] >= FAILURE_THRESHOLD:
+            if _state["state"] != "open":
+                _state["opened"] += 1
+                logger.warning(f"circuit breaker open after {_state['consecutive_failures']} failures")
+            _state.update(state="open", opened_at=time.time(), trial_inflight=False)
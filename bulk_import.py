@@ -0,0 +1,457 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+
+import local_store
+from form_options import CHOICE_FIELDS, STATUS_OPTIONS
+from gsheet_client import LIST_SECTIONS, SECTIONS, insert_activities, list_activity_ids
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("bulk_import")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Settings
+# -------------------------------------------------
+# Legacy MS Kegiatan / Indikator / Variabel documents are read as a stream
+# (NDJSON: one activity per line; CSV: one activity per row, nested fields
+# as "section.field" / "variables.<n>.field" columns or JSON cells),
+# checked against the form structure, shaped into the payload the Form
+# Page saves and written BATCH_ROWS at a time with one append call.
+# After every batch the position in the source file is checkpointed, so
+# a run that stops can be restarted and continues after the last batch.
+BATCH_ROWS = 200
+DB_NAME = "imports.sqlite3"
+REPORT_EXAMPLES = 3         # example records per problem in the summary
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    imported INTEGER NOT NULL,
+    rejected INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+META_FIELDS = {
+    "activity_id", "owner", "user_id", "status", "updated_at", "last_saved", "revision_note", "revision_requested_at",
+    "rejection_reason", "rejected_at", "verified_by", "verified_at", "verifier_comment",
+}
+BOOL_FIELDS = {"indikator_komposit", "indikator_diakses_umum", "dapat_diakses_umum", "sampel_prob", "sampel_nonprob"}
+TRUE_VALUES = {"true", "1", "ya", "yes", "y"}
+FALSE_VALUES = {"false", "0", "tidak", "no", "n", ""}
+
+# stable ids for records without activity_id, so a resumed run recognises what it already wrote
+_ID_NAMESPACE = uuid.UUID("5d0f3c2e-8a61-4c1b-9a57-2f4b6e1d7c90")
+
+
+# -------------------------------------------------
+# Reading
+# -------------------------------------------------
+def _fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _maybe_json(value: Any) -> Any:
+    if isinstance(value, str) and value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return value
+
+
+def _list_index(part: str) -> Optional[int]:
+    return int(part) - 1 if part.isdigit() and int(part) >= 1 else None
+
+
+def _unflatten(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """{"halaman_awal.judul": .., "variables.1.name": ..} -> struktur bersarang (indeks list mulai 1)."""
+    out: Dict[str, Any] = {}
+    for key, value in flat.items():
+        if key is None or value in ("", None):
+            continue
+        parts = key.split(".")
+        node: Any = out
+        for part, following in zip(parts, parts[1:]):
+            child: Any = [] if _list_index(following) is not None else {}
+            if isinstance(node, list):
+                index = _list_index(part)
+                if index is None:
+                    node = None
+                    break
+                node.extend([None] * (index + 1 - len(node)))
+                if not isinstance(node[index], (dict, list)):
+                    node[index] = child
+                node = node[index]
+            else:
+                if not isinstance(node.get(part), (dict, list)):
+                    node[part] = child
+                node = node[part]
+
+        value = _maybe_json(value)
+        if isinstance(node, dict):
+            node[parts[-1]] = value
+        elif isinstance(node, list) and _list_index(parts[-1]) is not None:
+            index = _list_index(parts[-1])
+            node.extend([None] * (index + 1 - len(node)))
+            node[index] = value
+    return out
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """(nomor record, record, error baca) satu per satu; nomor = baris NDJSON / baris data CSV."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                yield number, _unflatten(row), None
+            return
+
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, None, f"JSON tidak valid: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield number, None, "baris harus berupa objek JSON"
+                continue
+            # NDJSON may use the same dotted keys as CSV
+            yield number, _unflatten(record) if any("." in k for k in record) else record, None
+
+
+# -------------------------------------------------
+# Validation and payload shaping
+# -------------------------------------------------
+def _as_bool(value: Any) -> Any:
+    if isinstance(value, str) and value.strip().lower() in TRUE_VALUES | FALSE_VALUES:
+        return value.strip().lower() in TRUE_VALUES
+    return value
+
+
+def _check_choices(section: str, values: Dict[str, Any], problems: List[Tuple[str, str, Any]]) -> None:
+    for field, (options, multiple) in CHOICE_FIELDS.get(section, {}).items():
+        value = values.get(field)
+        if value in (None, "", []):
+            continue
+        if multiple:
+            if isinstance(value, str):
+                value = [v.strip() for v in value.split(";") if v.strip()]
+                values[field] = value
+            if not isinstance(value, list):
+                problems.append((f"{section}.{field}", "harus list", value))
+                continue
+            bad = [v for v in value if v not in options]
+            if bad:
+                problems.append((f"{section}.{field}", "bukan pilihan yang valid", bad))
+        elif value not in options:
+            problems.append((f"{section}.{field}", "bukan pilihan yang valid", value))
+
+
+def _check_items(section: str, entries: List[Any], name_field: str, problems: List[Tuple[str, str, Any]]) -> None:
+    for i, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            problems.append((section, "item harus objek", i))
+            continue
+        for field in BOOL_FIELDS & entry.keys():
+            entry[field] = _as_bool(entry[field])
+        if not str(entry.get(name_field) or "").strip():
+            problems.append((f"{section}.{name_field}", "wajib diisi", i))
+        for link in ("indikator_pembangun", "variabel_pembangun"):
+            if link in entry and not isinstance(entry[link], list):
+                problems.append((f"{section}.{link}", "harus list", i))
+        if section == "indicators":
+            entry.setdefault("indikator_pembangun", [])
+            entry.setdefault("variabel_pembangun", [])
+
+
+def shape(
+    record: Dict[str, Any],
+    number: int,
+    fingerprint: str,
+    source: str,
+    owner: Optional[str] = None,
+    status: str = "draft",
+) -> Tuple[Dict[str, Any], List[Tuple[str, str, Any]], List[Tuple[str, str, Any]]]:
+    """
+    Periksa satu record terhadap struktur form dan bentuk item untuk
+    insert_activities. Mengembalikan (item, errors, warnings); record
+    dengan errors tidak diimpor.
+    """
+    problems: List[Tuple[str, str, Any]] = []
+    warnings: List[Tuple[str, str, Any]] = []
+
+    activity_id = str(record.get("activity_id") or uuid.uuid5(_ID_NAMESPACE, f"{fingerprint}:{number}"))
+    user_id = str(record.get("user_id") or record.get("owner") or owner or "").strip()
+    if not user_id:
+        problems.append(("user_id", "wajib diisi", None))
+    row_status = str(record.get("status") or status).strip().lower()
+    if row_status not in STATUS_OPTIONS:
+        problems.append(("status", "bukan pilihan yang valid", row_status))
+
+    for key in record:
+        if key not in SECTIONS and key not in META_FIELDS:
+            warnings.append((key, "kolom tidak dikenal, tetap disimpan", None))
+
+    sections: Dict[str, Any] = {}
+    for sec in SECTIONS:
+        value = _maybe_json(record.get(sec))
+        if value in (None, ""):
+            value = [] if sec in LIST_SECTIONS else {}
+        if sec in LIST_SECTIONS and not isinstance(value, list):
+            problems.append((sec, "harus list", type(value).__name__))
+            value = []
+        elif sec not in LIST_SECTIONS and not isinstance(value, dict):
+            problems.append((sec, "harus objek", type(value).__name__))
+            value = {}
+        sections[sec] = value
+
+    halaman_awal = sections["halaman_awal"]
+    if not str(halaman_awal.get("judul") or "").strip():
+        problems.append(("halaman_awal.judul", "wajib diisi", None))
+    tahun = halaman_awal.get("tahun")
+    try:
+        halaman_awal["tahun"] = int(str(tahun).strip())
+        if not 0 <= halaman_awal["tahun"] <= 3000:
+            raise ValueError
+    except (TypeError, ValueError):
+        problems.append(("halaman_awal.tahun", "harus angka 0-3000", tahun))
+
+    for sec, values in sections.items():
+        if isinstance(values, dict):
+            for field in BOOL_FIELDS & values.keys():
+                values[field] = _as_bool(values[field])
+            _check_choices(sec, values, problems)
+    _check_items("variables", sections["variables"], "name", problems)
+    _check_items("indicators", sections["indicators"], "nama", problems)
+
+    payload = {
+        **{k: v for k, v in record.items() if k not in SECTIONS},
+        "activity_id": activity_id,
+        "owner": user_id,
+        "status": row_status,
+        "last_saved": record.get("last_saved") or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        **{k: record.get(k, "") for k in ("revision_note", "revision_requested_at", "rejection_reason",
+                                          "verified_by", "verifier_comment")},
+        **sections,
+        "imported_from": os.path.basename(source),
+    }
+    payload.pop("user_id", None)
+    payload.pop("updated_at", None)     # row column, set when the row is written
+    item = {"activity_id": activity_id, "user_id": user_id, "status": row_status, "payload": payload}
+    return item, problems, warnings
+
+
+# -------------------------------------------------
+# Checkpoint
+# -------------------------------------------------
+def _connect():
+    return local_store.connect(DB_NAME, SCHEMA)
+
+
+def load_checkpoint(source: str) -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM imports WHERE source = ?", (os.path.abspath(source),)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _save_checkpoint(source: str, fingerprint: str, counts: Dict[str, int], position: int, finished: bool = False) -> None:
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO imports (source, fingerprint, position, imported, rejected, skipped, finished, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (source) DO UPDATE SET fingerprint = excluded.fingerprint, "
+            "position = excluded.position, imported = excluded.imported, rejected = excluded.rejected, "
+            "skipped = excluded.skipped, finished = excluded.finished, updated_at = excluded.updated_at",
+            (os.path.abspath(source), fingerprint, position, counts["imported"], counts["rejected"],
+             counts["skipped"], int(finished), time.time()),
+        )
+    finally:
+        conn.close()
+
+
+# -------------------------------------------------
+# Import
+# -------------------------------------------------
+def run_import(
+    path: str,
+    fmt: Optional[str] = None,
+    owner: Optional[str] = None,
+    status: str = "draft",
+    batch_rows: int = BATCH_ROWS,
+    dry_run: bool = False,
+    restart: bool = False,
+    report_path: Optional[str] = None,
+    actor: str = "import",
+) -> Dict[str, Any]:
+    """
+    Impor satu file. dry_run: hanya validasi dan laporan, tanpa tulis ke
+    sheet maupun checkpoint. Tanpa restart, run dilanjutkan dari checkpoint
+    file yang sama (ditolak bila isi file berubah sejak run sebelumnya).
+    """
+    fingerprint = _fingerprint(path)
+    checkpoint = None if (restart or dry_run) else load_checkpoint(path)
+    if checkpoint and checkpoint["fingerprint"] != fingerprint:
+        raise RuntimeError(f"{path} changed since the last run (checkpoint at record {checkpoint['position']}); "
+                           "use --restart to import it from the beginning")
+
+    start_after = checkpoint["position"] if checkpoint else 0
+    counts = {k: checkpoint[k] if checkpoint else 0 for k in ("imported", "rejected", "skipped")}
+    problem_counts: Counter = Counter()
+    warning_counts: Counter = Counter()
+    examples: Dict[str, List[int]] = {}
+    batches = 0
+
+    existing = list_activity_ids()
+    seen = set()
+    batch: List[Dict[str, Any]] = []
+    position = start_after
+    report = open(report_path, "w", encoding="utf-8") if report_path else None
+
+    def flush(upto: int) -> None:
+        nonlocal batch, batches
+        if batch and not dry_run:
+            if not insert_activities(batch, actor=actor):
+                raise RuntimeError(f"batch write failed before record {upto}; run again to resume")
+        counts["imported"] += len(batch)
+        batches += 1 if batch else 0
+        batch = []
+        if not dry_run:
+            _save_checkpoint(path, fingerprint, counts, upto)
+
+    try:
+        for number, record, read_error in read_records(path, fmt):
+            if number <= start_after:
+                continue
+
+            if read_error:
+                errors, warnings, item = [("record", read_error, None)], [], None
+            else:
+                item, errors, warnings = shape(record, number, fingerprint, path, owner, status)
+
+            for field, problem, _ in warnings:
+                warning_counts[f"{field}: {problem}"] += 1
+            if errors:
+                counts["rejected"] += 1
+                for field, problem, _ in errors:
+                    kind = f"{field}: {problem}"
+                    problem_counts[kind] += 1
+                    examples.setdefault(kind, [])
+                    if len(examples[kind]) < REPORT_EXAMPLES:
+                        examples[kind].append(number)
+            elif item["activity_id"] in existing or item["activity_id"] in seen:
+                counts["skipped"] += 1
+                warning_counts["activity_id: sudah ada, dilewati"] += 1
+            else:
+                seen.add(item["activity_id"])
+                batch.append(item)
+
+            if report and (errors or warnings):
+                report.write(json.dumps({
+                    "record": number,
+                    "activity_id": item["activity_id"] if item else None,
+                    "errors": [f"{f}: {p}" + ("" if v is None else f" ({v})") for f, p, v in errors],
+                    "warnings": [f"{f}: {p}" for f, p, _ in warnings],
+                }, ensure_ascii=False, default=str) + "\n")
+
+            position = number
+            if len(batch) >= batch_rows:
+                flush(position)
+
+        flush(position)
+        if not dry_run:
+            _save_checkpoint(path, fingerprint, counts, position, finished=True)
+    finally:
+        if report:
+            report.close()
+
+    return {
+        "source": path,
+        "dry_run": dry_run,
+        "resumed_from": start_after,
+        "position": position,
+        "batches": batches,
+        "counts": dict(counts),
+        "problems": problem_counts.most_common(),
+        "warnings": warning_counts.most_common(),
+        "examples": examples,
+    }
+
+
+def format_summary(result: Dict[str, Any]) -> List[str]:
+    counts = result["counts"]
+    verb = "would import" if result["dry_run"] else "imported"
+    lines = [
+        f"{result['source']}: {verb} {counts['imported']} activities in {result['batches']} append call(s), "
+        f"rejected {counts['rejected']}, skipped {counts['skipped']} already present"
+        + (f" (resumed after record {result['resumed_from']})" if result["resumed_from"] else "")
+    ]
+    if result["problems"]:
+        lines.append("problems:")
+        for kind, n in result["problems"]:
+            records = ", ".join(map(str, result["examples"].get(kind, [])))
+            lines.append(f"  {n:>6}  {kind}  (e.g. record {records})")
+    if result["warnings"]:
+        lines.append("warnings:")
+        lines.extend(f"  {n:>6}  {kind}" for kind, n in result["warnings"])
+    return lines
+
+
+# -------------------------------------------------
+# Command line
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy MS Kegiatan / Indikator / Variabel records.")
+    parser.add_argument("path", help="NDJSON or CSV file")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None, help="default: from the extension")
+    parser.add_argument("--owner", default=None, help="user_id for records that do not name one")
+    parser.add_argument("--status", default="draft", choices=STATUS_OPTIONS, help="status for records without one")
+    parser.add_argument("--batch", type=int, default=BATCH_ROWS, help="rows per append call")
+    parser.add_argument("--dry-run", action="store_true", help="validate and report only")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of this file")
+    parser.add_argument("--report", default=None, help="write rejected / warned records to this NDJSON file")
+    args = parser.parse_args()
+
+    result = run_import(
+        args.path,
+        fmt=args.format,
+        owner=args.owner,
+        status=args.status,
+        batch_rows=args.batch,
+        dry_run=args.dry_run,
+        restart=args.restart,
+        report_path=args.report,
+    )
+    print("\n".join(format_summary(result)))
+
+
+if __name__ == "__main__":
+    main()
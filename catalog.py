@@ -0,0 +1,345 @@
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import json
+import logging
+import random
+import re
+import unicodedata
+import zlib
+
+import local_store
+from search_index import STOPWORDS
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("catalog")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# Every variable and indicator of every activity is one catalog entry.
+# Names are normalized (case, accents, punctuation, stopwords); each
+# distinct normalized name is cut into character trigrams, and a MinHash
+# signature of those trigrams is split into LSH_BANDS bands. Names whose
+# band hashes to the same bucket are near-duplicate candidates. A lookup
+# therefore reads LSH_BANDS buckets (plus an index range for prefix
+# matches while typing) instead of scanning the catalog. Every candidate
+# gets an exact score and the results are ranked by it; none is dropped
+# before scoring, however big its bucket. Buckets hold distinct names, not
+# entries, so a name used by a thousand activities is still one member.
+#
+# Like search_index, a write re-catalogs only its own activity
+# (local_store.ActivityStore).
+DB_NAME = "catalog.sqlite3"
+STORE_VERSION = "2"         # 2: synced stamps
+
+# section -> (entry kind, name field, fields copied into the catalog)
+SECTIONS = {
+    "variables": ("variabel", "name", ["name", "concept", "definition", "reference"]),
+    "indicators": ("indikator", "nama", [
+        "nama", "definisi", "konsep", "interpretasi", "metode", "ukuran", "satuan", "klasifikasi_penyajian",
+    ]),
+}
+SOURCE_SECTIONS = list(SECTIONS)
+KINDS = [kind for kind, _, _ in SECTIONS.values()]
+DEFINITION_FIELD = {"variabel": "definition", "indikator": "definisi"}
+
+SHINGLE = 3
+NUM_PERM = 32
+LSH_BANDS = 8               # 8 bands x 4 rows: pairs above ~0.6 similarity collide
+ROWS_PER_BAND = NUM_PERM // LSH_BANDS
+DUPLICATE_THRESHOLD = 0.7   # trigram Jaccard from which two names count as the same
+SUGGEST_THRESHOLD = 0.4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)      # fixed: signatures must match across processes
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    activity_id TEXT PRIMARY KEY,
+    status TEXT,
+    fingerprint TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_activity ON entries (activity_id);
+CREATE INDEX IF NOT EXISTS idx_entries_norm ON entries (kind, norm);
+CREATE TABLE IF NOT EXISTS names (
+    kind TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (kind, norm)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS buckets (
+    kind TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    PRIMARY KEY (kind, band, bucket, norm)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_buckets_norm ON buckets (kind, norm);
+"""
+
+
+def _connect():
+    return _store.connect()
+
+
+# -------------------------------------------------
+# Normalization and similarity
+# -------------------------------------------------
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(name: Any) -> str:
+    """Nama baku untuk dibandingkan: huruf kecil, tanpa aksen, tanda baca dan stopword."""
+    text = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode("ascii")
+    words = [w for w in _NON_WORD.split(text.lower()) if w and w not in STOPWORDS]
+    return " ".join(words)
+
+
+def shingles(norm: str) -> Set[str]:
+    padded = f" {norm} "
+    if len(padded) <= SHINGLE:
+        return {padded}
+    return {padded[i:i + SHINGLE] for i in range(len(padded) - SHINGLE + 1)}
+
+
+def signature(grams: Set[str]) -> List[int]:
+    hashed = [zlib.crc32(g.encode("utf-8")) for g in grams]
+    return [min((a * h + b) % _PRIME for h in hashed) for a, b in _PERMUTATIONS]
+
+
+def _bands(sig: List[int]) -> List[str]:
+    return [
+        hashlib.blake2b(repr(sig[b * ROWS_PER_BAND:(b + 1) * ROWS_PER_BAND]).encode(), digest_size=8).hexdigest()
+        for b in range(LSH_BANDS)
+    ]
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+# -------------------------------------------------
+# Writes
+# -------------------------------------------------
+def _source(data: Dict[str, Any]) -> Dict[str, Any]:
+    source: Dict[str, Any] = {}
+    for sec, (_, _, fields) in SECTIONS.items():
+        items = data.get(sec)
+        if isinstance(items, list):
+            source[sec] = [
+                {f: item[f] for f in fields if item.get(f) not in (None, "")} if isinstance(item, dict) else {}
+                for item in items
+            ]
+    return source
+
+
+def _replace_entries(conn, activity_id: str, source: Dict[str, Any]) -> None:
+    for row in conn.execute(
+        "SELECT kind, norm, COUNT(*) AS n FROM entries WHERE activity_id = ? GROUP BY kind, norm", (activity_id,)
+    ).fetchall():
+        conn.execute("UPDATE names SET n = n - ? WHERE kind = ? AND norm = ?", (row["n"], row["kind"], row["norm"]))
+        left = conn.execute("SELECT n FROM names WHERE kind = ? AND norm = ?", (row["kind"], row["norm"])).fetchone()
+        if left is None or left["n"] <= 0:
+            conn.execute("DELETE FROM names WHERE kind = ? AND norm = ?", (row["kind"], row["norm"]))
+            conn.execute("DELETE FROM buckets WHERE kind = ? AND norm = ?", (row["kind"], row["norm"]))
+    conn.execute("DELETE FROM entries WHERE activity_id = ?", (activity_id,))
+
+    for sec, (kind, name_field, _) in SECTIONS.items():
+        for position, item in enumerate(source.get(sec) or []):
+            norm = normalize(item.get(name_field))
+            if not norm:
+                continue
+            conn.execute(
+                "INSERT INTO entries (activity_id, kind, position, name, norm, fields) VALUES (?, ?, ?, ?, ?, ?)",
+                (activity_id, kind, position, str(item[name_field]).strip(), norm,
+                 json.dumps(item, ensure_ascii=False, default=str)),
+            )
+            conn.execute(
+                "INSERT INTO names (kind, norm, n) VALUES (?, ?, 1) "
+                "ON CONFLICT (kind, norm) DO UPDATE SET n = n + 1",
+                (kind, norm),
+            )
+            used = conn.execute("SELECT n FROM names WHERE kind = ? AND norm = ?", (kind, norm)).fetchone()
+            if used["n"] == 1:
+                # first use of this name: put it into its LSH buckets
+                conn.executemany(
+                    "INSERT OR IGNORE INTO buckets (kind, band, bucket, norm) VALUES (?, ?, ?, ?)",
+                    [(kind, band, bucket, norm) for band, bucket in enumerate(_bands(signature(shingles(norm))))],
+                )
+
+
+def _replace(conn, activity_id: str, status: Optional[str], source: Optional[Dict[str, Any]], old) -> None:
+    _replace_entries(conn, activity_id, source or {})
+
+
+_store = local_store.ActivityStore(
+    DB_NAME, SCHEMA, STORE_VERSION, ["buckets", "names", "entries"],
+    source=_source, replace=_replace, logger=logger, label="catalog",
+)
+indexed_source = _store.indexed_source
+put = _store.put
+set_status = _store.set_status
+remove = _store.remove
+last_rebuilt = _store.last_rebuilt
+last_synced = _store.last_synced
+synced = _store.synced
+mark_synced = _store.mark_synced
+rebuild = _store.rebuild
+
+
+# -------------------------------------------------
+# Lookups
+# -------------------------------------------------
+def _candidates(conn, kind: str, norm: str) -> Set[str]:
+    """
+    Semua nama baku yang berbagi bucket LSH dengan `norm`, atau diawali
+    `norm`. Tidak dipotong: pemanggil memberi skor lalu mengurutkan.
+    """
+    bands = _bands(signature(shingles(norm)))
+    found: Set[str] = set()
+    for band, bucket in enumerate(bands):
+        found.update(
+            r["norm"] for r in conn.execute(
+                "SELECT norm FROM buckets WHERE kind = ? AND band = ? AND bucket = ?", (kind, band, bucket)
+            )
+        )
+    found.update(
+        r["norm"] for r in conn.execute(
+            "SELECT norm FROM names WHERE kind = ? AND norm >= ? AND norm < ?", (kind, norm, norm + "\uffff")
+        )
+    )
+    return found
+
+
+def suggest(
+    kind: str,
+    name: str,
+    limit: int = 5,
+    exclude_activity: Optional[str] = None,
+    threshold: float = SUGGEST_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    Definisi yang sudah ada untuk nama yang mirip `name` (boleh setengah
+    diketik). Entri dengan nama baku yang sama digabung: hasilnya memuat
+    name, norm, fields (dari entri verified bila ada), uses (jumlah
+    kegiatan), verified dan similarity.
+    """
+    norm = normalize(name)
+    if not norm:
+        return []
+    query = shingles(norm)
+
+    conn = _connect()
+    try:
+        scored = []
+        for candidate in _candidates(conn, kind, norm):
+            grams = shingles(candidate)
+            # half Jaccard, half "how much of what was typed appears in the name"
+            score = 0.5 * jaccard(query, grams) + 0.5 * len(query & grams) / len(query)
+            if score >= threshold:
+                scored.append((score, candidate))
+        scored.sort(reverse=True)
+
+        out = []
+        for score, candidate in scored:
+            rows = conn.execute(
+                "SELECT e.activity_id, e.name, e.fields, a.status FROM entries e "
+                "JOIN activities a ON a.activity_id = e.activity_id "
+                "WHERE e.kind = ? AND e.norm = ? AND e.activity_id != ? "
+                "ORDER BY a.status = 'verified' DESC, e.entry_id DESC",
+                (kind, candidate, exclude_activity or ""),
+            ).fetchall()
+            if not rows:
+                continue
+            out.append({
+                "name": rows[0]["name"],
+                "norm": candidate,
+                "fields": json.loads(rows[0]["fields"]),
+                "uses": len({r["activity_id"] for r in rows}),
+                "verified": rows[0]["status"] == "verified",
+                "similarity": round(score, 3),
+            })
+            if len(out) >= limit:
+                break
+        return out
+    finally:
+        conn.close()
+
+
+def duplicate_groups(kind: str, threshold: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Kelompok nama yang hampir sama (Jaccard trigram >= threshold) dengan
+    lebih dari satu ejaan. Hanya pasangan yang berbagi bucket LSH yang
+    dibandingkan. Setiap kelompok: names {nama baku: jumlah entri}, entries.
+    """
+    conn = _connect()
+    try:
+        names = {r["norm"]: r["n"] for r in conn.execute("SELECT norm, n FROM names WHERE kind = ?", (kind,))}
+        buckets = conn.execute(
+            "SELECT group_concat(norm, char(31)) AS members FROM buckets WHERE kind = ? "
+            "GROUP BY band, bucket HAVING COUNT(*) > 1",
+            (kind,),
+        ).fetchall()
+
+        parent = {norm: norm for norm in names}
+        grams: Dict[str, Set[str]] = {}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        def similar(a, b):
+            for norm in (a, b):
+                if norm not in grams:
+                    grams[norm] = shingles(norm)
+            return jaccard(grams[a], grams[b]) >= threshold
+
+        # single link per bucket: each name joins every group of the bucket
+        # that holds a similar name. A group it already belongs to is not
+        # compared again, so a big bucket of near-identical names (a shared
+        # template, "variabel 1", "variabel 2", ...) costs about one pass
+        for row in buckets:
+            local: Dict[str, List[str]] = {}    # group root -> its names in this bucket
+            for b in row["members"].split("\x1f"):
+                rb = find(b)
+                for ra in list(local):
+                    if ra != rb and any(similar(a, b) for a in local[ra]):
+                        parent[ra] = rb
+                        local.setdefault(rb, []).extend(local.pop(ra))
+                local.setdefault(rb, []).append(b)
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        for norm, n in names.items():
+            groups.setdefault(find(norm), {"names": {}, "entries": []})["names"][norm] = n
+        groups = {root: g for root, g in groups.items() if len(g["names"]) > 1}
+
+        members = {norm: root for root, g in groups.items() for norm in g["names"]}
+        if members:
+            for row in conn.execute(
+                "SELECT activity_id, position, name, norm FROM entries WHERE kind = ? ORDER BY norm", (kind,)
+            ):
+                if row["norm"] in members:
+                    groups[members[row["norm"]]]["entries"].append(dict(row))
+    finally:
+        conn.close()
+    return sorted(groups.values(), key=lambda g: -len(g["entries"]))
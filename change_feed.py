@@ -0,0 +1,177 @@
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import os
+import threading
+import time
+import uuid
+
+import local_store
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("change_feed")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# Every Streamlit worker on the host appends its writes to `changes` and
+# polls the rows other workers appended since its last poll, so a change
+# reaches every process within about POLL_SECONDS. `versions` gives each
+# activity a host-wide, monotonically increasing version number.
+DB_NAME = "changes.sqlite3"
+POLL_SECONDS = 1.0
+RETENTION_SECONDS = 3600    # older rows are pruned; late pollers just evict more
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    user_id TEXT,
+    status TEXT,
+    origin TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    activity_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# identifies this process, so it skips the changes it published itself
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_lock = threading.Lock()
+_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+_state: Dict[str, Any] = {"last_seq": None, "thread": None, "polls": 0, "received": 0, "published": 0, "lag": None}
+
+
+def _connect():
+    return local_store.connect(DB_NAME, SCHEMA)
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def publish(
+    activity_id: str,
+    kind: str,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Umumkan satu tulisan ke worker lain; mengembalikan versi baru kegiatan.
+    `user_id` / `status` None berarti tidak diketahui.
+    """
+    try:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO versions (activity_id, version) VALUES (?, 1) "
+                "ON CONFLICT (activity_id) DO UPDATE SET version = version + 1",
+                (activity_id,),
+            )
+            version = conn.execute(
+                "SELECT version FROM versions WHERE activity_id = ?", (activity_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO changes (activity_id, version, kind, user_id, status, origin, at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (activity_id, version, kind, user_id, status, ORIGIN, time.time()),
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        with _lock:
+            _state["published"] += 1
+        return version
+
+    except Exception:
+        logger.exception("change publish failed")
+        return None
+
+
+def subscribe(listener: Callable[[List[Dict[str, Any]]], None]) -> None:
+    """
+    Daftarkan listener untuk perubahan dari proses lain dan jalankan poller
+    (sekali per proses). Listener menerima list dict per perubahan.
+    """
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+        if _state["thread"] is not None:
+            return
+        thread = threading.Thread(target=_run, name="change-feed", daemon=True)
+        _state["thread"] = thread
+    thread.start()
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {k: v for k, v in _state.items() if k != "thread"}
+
+
+# -------------------------------------------------
+# Internals
+# -------------------------------------------------
+def poll() -> List[Dict[str, Any]]:
+    """Perubahan dari proses lain sejak poll sebelumnya (poll pertama hanya menandai posisi)."""
+    conn = _connect()
+    try:
+        last_seq = _state["last_seq"]
+        if last_seq is None:
+            row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()
+            _state["last_seq"] = row[0]
+            return []
+
+        rows = conn.execute(
+            "SELECT * FROM changes WHERE seq > ? ORDER BY seq", (last_seq,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    if rows:
+        _state["last_seq"] = rows[-1]["seq"]
+    return [dict(r) for r in rows if r["origin"] != ORIGIN]
+
+
+def _prune() -> None:
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM changes WHERE at < ?", (time.time() - RETENTION_SECONDS,))
+    finally:
+        conn.close()
+
+
+def _run() -> None:
+    while True:
+        try:
+            changes = poll()
+            with _lock:
+                _state["polls"] += 1
+                listeners = list(_listeners)
+                if changes:
+                    _state["received"] += len(changes)
+                    _state["lag"] = time.time() - changes[-1]["at"]
+            if changes:
+                for listener in listeners:
+                    try:
+                        listener(changes)
+                    except Exception:
+                        logger.exception("change listener failed")
+            if _state["polls"] % 600 == 0:
+                _prune()
+
+        except Exception:
+            logger.exception("change feed poll failed")
+
+        time.sleep(POLL_SECONDS)
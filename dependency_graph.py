@@ -0,0 +1,505 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+import logging
+
+import local_store
+from catalog import normalize
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("dependency_graph")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# Nodes are the variables and indicators of every activity
+# ("<activity_id>/<kind>/<position>"). Each entry of an indicator's
+# indikator_pembangun / variabel_pembangun is a `link` from that indicator
+# to a name; resolving it sets `dst` to the node it means, or leaves it
+# NULL (dangling). `links` is therefore the adjacency list in both
+# directions: src -> dst for "what does this use", dst -> src (indexed)
+# for "what depends on this".
+#
+# A link is resolved by normalized name (catalog.normalize): an indicator
+# in the same activity first, otherwise a verified activity, otherwise
+# any. A variable with a kegiatan_penghasil is looked up in the activity
+# with that title only. When one activity is written, its nodes and links
+# are replaced, and only the links of other activities that point at (or
+# may now point at) one of its old or new names are resolved again.
+DB_NAME = "graph.sqlite3"
+STORE_VERSION = "2"         # 2: synced stamps
+
+# indicator field -> (target kind, name field in the entry)
+LINK_FIELDS = {
+    "indikator_pembangun": ("indikator", "nama_indikator_pembangun"),
+    "variabel_pembangun": ("variabel", "nama_variabel_pembangun"),
+}
+NODE_SECTIONS = {"variables": ("variabel", "name"), "indicators": ("indikator", "nama")}
+SOURCE_SECTIONS = ["halaman_awal"] + list(NODE_SECTIONS)
+
+# why a link stayed dangling
+PROBLEMS = {
+    "not_found": "nama tidak ditemukan di kegiatan mana pun",
+    "producer_not_found": "kegiatan penghasil tidak ditemukan",
+    "not_in_producer": "tidak ada di kegiatan penghasil",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    activity_id TEXT PRIMARY KEY,
+    status TEXT,
+    judul TEXT,
+    judul_norm TEXT,
+    fingerprint TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_activities_judul ON activities (judul_norm);
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    activity_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    verified INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_nodes_activity ON nodes (activity_id, kind, norm, position);
+CREATE INDEX IF NOT EXISTS idx_nodes_norm ON nodes (kind, norm, verified, activity_id, position);
+CREATE TABLE IF NOT EXISTS links (
+    link_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    src TEXT NOT NULL,
+    activity_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    entry INTEGER NOT NULL,
+    target_kind TEXT NOT NULL,
+    target_name TEXT NOT NULL,
+    target_norm TEXT NOT NULL,
+    producer TEXT,
+    producer_norm TEXT,
+    dst TEXT,
+    dst_activity TEXT,
+    problem TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_links_activity ON links (activity_id);
+CREATE INDEX IF NOT EXISTS idx_links_src ON links (src);
+CREATE INDEX IF NOT EXISTS idx_links_dst ON links (dst);
+CREATE INDEX IF NOT EXISTS idx_links_dst_activity ON links (dst_activity);
+CREATE INDEX IF NOT EXISTS idx_links_target ON links (target_kind, target_norm);
+CREATE INDEX IF NOT EXISTS idx_links_producer ON links (producer_norm);
+"""
+
+
+def _connect():
+    return _store.connect()
+
+
+def node_id(activity_id: str, kind: str, position: int) -> str:
+    return f"{activity_id}/{kind}/{position}"
+
+
+# -------------------------------------------------
+# Writes
+# -------------------------------------------------
+def _source(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Bagian payload yang membentuk graf: judul, nama variabel, nama dan link indikator."""
+    source: Dict[str, Any] = {}
+    halaman_awal = data.get("halaman_awal")
+    if isinstance(halaman_awal, dict):
+        source["halaman_awal"] = {"judul": halaman_awal.get("judul")} if halaman_awal.get("judul") else {}
+    for sec, (_, name_field) in NODE_SECTIONS.items():
+        items = data.get(sec)
+        if not isinstance(items, list):
+            continue
+        out = []
+        for item in items:
+            item = item if isinstance(item, dict) else {}
+            kept = {name_field: item.get(name_field)} if item.get(name_field) else {}
+            if sec == "indicators":
+                for field, (_, target_field) in LINK_FIELDS.items():
+                    entries = item.get(field)
+                    if isinstance(entries, list):
+                        kept[field] = [
+                            {k: v for k, v in e.items() if k in (target_field, "kegiatan_penghasil") and v}
+                            for e in entries if isinstance(e, dict)
+                        ]
+            out.append(kept)
+        source[sec] = out
+    return source
+
+
+def _resolve(conn, link) -> None:
+    """Isi dst (atau problem) satu link dari node yang ada sekarang."""
+    dst, problem = None, None
+    activity_id = link["activity_id"]
+
+    if link["producer_norm"]:
+        producers = [
+            r["activity_id"]
+            for r in conn.execute("SELECT activity_id FROM activities WHERE judul_norm = ?", (link["producer_norm"],))
+        ]
+        if not producers:
+            problem = "producer_not_found"
+        else:
+            marks = ",".join("?" * len(producers))
+            row = conn.execute(
+                f"SELECT node_id FROM nodes WHERE kind = ? AND norm = ? AND activity_id IN ({marks}) "
+                "ORDER BY activity_id = ? DESC, activity_id, position LIMIT 1",
+                (link["target_kind"], link["target_norm"], *producers, activity_id),
+            ).fetchone()
+            dst = row["node_id"] if row else None
+            problem = None if row else "not_in_producer"
+    else:
+        # three index lookups instead of one ORDER BY over every node with
+        # this name (a common variable name can be in every activity)
+        key = (link["target_kind"], link["target_norm"])
+        row = (
+            conn.execute(
+                "SELECT node_id FROM nodes WHERE activity_id = ? AND kind = ? AND norm = ? ORDER BY position LIMIT 1",
+                (activity_id, *key),
+            ).fetchone()
+            or conn.execute(
+                "SELECT node_id FROM nodes WHERE kind = ? AND norm = ? AND verified = 1 "
+                "ORDER BY activity_id, position LIMIT 1",
+                key,
+            ).fetchone()
+            or conn.execute(
+                "SELECT node_id FROM nodes WHERE kind = ? AND norm = ? ORDER BY activity_id, position LIMIT 1", key
+            ).fetchone()
+        )
+        dst = row["node_id"] if row else None
+        problem = None if row else "not_found"
+
+    conn.execute(
+        "UPDATE links SET dst = ?, dst_activity = ?, problem = ? WHERE link_id = ?",
+        (dst, dst.rsplit("/", 2)[0] if dst else None, problem, link["link_id"]),
+    )
+
+
+# links of other activities, named `kind` / `norm` and without a producer,
+# whose current dst a node of an activity with verified = ? and id = ?
+# would beat (dangling, or resolved outside their own activity to a node
+# that is not verified / comes later)
+_CONTESTABLE = (
+    "SELECT l.* FROM links l LEFT JOIN nodes d ON d.node_id = l.dst "
+    "WHERE l.target_kind = ? AND l.target_norm = ? AND l.producer_norm IS NULL AND l.activity_id != ? "
+    "AND (l.dst IS NULL OR (l.dst_activity != l.activity_id "
+    "AND (? > d.verified OR (? = d.verified AND ? < l.dst_activity))))"
+)
+
+
+def _contestable(conn, activity_id: str, verified: int, kind: str, norm: str):
+    return conn.execute(_CONTESTABLE, (kind, norm, activity_id, verified, verified, activity_id)).fetchall()
+
+
+def _columns(source: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+    judul = (source.get("halaman_awal") or {}).get("judul")
+    return {"judul": judul, "judul_norm": normalize(judul) or None}
+
+
+def _replace(
+    conn,
+    activity_id: str,
+    status: Optional[str],
+    source: Optional[Dict[str, Any]],
+    old,
+    resolve: bool = True,
+) -> None:
+    """
+    Ganti node dan link satu kegiatan (source None = hapus), lalu resolve
+    link yang terdampak. Baris `activities`-nya sudah ditulis (atau
+    dihapus) oleh store; `old` = baris sebelumnya.
+    """
+    new_names: Set[tuple] = set()
+    touched_titles = {old["judul_norm"]} if old and old["judul_norm"] else set()
+    verified = int(status == "verified")
+
+    conn.execute("DELETE FROM nodes WHERE activity_id = ?", (activity_id,))
+    conn.execute("DELETE FROM links WHERE activity_id = ?", (activity_id,))
+    if source is not None:
+        judul_norm = _columns(source, None)["judul_norm"]
+        if judul_norm:
+            touched_titles.add(judul_norm)
+        for sec, (kind, name_field) in NODE_SECTIONS.items():
+            for position, item in enumerate(source.get(sec) or []):
+                norm = normalize(item.get(name_field))
+                if not norm:
+                    continue
+                new_names.add((kind, norm))
+                conn.execute(
+                    "INSERT INTO nodes (node_id, activity_id, kind, position, name, norm, verified) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (node_id(activity_id, kind, position), activity_id, kind, position,
+                     str(item[name_field]).strip(), norm, verified),
+                )
+                if sec != "indicators":
+                    continue
+                for field, (target_kind, target_field) in LINK_FIELDS.items():
+                    for entry_no, entry in enumerate(item.get(field) or []):
+                        target_norm = normalize(entry.get(target_field))
+                        if not target_norm:
+                            continue
+                        producer = entry.get("kegiatan_penghasil") if target_kind == "variabel" else None
+                        conn.execute(
+                            "INSERT INTO links (src, activity_id, field, entry, target_kind, target_name, target_norm, "
+                            "producer, producer_norm) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (node_id(activity_id, kind, position), activity_id, field, entry_no, target_kind,
+                             str(entry[target_field]).strip(), target_norm, producer, normalize(producer) or None),
+                        )
+
+    if not resolve:
+        return
+    # this activity's own links, the links that pointed at one of its old
+    # nodes, the links one of its new nodes may now win, and the links that
+    # name its old / new title as producer
+    affected = {r["link_id"]: r for r in conn.execute("SELECT * FROM links WHERE activity_id = ?", (activity_id,))}
+    for r in conn.execute("SELECT * FROM links WHERE dst_activity = ?", (activity_id,)):
+        affected[r["link_id"]] = r
+    for kind, norm in new_names:
+        for r in _contestable(conn, activity_id, verified, kind, norm):
+            affected[r["link_id"]] = r
+    for title in touched_titles:
+        for r in conn.execute("SELECT * FROM links WHERE producer_norm = ?", (title,)):
+            affected[r["link_id"]] = r
+    for link in affected.values():
+        _resolve(conn, link)
+
+
+def _load(conn, activity_id: str, status: Optional[str], source: Dict[str, Any], old) -> None:
+    # the full resolve pass of _resolve_all covers every link at once
+    _replace(conn, activity_id, status, source, old, resolve=False)
+
+
+def _resolve_all(conn) -> None:
+    for link in conn.execute("SELECT * FROM links").fetchall():
+        _resolve(conn, link)
+
+
+def _set_status(conn, activity_id: str, status: str) -> None:
+    verified = int(status == "verified")
+    conn.execute("UPDATE nodes SET verified = ? WHERE activity_id = ?", (verified, activity_id))
+    # "prefer verified": links elsewhere may now prefer this activity's
+    # nodes, or (when it lost verified) another activity's
+    affected = {}
+    if not verified:
+        for r in conn.execute(
+            "SELECT * FROM links WHERE dst_activity = ? AND activity_id != ? AND producer_norm IS NULL",
+            (activity_id, activity_id),
+        ):
+            affected[r["link_id"]] = r
+    names = conn.execute("SELECT DISTINCT kind, norm FROM nodes WHERE activity_id = ?", (activity_id,)).fetchall()
+    for n in names:
+        for r in _contestable(conn, activity_id, verified, n["kind"], n["norm"]):
+            affected[r["link_id"]] = r
+    for link in affected.values():
+        _resolve(conn, link)
+
+
+# all nodes of a rebuild are loaded first, then every link is resolved once
+_store = local_store.ActivityStore(
+    DB_NAME, SCHEMA, STORE_VERSION, ["links", "nodes"],
+    source=_source, replace=_replace, columns=_columns, on_status=_set_status,
+    load=_load, finish=_resolve_all, logger=logger, label="dependency graph",
+)
+indexed_source = _store.indexed_source
+put = _store.put
+set_status = _store.set_status
+remove = _store.remove
+last_rebuilt = _store.last_rebuilt
+last_synced = _store.last_synced
+synced = _store.synced
+mark_synced = _store.mark_synced
+rebuild = _store.rebuild
+
+
+# -------------------------------------------------
+# Queries
+# -------------------------------------------------
+def _nodes(conn, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    ids = list(ids)
+    if not ids:
+        return {}
+    rows = conn.execute(
+        "SELECT n.node_id, n.activity_id, n.kind, n.position, n.name, a.judul, a.status FROM nodes n "
+        f"JOIN activities a ON a.activity_id = n.activity_id WHERE n.node_id IN ({','.join('?' * len(ids))})",
+        ids,
+    )
+    return {r["node_id"]: dict(r) for r in rows}
+
+
+def find_nodes(kind: str, name: str, activity_id: Optional[str] = None) -> List[str]:
+    """node_id dengan nama (baku) `name`, opsional dibatasi pada satu kegiatan."""
+    conn = _connect()
+    try:
+        sql = "SELECT node_id FROM nodes WHERE kind = ? AND norm = ?"
+        params = [kind, normalize(name)]
+        if activity_id:
+            sql += " AND activity_id = ?"
+            params.append(activity_id)
+        return [r["node_id"] for r in conn.execute(sql + " ORDER BY activity_id, position", params)]
+    finally:
+        conn.close()
+
+
+def dependents(node_ids: Iterable[str], transitive: bool = True) -> List[Dict[str, Any]]:
+    """
+    Indikator yang memakai node ini (lewat indeks dst), termasuk yang
+    memakainya secara tidak langsung bila `transitive`. Setiap hasil
+    membawa depth (1 = langsung) dan via (node yang dipakainya).
+    """
+    conn = _connect()
+    try:
+        seen: Dict[str, Dict[str, Any]] = {}
+        frontier = list(node_ids)
+        depth = 0
+        while frontier:
+            depth += 1
+            marks = ",".join("?" * len(frontier))
+            rows = conn.execute(f"SELECT DISTINCT src, dst FROM links WHERE dst IN ({marks})", frontier).fetchall()
+            frontier = []
+            for r in rows:
+                if r["src"] not in seen:
+                    seen[r["src"]] = {"depth": depth, "via": r["dst"]}
+                    frontier.append(r["src"])
+            if not transitive:
+                break
+        nodes = _nodes(conn, seen)
+        return sorted(
+            ({**nodes[n], **info} for n, info in seen.items() if n in nodes),
+            key=lambda d: (d["depth"], d["activity_id"], d["position"]),
+        )
+    finally:
+        conn.close()
+
+
+def dependencies(node: str) -> List[Dict[str, Any]]:
+    """Link keluar satu indikator: apa yang dipakainya, dan ke mana link itu ter-resolve."""
+    conn = _connect()
+    try:
+        links = [dict(r) for r in conn.execute("SELECT * FROM links WHERE src = ? ORDER BY field, entry", (node,))]
+        nodes = _nodes(conn, {l["dst"] for l in links if l["dst"]})
+        return [{**l, "target": nodes.get(l["dst"])} for l in links]
+    finally:
+        conn.close()
+
+
+def dangling(activity_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Link yang tidak ter-resolve (nama tidak dikenal), per kegiatan atau semuanya."""
+    conn = _connect()
+    try:
+        sql = (
+            "SELECT l.*, n.name AS src_name, a.judul FROM links l JOIN nodes n ON n.node_id = l.src "
+            "JOIN activities a ON a.activity_id = l.activity_id WHERE l.dst IS NULL"
+        )
+        params = []
+        if activity_id:
+            sql += " AND l.activity_id = ?"
+            params.append(activity_id)
+        return [dict(r) for r in conn.execute(sql + " ORDER BY l.activity_id, l.src, l.field, l.entry", params)]
+    finally:
+        conn.close()
+
+
+def cycles(activity_id: Optional[str] = None) -> List[List[str]]:
+    """
+    Siklus antar-indikator, masing-masing sebagai daftar node_id. Dengan
+    `activity_id` hanya bagian graf yang terjangkau dari indikator kegiatan
+    itu yang diperiksa; tanpa itu seluruh graf (Tarjan, satu kali lewat).
+    """
+    conn = _connect()
+    try:
+        if activity_id:
+            starts = [
+                r["node_id"]
+                for r in conn.execute("SELECT node_id FROM nodes WHERE activity_id = ? AND kind = 'indikator'", (activity_id,))
+            ]
+            edges: Dict[str, List[str]] = {}
+            frontier = list(starts)
+            while frontier:
+                marks = ",".join("?" * len(frontier))
+                rows = conn.execute(
+                    f"SELECT src, dst FROM links WHERE src IN ({marks}) AND target_kind = 'indikator' AND dst IS NOT NULL",
+                    frontier,
+                ).fetchall()
+                for n in frontier:
+                    edges.setdefault(n, [])
+                frontier = []
+                for r in rows:
+                    edges[r["src"]].append(r["dst"])
+                    if r["dst"] not in edges:
+                        edges[r["dst"]] = []
+                        frontier.append(r["dst"])
+        else:
+            edges = {}
+            for r in conn.execute("SELECT src, dst FROM links WHERE target_kind = 'indikator' AND dst IS NOT NULL"):
+                edges.setdefault(r["src"], []).append(r["dst"])
+                edges.setdefault(r["dst"], [])
+    finally:
+        conn.close()
+
+    found = [c for c in _strongly_connected(edges) if len(c) > 1 or c[0] in edges[c[0]]]
+    if activity_id:
+        found = [c for c in found if any(n.startswith(f"{activity_id}/") for n in c)]
+    return found
+
+
+def _strongly_connected(edges: Dict[str, List[str]]) -> List[List[str]]:
+    """Tarjan tanpa rekursi (graf bisa dalam)."""
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack: Set[str] = set()
+    out: List[List[str]] = []
+    counter = 0
+
+    for root in edges:
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, i = work.pop()
+            if i == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+            successors = edges.get(node, [])
+            if i < len(successors):
+                work.append((node, i + 1))
+                nxt = successors[i]
+                if nxt not in index:
+                    work.append((nxt, 0))
+                elif nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+                continue
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                out.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+    return out
+
+
+def report(activity_id: str) -> Dict[str, Any]:
+    """Link menggantung dan siklus yang melibatkan satu kegiatan."""
+    found = cycles(activity_id)
+    conn = _connect()
+    try:
+        names = _nodes(conn, {n for c in found for n in c})
+    finally:
+        conn.close()
+    return {
+        "dangling": dangling(activity_id),
+        "cycles": [[names.get(n, {"node_id": n, "name": n}) for n in c] for c in found],
+    }
@@ -0,0 +1,162 @@
+from typing import Any, Dict, List
+import hashlib
+import html
+import json
+import os
+
+# -------------------------------------------------
+# Printable MS documents
+# -------------------------------------------------
+# Pure rendering: payload -> HTML (or PDF through weasyprint, optional).
+# This module is what the render worker processes import, so it must not
+# pull in streamlit / gsheet_client. Jobs, caching and progress live in
+# render_jobs.py.
+KINDS = ["kegiatan", "indikator", "variabel"]
+FORMATS = ["html", "pdf"]
+TITLES = {"kegiatan": "MS Kegiatan", "indikator": "MS Indikator", "variabel": "MS Variabel"}
+
+KEGIATAN_SECTIONS = [
+    ("halaman_awal", "Halaman Awal"),
+    ("blok_1_3", "Blok 1-3: Penyelenggara, Penanggung Jawab, Perencanaan"),
+    ("blok_4", "Blok 4: Desain Kegiatan"),
+    ("blok_5", "Blok 5: Desain Sampel"),
+    ("blok_6_8", "Blok 6-8: Pengumpulan, Pengolahan, Analisis"),
+]
+LINK_LISTS = {"indikator_pembangun": "Indikator Pembangun", "variabel_pembangun": "Variabel Pembangun"}
+
+STYLE = """
+body { font-family: "DejaVu Sans", Arial, sans-serif; font-size: 10.5pt; margin: 2cm; color: #222; }
+h1 { font-size: 16pt; margin-bottom: 0; }
+h2 { font-size: 12.5pt; border-bottom: 1px solid #999; padding-bottom: 2px; margin-top: 1.4em; }
+h3 { font-size: 11pt; margin-bottom: 0.3em; }
+.meta { color: #555; margin-top: 0.3em; }
+table { border-collapse: collapse; width: 100%; margin-bottom: 0.8em; }
+th, td { border: 1px solid #bbb; padding: 4px 6px; vertical-align: top; text-align: left; }
+th { width: 35%; background: #f2f2f2; font-weight: normal; }
+.item { page-break-inside: avoid; }
+"""
+
+
+def version(record: Dict[str, Any]) -> str:
+    """Versi isi kegiatan: berubah hanya bila status atau payload berubah."""
+    content = json.dumps([record.get("status"), record.get("data") or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def _label(key: str) -> str:
+    # "iii_jadwal_desain" -> "Jadwal desain"
+    parts = key.split("_")
+    if parts and parts[0] in {"i", "ii", "iii", "iv", "v", "vi", "vii", "viii"} and len(parts) > 1:
+        parts = parts[1:]
+    text = " ".join(parts)
+    return text[:1].upper() + text[1:]
+
+
+def _value(value: Any) -> str:
+    if value is None or value == "" or value == []:
+        return "-"
+    if isinstance(value, bool):
+        return "Ya" if value else "Tidak"
+    if isinstance(value, list) and all(not isinstance(v, (dict, list)) for v in value):
+        return html.escape(", ".join(str(v) for v in value))
+    if isinstance(value, (dict, list)):
+        return html.escape(json.dumps(value, ensure_ascii=False, default=str))
+    return html.escape(str(value)).replace("\n", "<br>")
+
+
+def _table(values: Dict[str, Any], skip=()) -> str:
+    rows = [
+        f"<tr><th>{html.escape(_label(k))}</th><td>{_value(v)}</td></tr>"
+        for k, v in values.items()
+        if k not in skip
+    ]
+    return "<table>" + "".join(rows) + "</table>" if rows else "<p>-</p>"
+
+
+def _page(kind: str, record: Dict[str, Any], body: List[str]) -> str:
+    data = record.get("data") or {}
+    halaman_awal = data.get("halaman_awal") or {}
+    judul = html.escape(str(halaman_awal.get("judul") or "Tanpa judul"))
+    meta = " · ".join(html.escape(str(v)) for v in [
+        halaman_awal.get("tahun"),
+        halaman_awal.get("sektor"),
+        f"status {record.get('status')}",
+        f"pemilik {record.get('user_id')}",
+        f"ID {record.get('activity_id')}",
+    ] if v)
+    return (
+        f"<!DOCTYPE html><html lang=\"id\"><head><meta charset=\"utf-8\">"
+        f"<title>{TITLES[kind]} - {judul}</title><style>{STYLE}</style></head><body>"
+        f"<h1>{TITLES[kind]}: {judul}</h1><p class=\"meta\">{meta}</p>"
+        + "".join(body)
+        + "</body></html>"
+    )
+
+
+def render_html(record: Dict[str, Any], kind: str) -> str:
+    """Satu dokumen (kegiatan / indikator / variabel) dari record get_activity."""
+    data = record.get("data") or {}
+
+    if kind == "kegiatan":
+        body = []
+        for section, title in KEGIATAN_SECTIONS:
+            values = data.get(section)
+            if isinstance(values, dict) and values:
+                body.append(f"<h2>{html.escape(title)}</h2>" + _table(values))
+        names = [v.get("name") for v in data.get("variables") or [] if isinstance(v, dict)]
+        body.append("<h2>Daftar Variabel</h2>" + (
+            "<ol>" + "".join(f"<li>{_value(n)}</li>" for n in names) + "</ol>" if names else "<p>-</p>"
+        ))
+        return _page(kind, record, body)
+
+    if kind == "variabel":
+        entries = data.get("variables") or []
+        body = [
+            f"<div class=\"item\"><h2>Variabel {i}: {_value(v.get('name'))}</h2>{_table(v)}</div>"
+            for i, v in enumerate(entries, start=1) if isinstance(v, dict)
+        ]
+        return _page(kind, record, body or ["<p>Belum ada variabel.</p>"])
+
+    if kind == "indikator":
+        body = []
+        for i, ind in enumerate(data.get("indicators") or [], start=1):
+            if not isinstance(ind, dict):
+                continue
+            parts = [f"<div class=\"item\"><h2>Indikator {i}: {_value(ind.get('nama'))}</h2>", _table(ind, skip=LINK_LISTS)]
+            for key, title in LINK_LISTS.items():
+                links = [link for link in ind.get(key) or [] if isinstance(link, dict)]
+                if links:
+                    parts.append(f"<h3>{title}</h3>" + "".join(_table(link) for link in links))
+            body.append("".join(parts) + "</div>")
+        return _page(kind, record, body or ["<p>Belum ada indikator.</p>"])
+
+    raise ValueError(f"unknown document kind {kind!r}")
+
+
+def pdf_available() -> bool:
+    try:
+        import weasyprint  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def render_files(record: Dict[str, Any], kinds: List[str], fmt: str, paths: Dict[str, str]) -> Dict[str, str]:
+    """
+    Tulis dokumen `kinds` ke `paths` (dijalankan di proses worker).
+    File ditulis ke nama sementara lalu di-rename, jadi cache tidak
+    pernah berisi dokumen setengah jadi.
+    """
+    for kind in kinds:
+        path = paths[kind]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        page = render_html(record, kind)
+        if fmt == "pdf":
+            from weasyprint import HTML
+            HTML(string=page).write_pdf(tmp)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(page)
+        os.replace(tmp, path)
+    return paths
@@ -0,0 +1,185 @@
+from typing import Any, Dict, IO, Iterable, List, Optional
+import argparse
+import csv
+import json
+import logging
+import os
+import tempfile
+import zipfile
+
+from gsheet_client import SECTIONS, iter_activities
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("export")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Tables
+# -------------------------------------------------
+# Every activity is flattened into three tables:
+#   kegiatan  - one row per activity: row metadata, column D metadata and
+#               halaman_awal + blok_1_3..blok_6_8 as "<section>.<field>"
+#   variabel  - one row per entry of `variables`
+#   indikator - one row per entry of `indicators`, with its
+#               indikator_pembangun / variabel_pembangun links as JSON
+# Activities are read page by page (gsheet_client.iter_activities) and
+# written as they come, so memory does not grow with the sheet. CSV and
+# Parquet need the full column list up front: rows are first spooled to
+# NDJSON on disk while the columns are collected, then converted.
+FORMATS = ["ndjson", "csv", "parquet"]
+TABLES = ["kegiatan", "variabel", "indikator"]
+KEGIATAN_SECTIONS = ["halaman_awal", "blok_1_3", "blok_4", "blok_5", "blok_6_8"]
+ROW_COLUMNS = ["activity_id", "user_id", "status", "updated_at"]
+PARQUET_BATCH_ROWS = 1000
+
+
+def _cell(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def flatten(record: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Pecah satu kegiatan (hasil get_activity / iter_activities) menjadi baris per tabel."""
+    data = record.get("data") or {}
+    activity_id = record.get("activity_id")
+
+    kegiatan = {k: record.get(k) for k in ROW_COLUMNS}
+    for key, value in data.items():
+        if key not in SECTIONS:
+            # row columns win over the copies kept in the payload (e.g. "status")
+            kegiatan.setdefault(key, _cell(value))
+    for sec in KEGIATAN_SECTIONS:
+        section = data.get(sec)
+        if isinstance(section, dict):
+            for key, value in section.items():
+                kegiatan[f"{sec}.{key}"] = _cell(value)
+
+    def items(section):
+        entries = data.get(section)
+        if not isinstance(entries, list):
+            return []
+        return [
+            {"activity_id": activity_id, "urutan": i + 1, **{k: _cell(v) for k, v in entry.items()}}
+            for i, entry in enumerate(entries)
+            if isinstance(entry, dict)
+        ]
+
+    return {"kegiatan": [kegiatan], "variabel": items("variables"), "indikator": items("indicators")}
+
+
+# -------------------------------------------------
+# Writers
+# -------------------------------------------------
+def _spool(records: Iterable[Dict[str, Any]], out_dir: str):
+    """Tulis NDJSON per tabel; mengembalikan (jumlah baris, kolom urut kemunculan) per tabel."""
+    counts = {table: 0 for table in TABLES}
+    columns: Dict[str, Dict[str, None]] = {table: {} for table in TABLES}
+    files = {table: open(os.path.join(out_dir, f"{table}.ndjson"), "w", encoding="utf-8") for table in TABLES}
+    try:
+        for record in records:
+            for table, rows in flatten(record).items():
+                for row in rows:
+                    files[table].write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+                    columns[table].update(dict.fromkeys(row))
+                    counts[table] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts, {table: list(cols) for table, cols in columns.items()}
+
+
+def _read_ndjson(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _to_csv(src: str, dst: str, columns: List[str]) -> None:
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval="", extrasaction="ignore")
+        writer.writeheader()
+        for row in _read_ndjson(src):
+            writer.writerow(row)
+
+
+def _to_parquet(src: str, dst: str, columns: List[str]) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # one string column per field: free-text answers do not have a stable type
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    with pq.ParquetWriter(dst, schema) as writer:
+        batch = []
+        for row in _read_ndjson(src):
+            batch.append({k: None if v is None else str(v) for k, v in row.items()})
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def export(out_dir: str, fmt: str = "ndjson", records: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, int]:
+    """
+    Ekspor semua kegiatan ke out_dir/<tabel>.<fmt> (kegiatan, variabel,
+    indikator). Tanpa `records`, kegiatan dibaca langsung dari sheet per
+    halaman. Mengembalikan jumlah baris per tabel.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    records = iter_activities() if records is None else records
+    if fmt == "ndjson":
+        counts, _ = _spool(records, out_dir)
+    else:
+        convert = _to_csv if fmt == "csv" else _to_parquet
+        with tempfile.TemporaryDirectory(prefix="ms_form_export_") as tmp:
+            counts, columns = _spool(records, tmp)
+            for table in TABLES:
+                convert(os.path.join(tmp, f"{table}.ndjson"), os.path.join(out_dir, f"{table}.{fmt}"), columns[table])
+    logger.info(f"exported {counts} as {fmt}")
+    return counts
+
+
+def export_archive(fileobj: IO[bytes], fmt: str = "ndjson") -> Dict[str, int]:
+    """Ekspor ke arsip zip (satu file per tabel) yang ditulis ke `fileobj`."""
+    with tempfile.TemporaryDirectory(prefix="ms_form_export_") as tmp:
+        counts = export(tmp, fmt)
+        with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for table in TABLES:
+                archive.write(os.path.join(tmp, f"{table}.{fmt}"), arcname=f"{table}.{fmt}")
+    return counts
+
+
+# -------------------------------------------------
+# Command line
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Export every activity to kegiatan / variabel / indikator tables.")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--out", default="export", help="output directory, or a .zip file")
+    args = parser.parse_args()
+
+    if args.out.endswith(".zip"):
+        with open(args.out, "wb") as f:
+            counts = export_archive(f, args.format)
+    else:
+        counts = export(args.out, args.format)
+    print(", ".join(f"{table}: {n} rows" for table, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
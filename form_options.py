@@ -0,0 +1,104 @@
+# -------------------------------------------------
+# Reference data shared by the pages
+# -------------------------------------------------
+STATUS_OPTIONS = ["draft", "submitted", "revision_requested", "verified", "rejected"]
+
+SEKTOR_OPTIONS = ["Pertanian dan Perikanan", "Demografi dan Kependudukan", "Pembangunan", "Proyeksi Ekonomi", "Pendidikan dan Pelatihan",
+        "Lingkungan", "Keuangan", "Globalisasi", "Kesehatan", "Industri dan Jasa",
+        "Teknologi Informasi dan Komunikasi", "Perdagangan Internasional dan Neraca Perdagangan", "Ketenagakerjaan", "Neraca Nasional",
+        "Indikator Ekonomi Bulanan", "Produktivitas", "Harga dan Paritas Daya Beli", 
+        "Sektor Publik, Perpajakan, dan Regulasi Pasar", "Perwilayahan dan Perkotaan",
+        "Ilmu Pengetahuan dan Hak Paten", "Perlindungan Sosial dan Kesejahteraan", "Transportasi"]
+
+# -------------------------------------------------
+# Form Page choices (module is imported once per process)
+# -------------------------------------------------
+JENIS_STATISTIK_OPTIONS = ["Statistik Dasar", "Statistik Sektoral", "Statistik Khusus"]
+YA_TIDAK_OPTIONS = ["Ya", "Tidak"]
+CARA_PENGUMPULAN_OPTIONS = [
+    "Pencacahan Lengkap", "Survei", "Kompilasi Produk Administrasi",
+    "Cara Lain Sesuai dengan Perkembangan TI"
+]
+FREKUENSI_OPTIONS = [
+    "Hanya Sekali", "Harian", "Mingguan", "Bulanan", "Triwulanan", "Empat Bulanan", "Semesteran", "Tahunan",
+    "Lebih dari Dua Tahunan"
+]
+TIPE_PENGUMPULAN_OPTIONS = ["Longitudinal Panel", "Longitudinal Cross Sectional", "Cross Sectional"]
+WILAYAH_OPTIONS = [
+    "SELURUH WILAYAH INDONESIA", "ACEH", "SUMATERA UTARA", "SUMATERA BARAT", "RIAU", "JAMBI",
+    "SUMATERA SELATAN", "BENGKULU", "LAMPUNG", "KEP. BANGKA BELITUNG", "KEP. RIAU", "DKI JAKARTA",
+    "JAWA BARAT", "JAWA TENGAH", "DI YOGYAKARTA", "JAWA TIMUR", "BANTEN", "BALI", "NUSA TENGGARA BARAT",
+    "NUSA TENGGARA TIMUR", "KALIMANTAN BARAT", "KALIMANTAN TENGAH", "KALIMANTAN SELATAN", "KALIMANTAN TIMUR",
+    "KALIMANTAN UTARA", "SULAWESI UTARA", "SULAWESI TENGAH", "SULAWESI SELATAN", "SULAWESI TENGGARA",
+    "GORONTALO", "SULAWESI BARAT", "MALUKU", "MALUKU UTARA", "PAPUA", "PAPUA BARAT", "PAPUA SELATAN",
+    "PAPUA TENGAH", "PAPUA PEGUNUNGAN", "PAPUA BARAT DAYA"
+]
+METODE_PENGUMPULAN_OPTIONS = [
+    "Wawancara", "Mengisi Kuesioner Sendiri", "Pengamatan", "Pengumpulan Data Sekunder", "Lainnya"
+]
+SARANA_PENGUMPULAN_OPTIONS = [
+    "Paper-assisted Personal Interviewing (PAPI)", "Computer-assisted Personal Interviewing (CAPI)",
+    "Computer-assisted Telephones Interviewing (CATI)", "Computer Aided Web Interviewing (CAWI)", "Mail",
+    "Lainnya"
+]
+UNIT_PENGUMPULAN_OPTIONS = ["Individu", "Rumah Tangga", "Usaha/Perusahaan", "Lainnya"]
+RANCANGAN_SAMPEL_OPTIONS = ["Single Stage atau Phase Dasar", "Multi Stage atau Phase"]
+METODE_PROBABILITY_OPTIONS = [
+    "Simple Random Sampling", "Systematic Random Sampling", "Stratified Random Sampling", "Cluster Sampling",
+    "Probability Proportional to Size Sampling"
+]
+KERANGKA_SAMPEL_OPTIONS = ["List Frame", "Area Frame"]
+METODE_NONPROBABILITY_OPTIONS = [
+    "Quota Sampling", "Accidental Sampling", "Purposive Sampling", "Snowball Sampling",
+    "Saturation Sampling"
+]
+QC_OPTIONS = ["Kunjungan Kembali", "Supervisi", "Task Force", "Lainnya"]
+INTERVIEW_BASED_SARANA = [
+    "Paper-assisted Personal Interviewing (PAPI)", "Computer-assisted Personal Interviewing (CAPI)",
+    "Computer-assisted Telephones Interviewing (CATI)"
+]
+PETUGAS_OPTIONS = [
+    "Staf Instansi Penyelenggara", "Mitra Atau Tenaga Kontrak",
+    "Staf Instansi Penyelenggara & Mitra Atau Tenaga Kontrak"
+]
+PENDIDIKAN_PETUGAS_OPTIONS = [
+    "Kurang Dari Atau Sama Dengan SMP", "SMA Atau SMK", "Diploma I/II/III", "Diploma IV atau S1/S2/S3"
+]
+METODE_ANALISIS_OPTIONS = ["Deskriptif", "Inferensia", "Deskriptif dan Inferensia"]
+UNIT_ANALISIS_OPTIONS = ["Individu", "Rumah Tangga", "Usaha/Perusahaan", "Lainnya"]
+TINGKAT_PENYAJIAN_OPTIONS = ["Nasional", "Provinsi", "Kabupaten/Kota", "Lainnya"]
+
+# -------------------------------------------------
+# Choice fields per section: field -> (options, multiple)
+# Mirrors the radios / multiselects of the Form Page; used to check
+# payloads that do not come through the form (bulk import).
+# -------------------------------------------------
+CHOICE_FIELDS = {
+    "halaman_awal": {
+        "jenis_statistik": (JENIS_STATISTIK_OPTIONS, False),
+        "rekomendasi": (YA_TIDAK_OPTIONS, False),
+        "cara_pengumpulan": (CARA_PENGUMPULAN_OPTIONS, False),
+        "sektor": (SEKTOR_OPTIONS, False),
+    },
+    "blok_4": {
+        "iv_frekuensi_penyelenggaraan": (FREKUENSI_OPTIONS, False),
+        "iv_tipe_pengumpulan_data": (TIPE_PENGUMPULAN_OPTIONS, False),
+        "iv_sebagian_cakupan_wilayah_pengumpulan_data": (WILAYAH_OPTIONS, True),
+        "metode_utama": (METODE_PENGUMPULAN_OPTIONS, True),
+        "sarana_utama": (SARANA_PENGUMPULAN_OPTIONS, True),
+        "unit_utama": (UNIT_PENGUMPULAN_OPTIONS, True),
+    },
+    "blok_5": {
+        "v_jenis_rancangan_sampel": (RANCANGAN_SAMPEL_OPTIONS, False),
+        "v_metode_yang_digunakan": (METODE_PROBABILITY_OPTIONS + METODE_NONPROBABILITY_OPTIONS, False),
+        "v_kerangka_sampel_tahap_akhir": (KERANGKA_SAMPEL_OPTIONS, False),
+    },
+    "blok_6_8": {
+        "qc_utama": (QC_OPTIONS, True),
+        "vi_petugas_pengumpulan_data": (PETUGAS_OPTIONS, False),
+        "vi_persyaratan_pendidikan_terendah_petugas_pengumpulan_data": (PENDIDIKAN_PETUGAS_OPTIONS, False),
+        "vii_metode_analisis": (METODE_ANALISIS_OPTIONS, False),
+        "unit_analisis_utama": (UNIT_ANALISIS_OPTIONS, True),
+        "penyajian_utama": (TINGKAT_PENYAJIAN_OPTIONS, True),
+    },
+}
@@ -1,12 +1,28 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 import json
 import logging
 import streamlit as st
 import datetime
 import decimal
+import re
+import threading
+import time
+import uuid
 
-import gspread
-from google.oauth2.service_account import Credentials
+import aggregates
+import breaker
+import catalog
+import change_feed
+import dependency_graph
+import journal
+import replica
+import search_index
+import singleflight
+import swr_cache
+import validation
+
+# gspread / google-auth are imported inside _open_spreadsheet() so pages can
+# import this module (e.g. for the login screen) without paying for them.
 
 # -------------------------------------------------
 # Logger
@@ -29,19 +45,210 @@ SCOPES = [
 SHEET_NAME = "MS Form Temp Table"      # Google Sheet file name
 WORKSHEET_NAME = "Sheet1"        # Tab name
 
+# Form sections are stored one per column (F..L) so a save only rewrites
+# the cells of the sections that changed. Column D keeps the remaining
+# top-level payload keys (owner, last_saved, revision metadata, ...).
+# Column M holds the journal write_keys last applied to the row (not part
+# of the payload); they are written in the same batch_update as the data.
+SECTIONS = [
+    "halaman_awal",
+    "blok_1_3",
+    "variables",
+    "blok_4",
+    "blok_5",
+    "blok_6_8",
+    "indicators",
+]
+LIST_SECTIONS = {"variables", "indicators"}
+
+COLUMNS = ["activity_id", "user_id", "status", "data", "updated_at"] + SECTIONS + ["write_keys"]
+LAST_COLUMN = chr(ord("A") + len(COLUMNS) - 1)
+WRITE_KEYS_KEPT = 20        # applied keys remembered per row
+
+_schema_checked = False
+
+# -------------------------------------------------
+# Storage mode
+# -------------------------------------------------
+# "sheet"  : one row per activity, updated in place (default)
+# "events" : every save / status change is appended to EVENTS_WORKSHEET;
+#            readers fold the event tail on top of SNAPSHOTS_WORKSHEET,
+#            which is rewritten periodically by compact_event_log().
+EVENTS_WORKSHEET = "Events"
+SNAPSHOTS_WORKSHEET = "Snapshots"
+EVENT_COLUMNS = ["event_id", "activity_id", "type", "user_id", "status", "diff", "actor", "comment", "timestamp"]
+SNAPSHOT_COLUMNS = ["activity_id", "user_id", "status", "data", "updated_at", "through_event"]
+EVENT_COMPACT_EVERY = 200   # compact once the unsnapshotted tail is this long
+
+# Verifier work claims: append-only lease log, see claim_activities()
+CLAIMS_WORKSHEET = "Claims"
+CLAIM_COLUMNS = ["activity_id", "verifier", "claimed_at", "expires_at"]
+LEASE_SECONDS = 15 * 60
+RENEW_BEFORE_SECONDS = LEASE_SECONDS // 3   # a lease with less than this left gets renewed
+CLAIMS_COMPACT_AFTER = 200  # dead rows (renewals, releases, expired leases) before the log is rewritten
+
+# Secondary index user_id / (user_id, status) -> sheet row, see _user_rows()
+USER_INDEX_WORKSHEET = "UserIndex"
+USER_INDEX_COLUMNS = ["activity_id", "user_id", "status", "row"]
+USER_INDEX_TTL = 30         # seconds before the in-memory mirror is re-read
+
+# Staleness bound (seconds) of the cached list views per page; override
+# with a [cache_max_age] table in secrets.toml. See swr_cache.
+VIEW_MAX_AGE = {"dashboard": 60, "verification": 15}
+
+# Rows per ws.get when streaming the whole sheet (iter_activities / export)
+EXPORT_PAGE_ROWS = 500
+
+# Full rebuild of the host-local aggregates store at most this often, see
+# _query_from_aggregates()
+AGGREGATES_REFRESH_SECONDS = 300
+
+# Writes of other hosts reach the host-local search index, catalog and
+# dependency graph at most this late, see sync_local_indexes()
+LOCAL_INDEX_SYNC_SECONDS = 120
+
+
+def storage_mode() -> str:
+    return st.secrets.get("storage_mode", "sheet")
+
+
+def _event_mode() -> bool:
+    return storage_mode() == "events"
+
+
+def _replica_mode() -> bool:
+    # read_replica = true in secrets.toml: list / query / aggregate reads
+    # are answered from the local replica (see replica.py)
+    return bool(st.secrets.get("read_replica", False))
+
+
+def view_max_age(view: str) -> float:
+    overrides = st.secrets.get("cache_max_age", {})
+    return float(overrides.get(view, VIEW_MAX_AGE.get(view, swr_cache.MAX_AGE_SECONDS)))
+
+
+# -------------------------------------------------
+# Deadlines and circuit breaker
+# -------------------------------------------------
+# Every Google API call (opening the file, every worksheet method) goes
+# through breaker.call(): it gets a deadline, and repeated failures or
+# timeouts open the breaker. While open, calls raise BreakerOpen at once;
+# list reads then fall back to their cached result, get_activity to the
+# last copy it read, and save_activity leaves the save in the journal.
+class _Guarded:
+    """Spreadsheet / Worksheet wrapper: method calls run under the breaker."""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def guarded(*args, **kwargs):
+            result = breaker.call(attr, *args, is_failure=_is_outage, **kwargs)
+            # worksheets handed out by the spreadsheet are guarded too
+            return _Guarded(result) if hasattr(result, "get_all_values") else result
+
+        return guarded
+
+
+def _is_outage(e: BaseException) -> bool:
+    """Hanya error yang menandakan Google bermasalah (5xx, 429, jaringan) dihitung breaker."""
+    import gspread
+
+    if isinstance(e, gspread.exceptions.WorksheetNotFound):
+        return False
+    api_error = getattr(gspread.exceptions, "APIError", None)
+    if api_error is not None and isinstance(e, api_error):
+        code = getattr(getattr(e, "response", None), "status_code", None)
+        return code is None or code == 429 or code >= 500
+    return True
+
+
+def breaker_status() -> Dict[str, Any]:
+    """State breaker (closed / open / half_open) beserta jumlah gagal, timeout dan panggilan yang ditolak."""
+    return breaker.status()
+
+
+def _open_spreadsheet():
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    change_feed.subscribe(_on_remote_changes)
+    journal.start(_apply_journal_entry)   # saves queued by an earlier run are sent too
 
-# @st.cache_resource
-def get_worksheet():
     creds_dict = st.secrets["gcp_service_account"]
     creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
     client = gspread.authorize(creds)
+    if hasattr(client, "set_timeout"):
+        # HTTP-level timeout frees a worker stuck on a hung response
+        client.set_timeout(breaker.CALL_TIMEOUT)
 
-    sheet = client.open(SHEET_NAME)
+    return _Guarded(breaker.call(client.open, SHEET_NAME, is_failure=_is_outage))
+
+
+# @st.cache_resource
+def get_worksheet():
+    sheet = _open_spreadsheet()
     ws = sheet.worksheet(WORKSHEET_NAME)
+    _ensure_schema(ws)
     return ws
 
+
+def _get_side_worksheet(title: str, header: List[str]):
+    """Buka worksheet pendukung; dibuat beserta header-nya bila belum ada."""
+    import gspread
+
+    sheet = _open_spreadsheet()
+    try:
+        return sheet.worksheet(title)
+    except gspread.exceptions.WorksheetNotFound:
+        ws = sheet.add_worksheet(title=title, rows=1000, cols=len(header))
+        ws.update("A1", [header])
+        _note_write(title)
+        return ws
+
+
+def _ensure_schema(ws):
+    """Tambahkan header kolom section (F..L) dan write_keys (M) pada sheet lama, sekali per proses."""
+    global _schema_checked
+    if _schema_checked:
+        return
+
+    header = [h.strip() for h in ws.row_values(1)]
+    if header[:len(COLUMNS)] != COLUMNS:
+        ws.update(f"A1:{LAST_COLUMN}1", [COLUMNS])
+        _note_write(WORKSHEET_NAME)
+    _schema_checked = True
+
+# Reads go through _fetch(): identical reads already in flight in this
+# process share one request (see singleflight). The key carries a per-
+# worksheet write counter, so a read issued after a local write never
+# joins a fetch that started before it.
+_write_gen_lock = threading.Lock()
+_write_gen: Dict[str, int] = {}
+
+
+def _note_write(title: str) -> None:
+    with _write_gen_lock:
+        _write_gen[title] = _write_gen.get(title, 0) + 1
+
+
+def _fetch(ws, rng: Optional[str] = None):
+    """Nilai worksheet (seluruhnya atau satu range); hasilnya dipakai bersama, jangan diubah."""
+    key = (ws.title, rng or "*", _write_gen.get(ws.title, 0))
+    return singleflight.do(key, lambda: ws.get(rng) if rng else ws.get_all_values())
+
+
+def read_stats() -> Dict[str, Any]:
+    """Jumlah fetch ke Sheets dan jumlah pemanggil yang digabung ke fetch yang sedang berjalan."""
+    return singleflight.stats()
+
+
 def _get_all_rows(ws):
-    rows = ws.get_all_values()
+    rows = _fetch(ws)
     if len(rows) < 2:
         return []
 
@@ -69,175 +276,2102 @@ def _now():
     return datetime.datetime.utcnow().isoformat()
 
 
+def _col(name: str) -> str:
+    return chr(ord("A") + COLUMNS.index(name))
+
+
+def _last_col(header: List[str]) -> str:
+    return chr(ord("A") + len(header) - 1)
+
+
+def _col_of(header: List[str], name: str) -> str:
+    return chr(ord("A") + header.index(name))
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _split_payload(payload: Dict[str, Any]):
+    """Pisahkan payload menjadi metadata (kolom D) dan isi per section."""
+    root = {k: v for k, v in payload.items() if k not in SECTIONS}
+    sections = {k: payload[k] for k in SECTIONS if k in payload}
+    return root, sections
+
+
+def _merges_to(before, after) -> bool:
+    # an {index: item} patch merges keys into the old item, so it cannot
+    # express a removed key or a non-dict item: those need the whole list
+    return before == after or (isinstance(before, dict) and isinstance(after, dict) and set(before) <= set(after))
+
+
+def diff_payload(old: Dict[str, Any], new: Dict[str, Any]):
+    """
+    Kebalikan dari _merge_section: hasilkan (sections, meta) berisi hanya
+    bagian yang berbeda, siap dikirim ke patch_activity(merge=True).
+    """
+    old = make_json_safe(old or {})
+    new = make_json_safe(new or {})
+
+    sections = {}
+    for sec in SECTIONS:
+        if sec not in new or new[sec] == old.get(sec):
+            continue
+        before, after = old.get(sec), new[sec]
+
+        if sec in LIST_SECTIONS and isinstance(before, list) and isinstance(after, list) \
+                and len(before) == len(after) and all(_merges_to(a, item) for a, item in zip(before, after)):
+            sections[sec] = {i: item for i, (a, item) in enumerate(zip(before, after)) if a != item}
+        elif isinstance(before, dict) and isinstance(after, dict) and set(before) <= set(after):
+            sections[sec] = {k: v for k, v in after.items() if before.get(k, object()) != v}
+        else:
+            sections[sec] = after
+
+    meta = {
+        k: v for k, v in new.items()
+        if k not in SECTIONS and old.get(k, object()) != v
+    }
+    return sections, meta
+
+
+def _decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Gabungkan kolom data (D) dengan kolom section menjadi satu payload."""
+    try:
+        data = json.loads(row["data"]) if row.get("data") else {}
+    except json.JSONDecodeError:
+        logger.error(f"Invalid JSON in activity_id={row.get('activity_id')}")
+        data = {}
+
+    for sec in SECTIONS:
+        raw = row.pop(sec, "")
+        if not raw:
+            continue  # legacy rows keep their sections inside column D
+        try:
+            data[sec] = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON in activity_id={row.get('activity_id')} section={sec}")
+
+    row.pop("write_keys", None)
+    data.pop("write_key", None)     # older rows kept the last key in column D
+    row["data"] = data
+    return row
+
+
+def _applied_keys(raw: str) -> List[str]:
+    try:
+        keys = json.loads(raw) if raw else []
+    except json.JSONDecodeError:
+        return []
+    return keys if isinstance(keys, list) else []
+
+
+def _with_key(raw: str, write_key: str) -> str:
+    return _dumps((_applied_keys(raw) + [write_key])[-WRITE_KEYS_KEPT:])
+
+
+def _merge_section(section: str, current, patch, merge: bool = True):
+    """
+    Terapkan patch ke satu section.
+
+    - dict section: key pada patch menimpa key lama (shallow merge)
+    - list section: list utuh menggantikan isi lama, sedangkan dict
+      {index: item} hanya memperbarui item tersebut (mis. satu indikator);
+      tanpa isi lama, item-item patch menjadi list urut index
+    """
+    if not merge or current is None:
+        current = [] if section in LIST_SECTIONS else {}
+
+    if section in LIST_SECTIONS:
+        if isinstance(patch, dict):
+            items = list(current) if isinstance(current, list) else []
+            # int() rejects non-index keys; sorting keeps appended items in order
+            for idx, item in sorted(((int(i), item) for i, item in patch.items()), key=lambda p: p[0]):
+                if idx < len(items) and isinstance(items[idx], dict) and isinstance(item, dict):
+                    items[idx] = {**items[idx], **item}
+                elif idx < len(items):
+                    items[idx] = item
+                else:
+                    items.append(item)
+            return items
+        return patch
+
+    if isinstance(patch, dict) and isinstance(current, dict):
+        return {**current, **patch}
+    return patch
+
+
 def _find_row(ws, activity_id: str) -> Optional[int]:
-    records = _get_all_rows(ws)
-    for idx, row in enumerate(records, start=2):
-        if row.get("activity_id") == activity_id:
+    # only column A is downloaded, not the JSON payload columns
+    ids = ws.col_values(1)
+    for idx, value in enumerate(ids[1:], start=2):
+        if value == activity_id:
             return idx
     return None
 
 
+def _halaman_awal_dims(sections: Dict[str, Any]) -> Dict[str, Any]:
+    halaman_awal = sections.get("halaman_awal")
+    if not isinstance(halaman_awal, dict):
+        return {}
+    return {k: halaman_awal[k] for k in ("sektor", "tahun") if k in halaman_awal}
+
+
+def _track(activity_id: str, changes: Optional[Dict[str, Any]] = None, defaults=None, removed: bool = False) -> None:
+    """Perbarui penghitung agregat; kegagalan di sini tidak menggagalkan simpan."""
+    try:
+        if removed:
+            aggregates.remove(activity_id)
+        else:
+            # every tracked write also moves updated_at, a Dashboard sort key
+            aggregates.record(activity_id, {"updated_at": _now(), **(changes or {})}, defaults)
+    except Exception:
+        logger.exception("aggregate update failed")
+
+
+# Host-local indexes kept current by every write of this host; each one
+# exposes SOURCE_SECTIONS and the local_store.ActivityStore functions.
+# Writes of other hosts come in through sync_local_indexes().
+LOCAL_INDEXES = (search_index, catalog, dependency_graph)
+
+
+def _reindex(
+    activity_id: str,
+    user_id: Optional[str],
+    status: Optional[str],
+    sections: Optional[Dict[str, Any]],
+    merge: bool,
+    payload: Optional[Dict[str, Any]],
+    removed: bool,
+) -> None:
+    """Perbarui indeks lokal (pencarian, katalog, graf); kegagalan di sini tidak menggagalkan simpan."""
+    for index in LOCAL_INDEXES:
+        try:
+            if removed:
+                index.remove(activity_id)
+            elif payload is not None:
+                index.put(activity_id, user_id, status, payload)
+            elif any(sec in index.SOURCE_SECTIONS for sec in sections or {}):
+                source = index.indexed_source(activity_id)
+                if source is None:
+                    continue  # not indexed yet: the next sync brings it in
+                for sec, value in sections.items():
+                    if sec in index.SOURCE_SECTIONS:
+                        source[sec] = _merge_section(sec, source.get(sec), value, merge)
+                # user_id of a patch is the writer, not necessarily the owner
+                index.put(activity_id, None, status, source)
+            elif status:
+                index.set_status(activity_id, status)
+        except Exception:
+            logger.exception(f"{index.__name__} update failed")
+
+
+def _cache_apply(
+    activity_id: str,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    sections: Optional[Dict[str, Any]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    merge: bool = True,
+    payload: Optional[Dict[str, Any]] = None,
+    removed: bool = False,
+) -> None:
+    """
+    Terapkan tulisan proses ini ke list yang di-cache, supaya user langsung
+    melihat simpanannya sendiri, lalu umumkan ke worker lain lewat
+    change_feed. `payload` = isi lengkap (upsert); tanpa itu perubahan
+    diterapkan di atas baris cache yang lama.
+    """
+    now = _now()
+    if payload is not None:
+        payload = json.loads(_dumps(payload))   # detached from the caller's dict
+
+    def patched(old):
+        if payload is not None:
+            return {"activity_id": activity_id, "user_id": user_id, "status": status, "updated_at": now, "data": payload}
+        data = dict(old["data"])
+        data.update(meta or {})
+        for sec, value in (sections or {}).items():
+            data[sec] = _merge_section(sec, data.get(sec), value, merge)
+        return {**old, "status": status or old["status"], "updated_at": now, "data": data}
+
+    def as_record(summary):
+        # enough of the payload for _summarize() to give the same summary back
+        halaman_awal = {k: summary[k] for k in ("judul", "tahun", "sektor")}
+        return {**summary, "data": {"halaman_awal": halaman_awal, "last_saved": summary["last_saved"]}}
+
+    def apply(key, rows):
+        kind, want_status, want_user = key
+        idx = next((i for i, r in enumerate(rows) if r["activity_id"] == activity_id), None)
+        if removed:
+            return rows if idx is None else rows[:idx] + rows[idx + 1:]
+
+        if idx is None:
+            if want_status and status != want_status:
+                return rows
+            if want_user and user_id is not None and user_id != want_user:
+                return rows
+            if payload is None:
+                return swr_cache.DROP   # may belong here now, but the full row is unknown
+            record = patched(None)
+        else:
+            old = rows[idx]
+            record = patched(old if kind == "records" else as_record(old))
+
+        item = record if kind == "records" else _summarize(record, record["data"])
+        keep = (not want_status or item["status"] == want_status) and (not want_user or item["user_id"] == want_user)
+        out = list(rows)
+        if idx is None:
+            if keep:
+                out.append(item)
+        elif keep:
+            out[idx] = item
+        else:
+            del out[idx]
+        return out
+
+    try:
+        swr_cache.update("summaries", apply)
+        swr_cache.update("records", apply)
+    except Exception:
+        logger.exception("list cache update failed")
+
+    with _last_good_lock:
+        if removed:
+            _last_good.pop(activity_id, None)
+        elif activity_id in _last_good or payload is not None:
+            _last_good[activity_id] = patched(_last_good.get(activity_id))
+
+    if _replica_mode():
+        try:
+            if removed:
+                replica.delete(activity_id)
+            else:
+                old = replica.get(activity_id)
+                if payload is not None or old is not None:
+                    replica.put(patched(old))
+                # otherwise the next sync brings the row in
+        except Exception:
+            logger.exception("replica update failed")
+
+    _reindex(activity_id, user_id, status, sections, merge, payload, removed)
+
+    if removed:
+        kind = "delete"
+    elif payload is not None:
+        kind = "upsert"
+    elif sections or meta:
+        kind = "patch"
+    else:
+        kind = "status"
+    change_feed.publish(activity_id, kind, user_id=user_id, status=status)
+
+
+def _on_remote_changes(changes: List[Dict[str, Any]]) -> None:
+    """
+    Tulisan dari worker lain (lewat change_feed): buang list cache yang
+    memuat, atau bisa memuat, kegiatan yang berubah. user_id / status
+    None dianggap bisa cocok dengan filter apa pun.
+    """
+    # reads issued from now on must not join a fetch from before the write
+    _note_write(WORKSHEET_NAME)
+    _note_write(EVENTS_WORKSHEET)
+    if any(c["kind"] != "patch" for c in changes):
+        _invalidate_user_index()
+
+    def evict(key, rows):
+        kind, want_status, want_user = key
+        cached = {r["activity_id"] for r in rows}
+        for c in changes:
+            if c["activity_id"] in cached:
+                return swr_cache.DROP
+            if c["kind"] == "delete":
+                continue
+            if want_status and c["status"] is not None and c["status"] != want_status:
+                continue
+            if want_user and c["user_id"] is not None and c["user_id"] != want_user:
+                continue
+            return swr_cache.DROP
+        return rows
+
+    swr_cache.update("summaries", evict)
+    swr_cache.update("records", evict)
+
+
 # -------------------------------------------------
-# CORE FUNCTIONS (same names as before)
+# Per-user secondary index
 # -------------------------------------------------
-def upsert_activity(activity_id: str, user_id: str, payload: Dict[str, Any], status: str = "draft"):
-    try:
-        ws = get_worksheet()
+# The UserIndex worksheet maps every activity to its owner, status and
+# row in the main sheet; each process mirrors it in memory. A user's
+# listing then reads just their rows with one batch_get. Every fetched
+# row is checked against the index, and a mismatch (rows shifted by
+# another process, for example) triggers a rebuild from the main sheet.
+_user_index_lock = threading.Lock()
+_user_index: Dict[str, Any] = {"entries": None, "loaded_at": 0.0}
 
-        clean_payload = make_json_safe(payload)
-        json_data = json.dumps(clean_payload, ensure_ascii=False)
 
-        row_idx = _find_row(ws, activity_id)
+def _row_from_range(updated_range: str) -> Optional[int]:
+    match = re.search(r"![A-Z]+(\d+)", updated_range or "")
+    return int(match.group(1)) if match else None
 
-        row_data = [
-            activity_id,
-            user_id,
-            status,
-            json_data,
-            _now(),
-        ]
 
-        if row_idx:
-            ws.update(f"A{row_idx}:E{row_idx}", [row_data])
+def _index_ws():
+    return _get_side_worksheet(USER_INDEX_WORKSHEET, USER_INDEX_COLUMNS)
+
+
+def rebuild_user_index() -> Dict[str, Dict[str, Any]]:
+    """Bangun ulang indeks dari kolom A..C sheet utama dan tulis ke UserIndex."""
+    rows = _fetch(get_worksheet(), f"A2:{_col('status')}")
+    entries = {}
+    for row_no, r in enumerate(rows, start=2):
+        if not r or not r[0]:
+            continue
+        r = r + [""] * (3 - len(r))
+        entries[r[0]] = {"user_id": r[1], "status": r[2], "row": row_no, "index_row": len(entries) + 2}
+
+    ws = _index_ws()
+    ws.clear()
+    ws.update("A1", [USER_INDEX_COLUMNS] + [
+        [aid, e["user_id"], e["status"], e["row"]] for aid, e in entries.items()
+    ])
+    _note_write(USER_INDEX_WORKSHEET)
+
+    with _user_index_lock:
+        _user_index["entries"] = entries
+        _user_index["loaded_at"] = time.time()
+    return entries
+
+
+def _load_user_index(force: bool = False) -> Dict[str, Dict[str, Any]]:
+    with _user_index_lock:
+        fresh = time.time() - _user_index["loaded_at"] < USER_INDEX_TTL
+        if _user_index["entries"] is not None and fresh and not force:
+            return _user_index["entries"]
+
+    rows = _fetch(_index_ws())
+    if len(rows) < 2:
+        # brand-new (or wiped) index sheet
+        return rebuild_user_index()
+
+    entries = {}
+    for index_row, r in enumerate(rows[1:], start=2):
+        r = r + [""] * (len(USER_INDEX_COLUMNS) - len(r))
+        if not r[0] or not str(r[3]).isdigit():
+            continue
+        entries[r[0]] = {"user_id": r[1], "status": r[2], "row": int(r[3]), "index_row": index_row}
+
+    with _user_index_lock:
+        _user_index["entries"] = entries
+        _user_index["loaded_at"] = time.time()
+    return entries
+
+
+def _invalidate_user_index() -> None:
+    with _user_index_lock:
+        _user_index["loaded_at"] = 0.0
+
+
+def _index_put(activity_id: str, user_id: str, status: str, row: Optional[int]) -> None:
+    """Catat/ubah satu entri; tidak ada panggilan API bila tidak ada yang berubah."""
+    if _event_mode() or not row:
+        return
+    try:
+        entries = _load_user_index()
+        entry = entries.get(activity_id)
+        if entry and (entry["user_id"], entry["status"], entry["row"]) == (user_id, status, row):
+            return
+
+        ws = _index_ws()
+        values = [activity_id, user_id, status, row]
+        if entry:
+            ws.update(f"A{entry['index_row']}:D{entry['index_row']}", [values])
+            entry.update({"user_id": user_id, "status": status, "row": row})
         else:
-            ws.append_row(row_data)
+            resp = ws.append_row(values, value_input_option="RAW")
+            index_row = _row_from_range(resp.get("updates", {}).get("updatedRange"))
+            with _user_index_lock:
+                entries[activity_id] = {"user_id": user_id, "status": status, "row": row, "index_row": index_row}
+        _note_write(USER_INDEX_WORKSHEET)
 
-        return True, {
-            "activity_id": activity_id,
-            "user_id": user_id,
-            "status": status,
-            "data": clean_payload,
-        }
+    except Exception:
+        logger.exception("user index update failed")
+        _invalidate_user_index()
 
-    except Exception as e:
-        logger.exception("upsert_activity failed")
-        return False, None
 
+def _index_append(rows: List[List[Any]]) -> None:
+    """Entri baru [activity_id, user_id, status, row] sekaligus, satu append_rows."""
+    if _event_mode() or not rows:
+        return
+    try:
+        entries = _load_user_index()
+        resp = _index_ws().append_rows(rows, value_input_option="RAW")
+        first = _row_from_range((resp or {}).get("updates", {}).get("updatedRange"))
+        _note_write(USER_INDEX_WORKSHEET)
+        if first is None:
+            _invalidate_user_index()
+            return
+        with _user_index_lock:
+            for offset, (aid, user_id, status, row) in enumerate(rows):
+                entries[aid] = {"user_id": user_id, "status": status, "row": row, "index_row": first + offset}
 
-def get_activity(activity_id: str) -> Optional[Dict]:
+    except Exception:
+        logger.exception("user index update failed")
+        _invalidate_user_index()
+
+
+def _index_set_status(activity_ids: List[str], status: str) -> None:
+    if _event_mode() or not activity_ids:
+        return
     try:
-        ws = get_worksheet()
-        records = _get_all_rows(ws)
+        entries = _load_user_index()
+        targets = [entries[aid] for aid in activity_ids if aid in entries and entries[aid]["status"] != status]
+        if not targets:
+            return
+        _index_ws().batch_update([
+            {"range": f"C{e['index_row']}", "values": [[status]]} for e in targets
+        ])
+        _note_write(USER_INDEX_WORKSHEET)
+        for e in targets:
+            e["status"] = status
 
-        for row in records:
-            if row["activity_id"] == activity_id:
-                row["data"] = json.loads(row["data"]) if row.get("data") else {}
-                return row
+    except Exception:
+        logger.exception("user index update failed")
+        _invalidate_user_index()
 
-        return None
+
+def _index_delete(activity_id: str, deleted_row: int) -> None:
+    # delete_rows shifts every row below; deletes are rare, so rewrite
+    if _event_mode():
+        return
+    try:
+        entries = _load_user_index(force=True)
+        entries.pop(activity_id, None)
+        ws = _index_ws()
+        rows = []
+        for aid, e in entries.items():
+            if e["row"] > deleted_row:
+                e["row"] -= 1
+            e["index_row"] = len(rows) + 2
+            rows.append([aid, e["user_id"], e["status"], e["row"]])
+        ws.clear()
+        ws.update("A1", [USER_INDEX_COLUMNS] + rows)
+        _note_write(USER_INDEX_WORKSHEET)
 
     except Exception:
-        logger.exception("get_activity failed")
-        return None
+        logger.exception("user index update failed")
+        _invalidate_user_index()
 
 
-def list_all_activities():
-    ws = get_worksheet()
-    rows = ws.get_all_values()
+def _user_rows(user_id: str, status: Optional[str] = None, last_col: str = LAST_COLUMN) -> Optional[List[Dict[str, Any]]]:
+    """
+    Baris milik satu user (opsional satu status) lewat indeks: satu
+    batch_get berisi hanya baris-baris tersebut. None = indeks tidak
+    cocok dengan sheet, pemanggil harus scan penuh.
+    """
+    try:
+        entries = _load_user_index()
+    except Exception:
+        logger.exception("user index unavailable")
+        return None
 
-    if not rows:
+    wanted = sorted(
+        (e["row"], aid) for aid, e in entries.items()
+        if e["user_id"] == user_id and (not status or e["status"] == status)
+    )
+    if not wanted:
         return []
 
-    header = rows[0]
-    data_rows = rows[1:]
+    header = COLUMNS[:ord(last_col) - ord("A") + 1]
+    ranges = get_worksheet().batch_get([f"A{row}:{last_col}{row}" for row, _ in wanted])
 
     out = []
-    for r in data_rows:
-        row = dict(zip(header, r))
+    for (row, aid), value_range in zip(wanted, ranges):
+        values = value_range[0] if value_range else []
+        record = dict(zip(header, values + [""] * (len(header) - len(values))))
+        if record["activity_id"] != aid or record["user_id"] != user_id:
+            logger.info(f"user index out of date at row {row}, rebuilding")
+            rebuild_user_index()
+            return None
+        out.append(record)
+    return out
 
-        try:
-            row["data"] = json.loads(row["data"]) if row.get("data") else {}
-        except json.JSONDecodeError:
-            logger.error(
-                f"Invalid JSON in activity_id={row.get('activity_id')}"
-            )
-            row["data"] = {}  # or continue to skip
 
-        out.append(row)
+# -------------------------------------------------
+# Event log storage mode
+# -------------------------------------------------
+def _make_event(
+    activity_id: str,
+    event_type: str,
+    user_id: str = "",
+    status: str = "",
+    diff: Optional[Dict[str, Any]] = None,
+    actor: Optional[str] = None,
+    comment: Optional[str] = None,
+    event_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "event_id": event_id or str(uuid.uuid4()),
+        "activity_id": activity_id,
+        "type": event_type,
+        "user_id": user_id or "",
+        "status": status or "",
+        "diff": _dumps(make_json_safe(diff or {})),
+        "actor": actor or user_id or "",
+        "comment": comment or "",
+        "timestamp": _now(),
+    }
 
-    return out
 
+def _append_events(events: List[Dict[str, Any]]) -> None:
+    """Satu append per perubahan (atau per batch): tanpa pencarian baris, tanpa overwrite."""
+    ws = _get_side_worksheet(EVENTS_WORKSHEET, EVENT_COLUMNS)
+    ws.append_rows([[e[c] for c in EVENT_COLUMNS] for e in events], value_input_option="RAW")
+    _note_write(EVENTS_WORKSHEET)
 
-def list_activities_for_user(user_id: str, status: Optional[str] = None, limit: int = 200):
-    ws = get_worksheet()
-    records = _get_all_rows(ws)
 
-    out = []
-    for r in records:
-        if r["user_id"] != user_id:
-            continue
-        if status and r["status"] != status:
+def _append_event(activity_id: str, event_type: str, *args, **kwargs) -> Dict[str, Any]:
+    event = _make_event(activity_id, event_type, *args, **kwargs)
+    _append_events([event])
+    return event
+
+
+def _apply_event(state: Dict[str, Dict[str, Any]], event: Dict[str, Any]) -> None:
+    activity_id = event.get("activity_id")
+    event_type = event.get("type")
+    try:
+        diff = json.loads(event["diff"]) if event.get("diff") else {}
+    except json.JSONDecodeError:
+        logger.error(f"Invalid event diff event_id={event.get('event_id')}")
+        return
+    # older events carried the journal key inside the payload; the event_id is the key now
+    for part in ("payload", "meta"):
+        if isinstance(diff.get(part), dict):
+            diff[part].pop("write_key", None)
+
+    current = state.get(activity_id)
+
+    if event_type == "delete":
+        state.pop(activity_id, None)
+
+    elif event_type == "patch" and current is None and not event.get("user_id"):
+        # ownerless patch (bulk status change) for an unknown id: appended
+        # without an existence check, so it must not fold into a new record
+        return
+
+    elif event_type == "upsert" or (event_type == "patch" and current is None):
+        if event_type == "upsert":
+            data = diff.get("payload", {})
+        else:
+            sections = diff.get("sections", {})
+            data = {**diff.get("meta", {}), **{sec: _merge_section(sec, None, p) for sec, p in sections.items()}}
+        state[activity_id] = {
+            "activity_id": activity_id,
+            "user_id": event.get("user_id", ""),
+            "status": event.get("status") or "draft",
+            "data": data,
+            "updated_at": event.get("timestamp", ""),
+        }
+
+    elif event_type == "patch":
+        data = dict(current["data"])
+        data.update(diff.get("meta", {}))
+        for sec, patch in diff.get("sections", {}).items():
+            data[sec] = _merge_section(sec, data.get(sec), patch, diff.get("merge", True))
+        current["data"] = data
+        current["status"] = event.get("status") or current["status"]
+        current["updated_at"] = event.get("timestamp", "")
+
+    elif event_type == "status" and current is not None:
+        current["status"] = event.get("status") or current["status"]
+        current["updated_at"] = event.get("timestamp", "")
+        if diff.get("verifier"):
+            current["data"]["verified_by"] = diff["verifier"]
+        if event.get("comment"):
+            current["data"]["verifier_comment"] = event["comment"]
+
+
+def _fold_events(state: Dict[str, Dict[str, Any]], tail: List[Dict[str, Any]]) -> None:
+    # a journal replay whose acknowledgement was lost appends the same
+    # event_id (its write_key) twice; only the first one counts
+    seen = set()
+    for event in tail:
+        if event.get("event_id") in seen:
             continue
+        seen.add(event.get("event_id"))
+        _apply_event(state, event)
+
 
+def _load_snapshots():
+    ws = _get_side_worksheet(SNAPSHOTS_WORKSHEET, SNAPSHOT_COLUMNS)
+    state = {}
+    through = 1     # row 1 of the event sheet is the header
+    for row in _get_all_rows(ws):
         try:
-            r["data"] = json.loads(r["data"]) if r.get("data") else {}
+            row["data"] = json.loads(row["data"]) if row.get("data") else {}
         except json.JSONDecodeError:
-            logger.error(f"Invalid JSON in row activity_id={r.get('activity_id')}")
-            r["data"] = {}  # or skip row
+            logger.error(f"Invalid snapshot JSON activity_id={row.get('activity_id')}")
+            row["data"] = {}
+        row["data"].pop("write_key", None)
+        through = max(through, int(row.pop("through_event", 0) or 0))
+        state[row["activity_id"]] = row
+    return state, through
 
-        out.append(r)
 
-    return out[:limit]
+def _load_event_tail(through: int) -> List[Dict[str, Any]]:
+    ws = _get_side_worksheet(EVENTS_WORKSHEET, EVENT_COLUMNS)
+    rows = _fetch(ws, f"A{through + 1}:{_last_col(EVENT_COLUMNS)}")
+    return [dict(zip(EVENT_COLUMNS, r)) for r in rows if r]
 
 
-def list_submitted_activities(limit: int = 500):
-    ws = get_worksheet()
-    records = _get_all_rows(ws)
+def _write_snapshots(state: Dict[str, Dict[str, Any]], through: int) -> None:
+    ws = _get_side_worksheet(SNAPSHOTS_WORKSHEET, SNAPSHOT_COLUMNS)
+    rows = [
+        [r["activity_id"], r["user_id"], r["status"], _dumps(r["data"]), r["updated_at"], through]
+        for r in state.values()
+    ]
+    # A reader racing between clear() and update() sees no snapshot and
+    # simply folds the whole log, so the result stays correct.
+    ws.clear()
+    ws.update("A1", [SNAPSHOT_COLUMNS] + rows)
+    _note_write(SNAPSHOTS_WORKSHEET)
 
-    out = []
-    for r in records:
-        if r["status"] != "submitted":
-            continue
 
+def _event_records() -> List[Dict[str, Any]]:
+    """State terkini = snapshot terakhir + event yang belum dipadatkan."""
+    state, through = _load_snapshots()
+    tail = _load_event_tail(through)
+    _fold_events(state, tail)
+
+    if len(tail) >= EVENT_COMPACT_EVERY:
         try:
-            r["data"] = json.loads(r["data"]) if r.get("data") else {}
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON in row activity_id={r.get('activity_id')}")
-            r["data"] = {}
+            _write_snapshots(state, through + len(tail))
+            logger.info(f"compacted {len(tail)} events into {len(state)} snapshots")
+        except Exception:
+            logger.exception("event log compaction failed")
 
-        out.append(r)
+    return [
+        {**r, "data": json.loads(_dumps(r["data"]))}  # callers may mutate
+        for r in state.values()
+    ]
 
-    return out[:limit]
 
+def _event_heads() -> Dict[str, Dict[str, str]]:
+    """
+    activity_id -> {"user_id", "status"} hasil fold (yang sudah dihapus
+    tidak termasuk), dari kolom A..C snapshot dan kolom A..E tail saja:
+    payload tidak diunduh maupun di-decode.
+    """
+    ws = _get_side_worksheet(SNAPSHOTS_WORKSHEET, SNAPSHOT_COLUMNS)
+    through_col = _last_col(SNAPSHOT_COLUMNS)
+    head_cells, through_cells = ws.batch_get([f"A2:{_col_of(SNAPSHOT_COLUMNS, 'status')}", f"{through_col}2:{through_col}"])
+    heads = {}
+    for r in head_cells:
+        r = r + [""] * (3 - len(r))
+        if r[0]:
+            heads[r[0]] = {"user_id": r[1], "status": r[2]}
+    through = max([1] + [int(r[0]) for r in through_cells if r and str(r[0]).isdigit()])
+
+    events_ws = _get_side_worksheet(EVENTS_WORKSHEET, EVENT_COLUMNS)
+    seen = set()
+    # same rules as _apply_event, on the id / type / owner / status columns only
+    for event_id, activity_id, event_type, user_id, status in (
+        (r + [""] * 5)[:5] for r in _fetch(events_ws, f"A{through + 1}:{_col_of(EVENT_COLUMNS, 'status')}") if r
+    ):
+        if event_id in seen:
+            continue
+        seen.add(event_id)
+        head = heads.get(activity_id)
+        if event_type == "delete":
+            heads.pop(activity_id, None)
+        elif event_type == "upsert" or (event_type == "patch" and head is None and user_id):
+            heads[activity_id] = {"user_id": user_id, "status": status or "draft"}
+        elif event_type in ("patch", "status") and head is not None:
+            head["status"] = status or head["status"]
+    return heads
 
-def mark_status(activity_id: str, status: str, verifier: Optional[str] = None, comment: Optional[str] = None) -> bool:
-    try:
-        ws = get_worksheet()
-        row_idx = _find_row(ws, activity_id)
-        if not row_idx:
-            return False
 
-        ws.update(f"C{row_idx}", status)
-        ws.update(f"E{row_idx}", _now())
+def compact_event_log() -> bool:
+    """Padatkan seluruh tail event ke worksheet Snapshots (bisa dijadwalkan)."""
+    try:
+        state, through = _load_snapshots()
+        tail = _load_event_tail(through)
+        _fold_events(state, tail)
+        _write_snapshots(state, through + len(tail))
         return True
 
     except Exception:
-        logger.exception("mark_status failed")
+        logger.exception("compact_event_log failed")
         return False
 
 
-def delete_activity(activity_id: str) -> bool:
+def get_activity_history(activity_id: str) -> List[Dict[str, Any]]:
+    """Jejak audit: semua event untuk satu kegiatan, urut waktu."""
+    if not _event_mode():
+        return []
     try:
-        ws = get_worksheet()
-        row_idx = _find_row(ws, activity_id)
-        if not row_idx:
-            return False
-
-        ws.delete_rows(row_idx)
-        return True
+        ws = _get_side_worksheet(EVENTS_WORKSHEET, EVENT_COLUMNS)
+        return [e for e in _get_all_rows(ws) if e.get("activity_id") == activity_id]
 
     except Exception:
-        logger.exception("delete_activity failed")
-        return False
+        logger.exception("get_activity_history failed")
+        return []
 
 
 # -------------------------------------------------
-# Convenience helpers (unchanged)
+# CORE FUNCTIONS (same names as before)
 # -------------------------------------------------
-def submit_activity(activity_id: str, user_id: str) -> bool:
-    return mark_status(activity_id, "submitted")
+def _upsert_activity(
+    activity_id: str,
+    user_id: str,
+    payload: Dict[str, Any],
+    status: str = "draft",
+    actor: Optional[str] = None,
+    write_key: Optional[str] = None,
+):
+    """Isi upsert_activity; error diteruskan ke pemanggil (journal)."""
+    clean_payload = make_json_safe(payload)
 
+    halaman_awal = clean_payload.get("halaman_awal") or {}
+    dims = {
+        "status": status,
+        "owner": user_id,
+        "sektor": halaman_awal.get("sektor"),
+        "tahun": halaman_awal.get("tahun"),
+        "last_saved": clean_payload.get("last_saved"),
+    }
 
-def mark_verified(activity_id: str, verifier: str, comment: Optional[str] = None) -> bool:
-    return mark_status(activity_id, "verified")
+    if _event_mode():
+        _append_event(activity_id, "upsert", user_id, status, {"payload": clean_payload}, actor, event_id=write_key)
+        _track(activity_id, dims)
+        _cache_apply(activity_id, user_id=user_id, status=status, payload=clean_payload)
+        return True, {
+            "activity_id": activity_id,
+            "user_id": user_id,
+            "status": status,
+            "data": clean_payload,
+        }
+
+    ws = get_worksheet()
+    root, sections = _split_payload(clean_payload)
+
+    row_idx = _find_row(ws, activity_id)
+
+    row_data = [
+        activity_id,
+        user_id,
+        status,
+        _dumps(root),
+        _now(),
+    ] + [_dumps(sections[sec]) if sec in sections else "" for sec in SECTIONS]
+
+    keys = _dumps([write_key]) if write_key else ""
+    if row_idx:
+        # without a key the row's applied keys are left as they are
+        values = row_data + [keys] if write_key else row_data
+        ws.update(f"A{row_idx}:{_last_col(values)}{row_idx}", [values])
+    else:
+        resp = ws.append_row(row_data + [keys])
+        row_idx = _row_from_range(resp.get("updates", {}).get("updatedRange"))
+    _note_write(WORKSHEET_NAME)
 
+    _track(activity_id, dims)
+    _index_put(activity_id, user_id, status, row_idx)
+    _cache_apply(activity_id, user_id=user_id, status=status, payload=clean_payload)
+    return True, {
+        "activity_id": activity_id,
+        "user_id": user_id,
+        "status": status,
+        "data": clean_payload,
+    }
+
+
+
+def upsert_activity(
+    activity_id: str,
+    user_id: str,
+    payload: Dict[str, Any],
+    status: str = "draft",
+    actor: Optional[str] = None,
+    write_key: Optional[str] = None,
+):
+    try:
+        return _upsert_activity(activity_id, user_id, payload, status, actor, write_key)
+
+    except Exception:
+        logger.exception("upsert_activity failed")
+        return False, None
+
+
+def _patch_activity(
+    activity_id: str,
+    user_id: str,
+    sections: Optional[Dict[str, Any]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    status: Optional[str] = None,
+    merge: bool = True,
+    actor: Optional[str] = None,
+    write_key: Optional[str] = None,
+):
+    """Isi patch_activity; error diteruskan ke pemanggil (journal)."""
+    sections = make_json_safe(sections or {})
+    meta = make_json_safe(meta or {})
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown sections: {sorted(unknown)}")
+
+    if _event_mode():
+        diff = {"sections": sections, "meta": meta, "merge": merge}
+        _append_event(activity_id, "patch", user_id, status, diff, actor, event_id=write_key)
+        changes = _halaman_awal_dims(sections)
+        if status:
+            changes["status"] = status
+        if meta.get("last_saved"):
+            changes["last_saved"] = meta["last_saved"]
+        _track(activity_id, changes, defaults={"owner": user_id, "status": "draft"})
+        _cache_apply(activity_id, user_id=user_id, status=status, sections=sections, meta=meta, merge=merge)
+        return True, {
+            "activity_id": activity_id,
+            "user_id": user_id,
+            "status": status,
+            "data": None,
+            "written": sorted(sections),
+        }
+
+    ws = get_worksheet()
+
+    row_idx = _find_row(ws, activity_id)
+    if not row_idx:
+        # nothing to merge into: {index: item} patches become plain lists
+        sections = {sec: _merge_section(sec, None, patch) for sec, patch in sections.items()}
+        return _upsert_activity(activity_id, user_id, {**meta, **sections}, status or "draft", actor, write_key)
+
+    values = ws.row_values(row_idx)
+    values += [""] * (len(COLUMNS) - len(values))
+    raw_row = dict(zip(COLUMNS, values))
+    current = _decode_row(dict(raw_row))["data"]
+
+    if write_key and write_key in _applied_keys(raw_row["write_keys"]):
+        # already applied; only the acknowledgement was lost
+        return True, {
+            "activity_id": activity_id,
+            "user_id": raw_row["user_id"],
+            "status": raw_row["status"],
+            "data": current,
+            "written": [],
+        }
+
+    updated = dict(current)
+    updated.update(meta)
+    for sec, patch in sections.items():
+        updated[sec] = _merge_section(sec, current.get(sec), patch, merge)
+
+    root, new_sections = _split_payload(updated)
+
+    cells = {}
+    if _dumps(root) != raw_row["data"]:
+        cells["data"] = _dumps(root)
+    for sec, value in new_sections.items():
+        # legacy rows get their sections moved into columns on first write
+        if _dumps(value) != raw_row[sec]:
+            cells[sec] = _dumps(value)
+    if status and status != raw_row["status"]:
+        cells["status"] = status
+
+    changed = bool(cells)
+    if changed:
+        cells["updated_at"] = _now()
+    if write_key:
+        # recorded even when nothing changed, so a retry is recognised
+        cells["write_keys"] = _with_key(raw_row["write_keys"], write_key)
+    if cells:
+        ws.batch_update([
+            {"range": f"{_col(name)}{row_idx}", "values": [[value]]}
+            for name, value in cells.items()
+        ])
+        _note_write(WORKSHEET_NAME)
+
+    _track(
+        activity_id,
+        {
+            "status": cells.get("status", raw_row["status"]),
+            "last_saved": updated.get("last_saved"),
+            **_halaman_awal_dims(new_sections),
+        },
+        defaults={"owner": raw_row["user_id"]},
+    )
+    if "status" in cells:
+        _index_put(activity_id, raw_row["user_id"], cells["status"], row_idx)
+    if changed:
+        _cache_apply(
+            activity_id,
+            user_id=raw_row["user_id"],
+            status=cells.get("status", raw_row["status"]),
+            payload=updated,
+        )
+    return True, {
+        "activity_id": activity_id,
+        "user_id": raw_row["user_id"],
+        "status": cells.get("status", raw_row["status"]),
+        "data": updated,
+        "written": sorted(k for k in cells if k not in ("updated_at", "write_keys")),
+    }
+
+
+
+def patch_activity(
+    activity_id: str,
+    user_id: str,
+    sections: Optional[Dict[str, Any]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    status: Optional[str] = None,
+    merge: bool = True,
+    actor: Optional[str] = None,
+    write_key: Optional[str] = None,
+):
+    """
+    Simpan sebagian payload: hanya sel section/metadata yang isinya berubah
+    yang ditulis, dalam satu batch_update. Pemilik baris yang sudah ada
+    tidak diubah. Baris baru dibuat lewat upsert_activity.
+
+    `write_key` (idempotency key dari journal) dicatat di kolom write_keys
+    baris itu, di luar payload; patch dengan key yang sudah tercatat
+    tidak ditulis ulang.
+    """
+    try:
+        return _patch_activity(activity_id, user_id, sections, meta, status, merge, actor, write_key)
+
+    except Exception:
+        logger.exception("patch_activity failed")
+        return False, None
+
+
+def get_activity(activity_id: str) -> Optional[Dict]:
+    """Satu kegiatan; sheet mode membaca kolom A lalu hanya baris itu."""
+    try:
+        if _event_mode():
+            record = next((r for r in _event_records() if r["activity_id"] == activity_id), None)
+        else:
+            ws = get_worksheet()
+            record = None
+            for _ in range(2):  # a delete between the two reads shifts the row: look it up again
+                row_idx = _find_row(ws, activity_id)
+                if not row_idx:
+                    break
+                values = ws.row_values(row_idx)
+                values += [""] * (len(COLUMNS) - len(values))
+                if values[0] == activity_id:
+                    record = _decode_row(dict(zip(COLUMNS, values)))
+                    break
+
+        if record is not None:
+            _remember(record)
+        return record
+
+    except Exception:
+        logger.exception("get_activity failed")
+        return _last_known(activity_id)
+
+
+# Last copy of every activity this process read, served by get_activity
+# while the sheet cannot be reached (breaker open, deadline exceeded).
+_last_good_lock = threading.Lock()
+_last_good: Dict[str, Dict[str, Any]] = {}
+LAST_GOOD_MAX = 500
+
+
+def _remember(record: Dict[str, Any]) -> None:
+    with _last_good_lock:
+        _last_good.pop(record["activity_id"], None)
+        _last_good[record["activity_id"]] = json.loads(_dumps(record))
+        while len(_last_good) > LAST_GOOD_MAX:
+            _last_good.pop(next(iter(_last_good)))
+
+
+def _last_known(activity_id: str) -> Optional[Dict[str, Any]]:
+    with _last_good_lock:
+        record = _last_good.get(activity_id)
+    if record is not None:
+        return json.loads(_dumps(record))
+    if _replica_mode():
+        try:
+            return replica.get(activity_id)
+        except Exception:
+            logger.exception("replica read failed")
+    return None
+
+
+def _copy_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # cached lists are shared between sessions; callers may mutate theirs
+    return [{**r, "data": json.loads(_dumps(r["data"]))} for r in records]
+
+
+def _load_all_activities():
+    if _event_mode():
+        return _event_records()
+
+    ws = get_worksheet()
+    records = _get_all_rows(ws)
+
+    return [_decode_row(r) for r in records]
+
+
+def list_all_activities(max_age: Optional[float] = None):
+    if _replica_ready():
+        return replica.records()
+    records = swr_cache.get(("records", None, None), _load_all_activities, max_age)
+    return _copy_records(records)
+
+
+def iter_activities(page_rows: int = EXPORT_PAGE_ROWS) -> Iterator[Dict[str, Any]]:
+    """
+    Semua kegiatan (sudah di-decode) satu per satu, dibaca per halaman
+    `page_rows` baris dengan satu ws.get per halaman: memori tidak tumbuh
+    dengan ukuran sheet dan cache list tidak disentuh. Di mode events log
+    harus di-fold utuh, jadi hasil _event_records() yang dikembalikan.
+    """
+    if _event_mode():
+        yield from _event_records()
+        return
+
+    ws = get_worksheet()
+    start = 2
+    while True:
+        end = start + page_rows - 1
+        rows = ws.get(f"A{start}:{LAST_COLUMN}{end}")
+        for r in rows:
+            row = dict(zip(COLUMNS, r))
+            if row.get("activity_id"):
+                yield _decode_row(row)
+        if len(rows) < page_rows:
+            return
+        start = end + 1
+
+
+def _summarize(row: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    halaman_awal = data.get("halaman_awal") or {}
+    return {
+        "activity_id": row.get("activity_id"),
+        "user_id": row.get("user_id"),
+        "status": row.get("status"),
+        "updated_at": row.get("updated_at"),
+        "judul": halaman_awal.get("judul") or data.get("judul"),
+        "tahun": halaman_awal.get("tahun"),
+        "sektor": halaman_awal.get("sektor"),
+        "last_saved": data.get("last_saved") or row.get("updated_at"),
+    }
+
+
+def list_activity_summaries(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    max_age: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ringkasan ringan untuk tampilan antrean: hanya kolom A..F (metadata dan
+    halaman_awal) yang dibaca, kolom section lain yang besar dilewati.
+    Dengan `user_id`, hanya baris user tersebut yang diambil lewat indeks.
+    Hasil di-cache (stale-while-revalidate) paling lama `max_age` detik.
+    """
+    if _replica_ready():
+        return replica.summaries(status=status, user_id=user_id)
+    rows = swr_cache.get(
+        ("summaries", status, user_id),
+        lambda: _load_activity_summaries(status, user_id),
+        max_age,
+    )
+    return [dict(r) for r in rows]
+
+
+def _load_activity_summaries(status: Optional[str], user_id: Optional[str]) -> List[Dict[str, Any]]:
+    if _event_mode():
+        records = _event_records()
+        return [
+            _summarize(r, r["data"])
+            for r in records
+            if (not status or r["status"] == status)
+            and (not user_id or r["user_id"] == user_id)
+        ]
+
+    if user_id:
+        rows = _user_rows(user_id, status, last_col=_col("halaman_awal"))
+        if rows is not None:
+            return [_summarize(r, _decode_row(dict(r))["data"]) for r in rows]
+
+    ws = get_worksheet()
+    rows = _fetch(ws, f"A1:{_col('halaman_awal')}")
+    if len(rows) < 2:
+        return []
+
+    header = [h.strip() for h in rows[0]]
+    out = []
+    for r in rows[1:]:
+        row = dict(zip(header, r))
+        if not row.get("activity_id"):
+            continue
+        if status and row.get("status") != status:
+            continue
+        if user_id and row.get("user_id") != user_id:
+            continue
+        out.append(_summarize(row, _decode_row(dict(row))["data"]))
+
+    return out
+
+
+TIMESTAMP_FIELDS = ("last_saved", "updated_at")
+
+
+def _timestamp(value: Any) -> datetime.datetime:
+    # last_saved comes as "%Y-%m-%d %H:%M:%S" from the form, updated_at as
+    # ISO "...T..."; as strings every space-separated value sorts first
+    try:
+        ts = datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return datetime.datetime.min
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def query_activities(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    sektor: Optional[str] = None,
+    tahun: Optional[str] = None,
+    sort_by: str = "last_saved",
+    descending: bool = True,
+    page: int = 0,
+    page_size: int = 20,
+    max_age: Optional[float] = None,
+):
+    """
+    Query untuk Dashboard: filter, urutkan lalu potong satu halaman dari
+    ringkasan kegiatan. Mengembalikan (items, total) dengan `total` jumlah
+    baris yang lolos filter. Sheet mode menjawab dari store agregat dan
+    hanya membaca baris halaman itu; scan penuh bila store tidak bisa.
+    """
+    if _replica_ready():
+        return replica.query(user_id, status, sektor, tahun, sort_by, descending, page, page_size)
+
+    if not _event_mode():
+        try:
+            found = _query_from_aggregates(user_id, status, sektor, tahun, sort_by, descending, page, page_size)
+        except Exception:
+            logger.exception("aggregates query failed, scanning the sheet")
+            found = None
+        if found is not None:
+            return found
+
+    rows = list_activity_summaries(status=status, user_id=user_id, max_age=max_age)
+
+    def keep(r):
+        if user_id and r["user_id"] != user_id:
+            return False
+        if sektor and r["sektor"] != sektor:
+            return False
+        if tahun and str(r["tahun"]) != str(tahun):
+            return False
+        return True
+
+    rows = [r for r in rows if keep(r)]
+    if sort_by in TIMESTAMP_FIELDS:
+        rows.sort(key=lambda r: _timestamp(r.get(sort_by)), reverse=descending)
+    else:
+        rows.sort(key=lambda r: str(r.get(sort_by) or ""), reverse=descending)
+
+    start = max(page, 0) * page_size
+    return rows[start:start + page_size], len(rows)
+
+
+def _aggregates_fresh() -> None:
+    rebuilt = aggregates.last_rebuilt()
+    if rebuilt is None or datetime.datetime.utcnow() - _parse_ts(rebuilt) > datetime.timedelta(seconds=AGGREGATES_REFRESH_SECONDS):
+        singleflight.do(("aggregates-rebuild",), rebuild_aggregates)
+
+
+def _summary_rows(wanted: List[tuple]) -> Optional[List[Dict[str, Any]]]:
+    """Kolom A..F baris (row, activity_id) dengan satu batch_get; None bila indeks meleset."""
+    if not wanted:
+        return []
+    last_col = _col("halaman_awal")
+    header = COLUMNS[:COLUMNS.index("halaman_awal") + 1]
+    ranges = get_worksheet().batch_get([f"A{row}:{last_col}{row}" for row, _ in wanted])
+    out = []
+    for (row, aid), value_range in zip(wanted, ranges):
+        values = value_range[0] if value_range else []
+        record = dict(zip(header, values + [""] * (len(header) - len(values))))
+        if record["activity_id"] != aid:
+            logger.info(f"user index out of date at row {row}, rebuilding")
+            rebuild_user_index()
+            return None
+        out.append(_summarize(record, _decode_row(dict(record))["data"]))
+    return out
+
+
+def _query_from_aggregates(user_id, status, sektor, tahun, sort_by, descending, page, page_size):
+    """
+    Dashboard query lewat store agregat (sheet mode). Store itu lokal per
+    host, jadi sebelum query diselaraskan dengan UserIndex yang dipakai
+    bersama: kegiatan yang hilang dibuang, yang baru atau yang owner /
+    statusnya berbeda dibaca ulang (kolom A..F barisnya saja). Sektor,
+    tahun dan last_saved yang diubah host lain baru terlihat pada rebuild
+    berikutnya (paling lama AGGREGATES_REFRESH_SECONDS). None = pemanggil
+    harus scan.
+    """
+    if sort_by not in aggregates.SORT_COLUMNS:
+        return None
+    _aggregates_fresh()
+    entries = _load_user_index()
+
+    known = aggregates.heads()
+    for aid in set(known) - set(entries):
+        aggregates.remove(aid)
+    stale = sorted((e["row"], aid) for aid, e in entries.items() if known.get(aid) != (e["status"], e["user_id"]))
+    summaries = _summary_rows(stale)
+    if summaries is None:
+        return None
+    for summary in summaries:
+        aggregates.record(summary["activity_id"], {
+            "status": summary["status"],
+            "owner": summary["user_id"],
+            "sektor": summary["sektor"],
+            "tahun": summary["tahun"],
+            "last_saved": summary["last_saved"],
+            "updated_at": summary["updated_at"],
+        })
+
+    found = aggregates.query(user_id, status, sektor, tahun, sort_by, descending, page, page_size)
+    if found is None:
+        return None
+    ids, total = found
+    items = _summary_rows([(entries[aid]["row"], aid) for aid in ids if aid in entries])
+    if items is None:
+        return None
+    return items, total
+
+
+def list_activities_for_user(user_id: str, status: Optional[str] = None, limit: int = 200, max_age: Optional[float] = None):
+    if _replica_ready():
+        return replica.records(status=status, user_id=user_id, limit=limit)
+    records = swr_cache.get(
+        ("records", status, user_id),
+        lambda: _load_activities_for_user(user_id, status),
+        max_age,
+    )
+    return _copy_records(records[:limit])
+
+
+def _load_activities_for_user(user_id: str, status: Optional[str]):
+    if _event_mode():
+        records = _event_records()
+    else:
+        records = _user_rows(user_id, status)
+        if records is None:
+            records = _get_all_rows(get_worksheet())
+
+    out = []
+    for r in records:
+        if r["user_id"] != user_id:
+            continue
+        if status and r["status"] != status:
+            continue
+
+        out.append(r if isinstance(r["data"], dict) else _decode_row(r))
+
+    return out
+
+
+def list_submitted_activities(limit: int = 500, max_age: Optional[float] = None):
+    if _replica_ready():
+        return replica.records(status="submitted", limit=limit)
+    records = swr_cache.get(("records", "submitted", None), _load_submitted_activities, max_age)
+    return _copy_records(records[:limit])
+
+
+def _load_submitted_activities():
+    if _event_mode():
+        records = _event_records()
+    else:
+        records = _get_all_rows(get_worksheet())
+
+    out = []
+    for r in records:
+        if r["status"] != "submitted":
+            continue
+
+        out.append(r if isinstance(r["data"], dict) else _decode_row(r))
+
+    return out
+
+
+def mark_status(
+    activity_id: str,
+    status: str,
+    verifier: Optional[str] = None,
+    comment: Optional[str] = None,
+    actor: Optional[str] = None,
+) -> bool:
+    try:
+        if _event_mode():
+            # appended unchecked; the fold ignores a status event for an unknown id
+            diff = {"verifier": verifier} if verifier else {}
+            _append_event(activity_id, "status", status=status, diff=diff, actor=actor or verifier, comment=comment)
+            _track(activity_id, {"status": status})
+            _cache_apply(activity_id, status=status)
+            return True
+
+        ws = get_worksheet()
+        row_idx = _find_row(ws, activity_id)
+        if not row_idx:
+            return False
+
+        ws.batch_update([
+            {"range": f"{_col('status')}{row_idx}", "values": [[status]]},
+            {"range": f"{_col('updated_at')}{row_idx}", "values": [[_now()]]},
+        ])
+        _note_write(WORKSHEET_NAME)
+        _track(activity_id, {"status": status})
+        _index_set_status([activity_id], status)
+        _cache_apply(activity_id, status=status)
+        return True
+
+    except Exception:
+        logger.exception("mark_status failed")
+        return False
+
+
+def bulk_mark_status(
+    activity_ids: List[str],
+    status: str,
+    verifier: Optional[str] = None,
+    comment: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    expected_status: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Ubah status banyak kegiatan sekaligus, ditambah metadata verifikasi
+    yang sama untuk semuanya. Status dan klaim dibaca ulang lebih dulu:
+    kegiatan yang sudah tidak ada, statusnya bukan lagi `expected_status`
+    atau diklaim verifier lain dilewati. Setiap perubahan dicatat di
+    journal sebelum ditulis. Sheet mode: satu baca kolom A, satu batch_get
+    kolom B..D dan M, satu batch_update.
+
+    Hasil per activity_id: "committed", "pending" (di journal, dikirim
+    flusher), "skipped" atau "failed".
+    """
+    results = {aid: "failed" for aid in activity_ids}
+    if not activity_ids:
+        return results
+
+    meta = make_json_safe(meta or {})
+    try:
+        holders = list_claims() if verifier else {}
+        roots = {}
+        if _event_mode():
+            heads = _event_heads()
+        else:
+            ws = get_worksheet()
+            ids = ws.col_values(1)
+            rows = {value: idx for idx, value in enumerate(ids[1:], start=2) if value in results}
+            keys_col = _col("write_keys")
+            cells = ws.batch_get([
+                rng for idx in rows.values() for rng in (f"{_col('user_id')}{idx}:{_col('data')}{idx}", f"{keys_col}{idx}")
+            ]) if rows else []
+            heads, applied = {}, {}
+            for (aid, idx), cell, keys_cell in zip(rows.items(), cells[::2], cells[1::2]):
+                user_id, current, raw = ((cell[0] if cell else []) + [""] * 3)[:3]
+                heads[aid] = {"user_id": user_id, "status": current, "row": idx}
+                roots[aid] = raw
+                applied[aid] = keys_cell[0][0] if keys_cell and keys_cell[0] else ""
+
+        targets = []
+        for aid in dict.fromkeys(activity_ids):
+            head = heads.get(aid)
+            if head is None or (expected_status and head["status"] != expected_status) \
+                    or holders.get(aid, {}).get("verifier") not in (None, verifier):
+                results[aid] = "skipped"
+            else:
+                targets.append(aid)
+        if not targets:
+            return results
+
+        # same entries save_activity would journal, so the flusher can replay any of them
+        try:
+            keys = {
+                aid: journal.append(aid, verifier, {
+                    "activity_id": aid, "user_id": verifier, "sections": {}, "meta": meta,
+                    "status": status, "merge": True, "actor": verifier,
+                })
+                for aid in targets
+            }
+            journal.start(_apply_journal_entry)
+        except Exception:
+            logger.exception("journal unavailable, writing directly")
+            keys = dict.fromkeys(targets)
+
+        if breaker.is_open():
+            claimed = [aid for aid in targets if keys[aid] is None]
+        else:
+            # older queued saves of an activity go first; the flusher sends this one after them
+            claimed = [aid for aid in targets if keys[aid] is None or journal.claim(keys[aid])]
+        for aid in targets:
+            if aid not in claimed:
+                results[aid] = "pending"
+        if len(claimed) < len(targets):
+            journal.wake()
+
+        if _event_mode():
+            writes = claimed
+        else:
+            writes, updates, now = [], [], _now()
+            for aid in claimed:
+                try:
+                    root = json.loads(roots[aid]) if roots[aid] else {}
+                except json.JSONDecodeError:
+                    logger.error(f"Invalid JSON in activity_id={aid}")
+                    if keys[aid]:
+                        journal.give_up(keys[aid], f"Invalid JSON in activity_id={aid}")
+                    continue
+                root.update(meta)
+                idx = heads[aid]["row"]
+                updates += [
+                    {"range": f"{_col('status')}{idx}", "values": [[status]]},
+                    {"range": f"{_col('data')}{idx}", "values": [[_dumps(root)]]},
+                    {"range": f"{_col('updated_at')}{idx}", "values": [[now]]},
+                ]
+                if keys[aid]:
+                    updates.append({"range": f"{keys_col}{idx}", "values": [[_with_key(applied[aid], keys[aid])]]})
+                writes.append(aid)
+
+        if writes:
+            try:
+                if _event_mode():
+                    diff = {"sections": {}, "meta": meta, "merge": True}
+                    _append_events([
+                        _make_event(aid, "patch", status=status, diff=diff, actor=verifier, comment=comment, event_id=keys[aid])
+                        for aid in writes
+                    ])
+                else:
+                    ws.batch_update(updates)
+                    _note_write(WORKSHEET_NAME)
+            except Exception as e:
+                logger.exception("bulk_mark_status write failed")
+                for aid in writes:
+                    if keys[aid] is None:
+                        continue
+                    if _is_transient(e):
+                        journal.failed(keys[aid], _error_text(e))
+                        results[aid] = "pending"
+                    else:
+                        journal.give_up(keys[aid], _error_text(e))
+                return results
+
+        for aid in writes:
+            if keys[aid]:
+                journal.committed(keys[aid])
+            results[aid] = "committed"
+            _track(aid, {"status": status}, defaults={"owner": heads[aid]["user_id"]})
+            _cache_apply(aid, status=status, meta=meta)
+        _index_set_status(writes, status)
+        return results
+
+    except Exception:
+        logger.exception("bulk_mark_status failed")
+        return results
+
+
+def list_activity_ids() -> set:
+    """Semua activity_id yang ada di storage (sheet mode: satu baca kolom A)."""
+    if _event_mode():
+        return set(_event_heads())
+    return {v for v in get_worksheet().col_values(1)[1:] if v}
+
+
+def insert_activities(items: List[Dict[str, Any]], actor: Optional[str] = None) -> bool:
+    """
+    Tambahkan banyak kegiatan baru sekaligus (impor massal): satu
+    append_rows untuk seluruh batch (sheet mode) atau satu append ke log
+    event. Item: {"activity_id", "user_id", "status", "payload"}.
+    Tidak memeriksa duplikat; pemanggil memastikan activity_id belum ada.
+    """
+    if not items:
+        return True
+    try:
+        items = [{**item, "payload": make_json_safe(item["payload"])} for item in items]
+
+        if _event_mode():
+            _append_events([
+                _make_event(item["activity_id"], "upsert", item["user_id"], item["status"],
+                            {"payload": item["payload"]}, actor)
+                for item in items
+            ])
+        else:
+            rows = []
+            for item in items:
+                root, sections = _split_payload(item["payload"])
+                rows.append(
+                    [item["activity_id"], item["user_id"], item["status"], _dumps(root), _now()]
+                    + [_dumps(sections[sec]) if sec in sections else "" for sec in SECTIONS]
+                )
+            ws = get_worksheet()
+            resp = ws.append_rows(rows, value_input_option="RAW")
+            _note_write(WORKSHEET_NAME)
+            first = _row_from_range((resp or {}).get("updates", {}).get("updatedRange"))
+            if first is None:
+                _invalidate_user_index()
+            else:
+                _index_append([
+                    [item["activity_id"], item["user_id"], item["status"], first + offset]
+                    for offset, item in enumerate(items)
+                ])
+
+        for item in items:
+            halaman_awal = item["payload"].get("halaman_awal") or {}
+            _track(item["activity_id"], {
+                "status": item["status"],
+                "owner": item["user_id"],
+                "sektor": halaman_awal.get("sektor"),
+                "tahun": halaman_awal.get("tahun"),
+                "last_saved": item["payload"].get("last_saved"),
+            })
+            _cache_apply(item["activity_id"], user_id=item["user_id"], status=item["status"], payload=item["payload"])
+        return True
+
+    except Exception:
+        logger.exception("insert_activities failed")
+        return False
+
+
+def delete_activity(activity_id: str, actor: Optional[str] = None) -> bool:
+    try:
+        if _event_mode():
+            _append_event(activity_id, "delete", actor=actor)
+            _track(activity_id, removed=True)
+            _cache_apply(activity_id, removed=True)
+            return True
+
+        ws = get_worksheet()
+        row_idx = _find_row(ws, activity_id)
+        if not row_idx:
+            return False
+
+        ws.delete_rows(row_idx)
+        _note_write(WORKSHEET_NAME)
+        _track(activity_id, removed=True)
+        _index_delete(activity_id, row_idx)
+        _cache_apply(activity_id, removed=True)
+        return True
+
+    except Exception:
+        logger.exception("delete_activity failed")
+        return False
+
+
+# -------------------------------------------------
+# Write-ahead journal
+# -------------------------------------------------
+def _is_transient(e: BaseException) -> bool:
+    """Error yang bisa hilang bila dicoba lagi (breaker, timeout, jaringan, 429 / 5xx)."""
+    if isinstance(e, (breaker.BreakerOpen, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(e, (ValueError, TypeError, KeyError)):
+        return False   # bad payload: same result on every retry
+    return _is_outage(e)
+
+
+def _error_text(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+def _apply_journal_entry(entry: Dict[str, Any]) -> bool:
+    try:
+        ok, _ = _patch_activity(**entry["args"], write_key=entry["write_key"])
+    except Exception as e:
+        if _is_transient(e):
+            raise
+        raise journal.PermanentError(_error_text(e)) from e
+    return ok
+
+
+def save_activity(
+    activity_id: str,
+    user_id: str,
+    sections: Optional[Dict[str, Any]] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    status: Optional[str] = None,
+    merge: bool = True,
+    actor: Optional[str] = None,
+):
+    """
+    Simpan lewat journal lokal: simpanan dicatat dulu di disk, lalu langsung
+    dicoba ke sheet. Bila gagal (sheet down, kuota) entri tetap di antrean
+    dan dikirim ulang oleh flusher. Mengembalikan (state, result) dengan
+    state "committed", "pending" atau "failed" (error yang tidak akan hilang
+    bila dicoba ulang, atau journal pun tidak bisa ditulis).
+    """
+    args = {
+        "activity_id": activity_id,
+        "user_id": user_id,
+        "sections": make_json_safe(sections or {}),
+        "meta": make_json_safe(meta or {}),
+        "status": status,
+        "merge": merge,
+        "actor": actor,
+    }
+    try:
+        write_key = journal.append(activity_id, user_id, args)
+        journal.start(_apply_journal_entry)
+    except Exception:
+        logger.exception("journal unavailable, writing directly")
+        ok, result = patch_activity(**args)
+        return ("committed" if ok else "failed"), result
+
+    if breaker.is_open():
+        return "pending", None
+
+    # older entries of this activity still queued: keep the order, let the flusher send it
+    if not journal.claim(write_key):
+        journal.wake()
+        return "pending", None
+
+    try:
+        ok, result = _patch_activity(**args, write_key=write_key)
+    except Exception as e:
+        logger.exception("save_activity write failed")
+        if not _is_transient(e):
+            journal.give_up(write_key, _error_text(e))
+            return "failed", None
+        journal.failed(write_key, _error_text(e))
+        return "pending", None
+
+    if ok:
+        journal.committed(write_key)
+        return "committed", result
+    journal.failed(write_key, "write failed")
+    return "pending", None
+
+
+def journal_status(activity_id: Optional[str] = None) -> Dict[str, Any]:
+    """Simpanan yang masih antre vs yang sudah terkirim (per kegiatan atau total)."""
+    try:
+        return journal.status(activity_id)
+
+    except Exception:
+        logger.exception("journal_status failed")
+        return {"pending": 0, "failed": 0, "oldest_pending_at": None, "last_committed_at": None, "last_error": None}
+
+
+# -------------------------------------------------
+# Aggregates
+# -------------------------------------------------
+def rebuild_aggregates() -> int:
+    """Job rebuild penuh: hitung ulang semua penghitung dari sheet."""
+    return aggregates.rebuild(list_activity_summaries(max_age=0))
+
+
+def get_aggregate_counts() -> Dict[str, Dict[str, int]]:
+    """Jumlah kegiatan per status/sektor/tahun/owner tanpa scan sheet."""
+    try:
+        if _replica_ready():
+            return replica.counts()
+        if aggregates.last_rebuilt() is None:
+            rebuild_aggregates()
+        return aggregates.counts()
+
+    except Exception:
+        logger.exception("get_aggregate_counts failed")
+        return {d: {} for d in aggregates.DIMENSIONS}
+
+
+# -------------------------------------------------
+# Host-local indexes
+# -------------------------------------------------
+def _storage_stamps():
+    """
+    activity_id -> updated_at di storage, plus record yang sudah terbaca
+    (mode events: semua, hasil fold) dan nomor baris (sheet mode: hanya
+    kolom A dan updated_at yang dibaca).
+    """
+    if _event_mode():
+        records = {r["activity_id"]: r for r in _event_records()}
+        return {aid: r.get("updated_at") or "" for aid, r in records.items()}, records, {}
+
+    col = _col("updated_at")
+    ids, times = get_worksheet().batch_get(["A2:A", f"{col}2:{col}"])
+    stamps, rows = {}, {}
+    for i, cell in enumerate(ids):
+        if cell and cell[0]:
+            stamps[cell[0]] = times[i][0] if i < len(times) and times[i] else ""
+            rows[cell[0]] = i + 2
+    return stamps, {}, rows
+
+
+def _read_rows(rows: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    """Baris lengkap (A..M) beberapa kegiatan, satu batch_get per EXPORT_PAGE_ROWS baris."""
+    ws = get_worksheet()
+    wanted = sorted(rows.items(), key=lambda kv: kv[1])
+    records = {}
+    for start in range(0, len(wanted), EXPORT_PAGE_ROWS):
+        chunk = wanted[start:start + EXPORT_PAGE_ROWS]
+        ranges = ws.batch_get([f"A{row}:{LAST_COLUMN}{row}" for _, row in chunk])
+        for (aid, _), value_range in zip(chunk, ranges):
+            values = value_range[0] if value_range else []
+            values = values + [""] * (len(COLUMNS) - len(values))
+            # a delete in between moves the rows: the next sync reads it again
+            if values[0] == aid:
+                records[aid] = _decode_row(dict(zip(COLUMNS, values)))
+    return records
+
+
+def sync_local_indexes() -> int:
+    """
+    Samakan indeks lokal (pencarian, katalog, graf) dengan storage. Tulisan
+    host ini sudah masuk lewat _cache_apply; tulisan host lain hanya
+    terlihat di sheet, jadi updated_at setiap kegiatan dibandingkan dengan
+    yang terakhir dimuat ke indeks dan hanya yang berbeda dibaca ulang.
+    Mengembalikan jumlah kegiatan yang dimuat ulang atau dihapus.
+    """
+    # an index never built here is built whole on its first use instead
+    seen = {index: index.synced() for index in LOCAL_INDEXES if index.last_rebuilt() is not None}
+    if not seen:
+        return 0
+    stamps, records, rows = _storage_stamps()
+    stale = {aid for aid, stamp in stamps.items() if any(known.get(aid) != stamp for known in seen.values())}
+    if rows:
+        records = _read_rows({aid: rows[aid] for aid in stale})
+
+    done = set()
+    for index, known in seen.items():
+        try:
+            for aid in set(known) - set(stamps):
+                index.remove(aid)
+                done.add(aid)
+            for aid in stale:
+                record = records.get(aid)
+                if record is not None and known.get(aid) != stamps[aid]:
+                    index.put(aid, record["user_id"], record["status"], record["data"], updated_at=stamps[aid])
+                    done.add(aid)
+            index.mark_synced()
+        except Exception:
+            logger.exception(f"{index.__name__} sync failed")
+    if done:
+        logger.info(f"local indexes synced: {len(done)} activities changed elsewhere")
+    return len(done)
+
+
+def _local_index_ready(index) -> None:
+    """Bangun indeks bila belum ada; sync bila sync terakhir lebih lama dari LOCAL_INDEX_SYNC_SECONDS."""
+    if index.last_rebuilt() is None:
+        singleflight.do((f"{index.__name__}-rebuild",), lambda: index.rebuild(iter_activities()))
+        return
+    synced = index.last_synced()
+    age = datetime.datetime.utcnow() - _parse_ts(synced) if synced else None
+    if age is None or age > datetime.timedelta(seconds=LOCAL_INDEX_SYNC_SECONDS):
+        try:
+            singleflight.do(("local-index-sync",), sync_local_indexes)
+        except Exception:
+            logger.exception("local index sync failed, answering from the local copy")
+
+
+# -------------------------------------------------
+# Full-text search
+# -------------------------------------------------
+def rebuild_search_index() -> int:
+    """Job rebuild penuh: indeks ulang semua kegiatan dari sheet."""
+    return search_index.rebuild(iter_activities())
+
+
+def search_activities(
+    query: str,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    kinds: Optional[List[str]] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    Pencarian teks bebas atas judul, latar belakang/tujuan, variabel dan
+    indikator, diurutkan menurut relevansi. Indeks diperbarui setiap kali
+    proses di host ini menulis, tulisan host lain lewat sync_local_indexes().
+    """
+    try:
+        _local_index_ready(search_index)
+        return search_index.search(query, status=status, user_id=user_id, kinds=kinds, limit=limit)
+
+    except Exception:
+        logger.exception("search_activities failed")
+        return []
+
+
+# -------------------------------------------------
+# Variable / indicator catalog
+# -------------------------------------------------
+def rebuild_catalog() -> int:
+    """Job rebuild penuh: catat ulang semua variabel dan indikator dari sheet."""
+    return catalog.rebuild(iter_activities())
+
+
+def suggest_definitions(kind: str, name: str, exclude_activity: Optional[str] = None, limit: int = 3) -> List[Dict[str, Any]]:
+    """Definisi variabel/indikator yang sudah dipakai kegiatan lain untuk nama yang mirip."""
+    try:
+        _local_index_ready(catalog)
+        return catalog.suggest(kind, name, limit=limit, exclude_activity=exclude_activity)
+
+    except Exception:
+        logger.exception("suggest_definitions failed")
+        return []
+
+
+def catalog_duplicates(kind: str) -> List[Dict[str, Any]]:
+    """Kelompok variabel/indikator yang ditulis dengan ejaan berbeda di kegiatan berbeda."""
+    try:
+        _local_index_ready(catalog)
+        return catalog.duplicate_groups(kind)
+
+    except Exception:
+        logger.exception("catalog_duplicates failed")
+        return []
+
+
+# -------------------------------------------------
+# Indicator dependency graph
+# -------------------------------------------------
+def rebuild_dependency_graph() -> int:
+    """Job rebuild penuh: bangun ulang graf indikator dari sheet."""
+    return dependency_graph.rebuild(iter_activities())
+
+
+def dependency_report(activity_id: str) -> Dict[str, Any]:
+    """Link indikator_pembangun / variabel_pembangun yang menggantung dan siklus pada satu kegiatan."""
+    try:
+        _local_index_ready(dependency_graph)
+        return dependency_graph.report(activity_id)
+
+    except Exception:
+        logger.exception("dependency_report failed")
+        return {"dangling": [], "cycles": []}
+
+
+def variable_dependents(activity_id: str, name: str, kind: str = "variabel") -> List[Dict[str, Any]]:
+    """Indikator (di kegiatan mana pun) yang langsung atau tidak langsung memakai variabel/indikator ini."""
+    try:
+        _local_index_ready(dependency_graph)
+        return dependency_graph.dependents(dependency_graph.find_nodes(kind, name, activity_id))
+
+    except Exception:
+        logger.exception("variable_dependents failed")
+        return []
+
+
+# -------------------------------------------------
+# Data quality
+# -------------------------------------------------
+def data_quality_report(statuses: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Rule lintas-field (validation.RULES) atas seluruh sheet, dibaca per halaman."""
+    try:
+        return validation.report(iter_activities(), statuses=statuses)
+
+    except Exception:
+        logger.exception("data_quality_report failed")
+        return {"checked": 0, "rules": [], "activities": []}
+
+
+# -------------------------------------------------
+# Read replica
+# -------------------------------------------------
+def _replica_ready() -> bool:
+    """Replika dipakai bila diaktifkan; sync pertama dijalankan di sini (sekali)."""
+    if not _replica_mode():
+        return False
+    try:
+        replica.start(_load_all_activities)
+        if replica.last_synced() is None:
+            singleflight.do(("replica-sync",), lambda: replica.sync(_load_all_activities))
+        return True
+
+    except Exception:
+        logger.exception("read replica unavailable, reading the sheet")
+        return False
+
+
+def replica_status() -> Optional[Dict[str, Any]]:
+    """Lag dan ukuran replika lokal; None bila mode replika tidak aktif."""
+    if not _replica_mode():
+        return None
+    try:
+        return replica.status()
+
+    except Exception:
+        logger.exception("replica_status failed")
+        return None
+
+
+# -------------------------------------------------
+# Convenience helpers (unchanged)
+# -------------------------------------------------
+def submit_activity(activity_id: str, user_id: str) -> bool:
+    return mark_status(activity_id, "submitted", actor=user_id)
+
+
+def mark_verified(activity_id: str, verifier: str, comment: Optional[str] = None) -> bool:
+    return mark_status(activity_id, "verified", verifier=verifier, comment=comment)
+
+
+# -------------------------------------------------
+# Verifier claims (leases)
+# -------------------------------------------------
+# Every claim, renewal and release is one appended row. Sheets serialises
+# appends, so folding the log in row order gives every process the same
+# answer: the first active claim on an activity wins, later claims by
+# other verifiers are ignored until that lease expires or is released.
+# Once CLAIMS_COMPACT_AFTER rows no longer matter, the rows that were read
+# are replaced by one row per live lease (see _compact_claims).
+_claims_compact_lock = threading.Lock()
+
+
+def _parse_ts(value: str) -> datetime.datetime:
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.datetime.min
+
+
+def _fold_claims(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    holders: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        activity_id = row.get("activity_id")
+        verifier = row.get("verifier")
+        claimed_at = _parse_ts(row.get("claimed_at"))
+        expires_at = _parse_ts(row.get("expires_at"))
+        if not activity_id or not verifier:
+            continue
+
+        holder = holders.get(activity_id)
+        if holder and holder["expires_at"] > claimed_at and holder["verifier"] != verifier:
+            continue  # someone else holds a live lease
+
+        if expires_at <= claimed_at:
+            holders.pop(activity_id, None)  # release
+        else:
+            if not holder or holder["verifier"] != verifier or holder["expires_at"] <= claimed_at:
+                holder = {"verifier": verifier, "claimed_at": claimed_at}
+            holders[activity_id] = {**holder, "expires_at": expires_at}
+
+    now = datetime.datetime.utcnow()
+    return {aid: h for aid, h in holders.items() if h["expires_at"] > now}
+
+
+def list_claims() -> Dict[str, Dict[str, Any]]:
+    """activity_id -> {"verifier", "expires_at"} untuk lease yang masih aktif."""
+    try:
+        ws = _get_side_worksheet(CLAIMS_WORKSHEET, CLAIM_COLUMNS)
+        rows = _get_all_rows(ws)
+        live = _fold_claims(rows)
+        if len(rows) - len(live) >= CLAIMS_COMPACT_AFTER:
+            _compact_claims(ws, rows, live)
+        return live
+
+    except Exception:
+        logger.exception("list_claims failed")
+        return {}
+
+
+def _claim_row(row: Dict[str, Any]) -> List[str]:
+    return [str(row.get(c) or "") for c in CLAIM_COLUMNS]
+
+
+def _compact_claims(ws, rows: List[Dict[str, Any]], live: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Ganti baris log yang sudah dibaca dengan satu baris per lease aktif.
+    Baris yang di-append proses lain sesudah pembacaan tetap di belakang,
+    jadi hasil fold tidak berubah. Bila baris pertama / terakhir yang
+    dibaca sudah bergeser (proses lain baru saja memadatkan), batal.
+    """
+    if not _claims_compact_lock.acquire(blocking=False):
+        return
+    try:
+        last = len(rows) + 1
+        width = _last_col(CLAIM_COLUMNS)
+        first_now, last_now = ws.batch_get([f"A2:{width}2", f"A{last}:{width}{last}"])
+        now_rows = [_claim_row(dict(zip(CLAIM_COLUMNS, cell[0] if cell else []))) for cell in (first_now, last_now)]
+        if now_rows != [_claim_row(rows[0]), _claim_row(rows[-1])]:
+            return
+
+        ws.delete_rows(2, last)
+        if live:
+            ws.insert_rows(
+                [
+                    [aid, h["verifier"], h["claimed_at"].isoformat(), h["expires_at"].isoformat()]
+                    for aid, h in live.items()
+                ],
+                row=2,
+                value_input_option="RAW",
+            )
+        _note_write(CLAIMS_WORKSHEET)
+        logger.info(f"compacted {len(rows)} claim rows into {len(live)} live leases")
+
+    except Exception:
+        logger.exception("claims compaction failed")
+    finally:
+        _claims_compact_lock.release()
+
+
+def _append_claims(activity_ids: List[str], verifier: str, seconds: int) -> None:
+    if not activity_ids:
+        return
+    ws = _get_side_worksheet(CLAIMS_WORKSHEET, CLAIM_COLUMNS)
+    now = datetime.datetime.utcnow()
+    expires = (now + datetime.timedelta(seconds=seconds)).isoformat()
+    ws.append_rows(
+        [[aid, verifier, now.isoformat(), expires] for aid in activity_ids],
+        value_input_option="RAW",
+    )
+    _note_write(CLAIMS_WORKSHEET)
+
+
+def claim_activities(verifier: str, candidates: List[str], n: int, lease_seconds: int = LEASE_SECONDS) -> List[str]:
+    """
+    Klaim hingga `n` kegiatan dari `candidates` (urut prioritas) sekaligus.
+    Lease milik verifier yang sudah ada ikut diperpanjang. Mengembalikan
+    semua activity_id yang benar-benar dipegang verifier setelah klaim.
+    """
+    try:
+        holders = list_claims()
+        mine = [aid for aid, h in holders.items() if h["verifier"] == verifier]
+        wanted = max(n - len([aid for aid in mine if aid in candidates]), 0)
+        free = [aid for aid in candidates if aid not in holders][:wanted]
+
+        _append_claims(mine + free, verifier, lease_seconds)
+
+        # re-read: a concurrent claimer may have appended before us
+        holders = list_claims()
+        return [aid for aid, h in holders.items() if h["verifier"] == verifier]
+
+    except Exception:
+        logger.exception("claim_activities failed")
+        return []
+
+
+def renew_claims(verifier: str, activity_ids: Optional[List[str]] = None, lease_seconds: int = LEASE_SECONDS) -> List[str]:
+    """
+    Perpanjang lease verifier. `activity_ids` = lease yang sudah diketahui
+    pemanggil (dari list_claims() yang baru dibaca); tanpa itu log Claims
+    dibaca dulu.
+    """
+    try:
+        if activity_ids is None:
+            activity_ids = [aid for aid, h in list_claims().items() if h["verifier"] == verifier]
+        mine = list(activity_ids)
+        _append_claims(mine, verifier, lease_seconds)
+        return mine
+
+    except Exception:
+        logger.exception("renew_claims failed")
+        return []
+
+
+def release_claims(verifier: str, activity_ids: List[str]) -> bool:
+    try:
+        _append_claims(list(activity_ids), verifier, 0)
+        return True
+
+    except Exception:
+        logger.exception("release_claims failed")
+        return False
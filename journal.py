@@ -0,0 +1,303 @@
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import local_store
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("journal")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# Write-ahead journal: every save is recorded here before it is sent to
+# the sheet. An entry is claimed (state 'applying') before it is applied
+# and only when every older entry of the same activity is committed, so
+# saves reach the sheet in order even with several workers flushing.
+# Each entry carries an idempotency key (write_key); re-applying an entry
+# whose acknowledgement was lost is a no-op on the storage side.
+# An entry that keeps failing (MAX_ATTEMPTS), or whose apply raised
+# PermanentError, is parked in state 'failed' (dead letter); it no longer
+# holds back the newer entries of its activity.
+DB_NAME = "journal.sqlite3"
+FLUSH_SECONDS = 2.0
+FLUSH_BATCH = 50
+CLAIM_SECONDS = 60          # an 'applying' claim older than this is retried
+MAX_BACKOFF_SECONDS = 300
+MAX_ATTEMPTS = 20           # about an hour of retries at the backoff cap
+RETENTION_SECONDS = 24 * 3600
+FAILED_RETENTION_SECONDS = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    write_key TEXT NOT NULL UNIQUE,
+    activity_id TEXT NOT NULL,
+    user_id TEXT,
+    args TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    owner TEXT,
+    claimed_until REAL,
+    created_at REAL NOT NULL,
+    committed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_journal_state ON journal (state, seq);
+CREATE INDEX IF NOT EXISTS idx_journal_activity ON journal (activity_id, state);
+"""
+
+_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_lock = threading.Lock()
+_flusher: Dict[str, Any] = {"thread": None, "wake": threading.Event(), "flushed": 0, "failed": 0}
+
+
+class PermanentError(Exception):
+    """Raised by apply() when retrying the entry cannot succeed (bad payload, 4xx)."""
+
+
+def _connect():
+    return local_store.connect(DB_NAME, SCHEMA)
+
+
+def _entry(row) -> Dict[str, Any]:
+    return {
+        "seq": row["seq"],
+        "write_key": row["write_key"],
+        "activity_id": row["activity_id"],
+        "user_id": row["user_id"],
+        "args": json.loads(row["args"]),
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+    }
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def append(activity_id: str, user_id: str, args: Dict[str, Any]) -> str:
+    """Catat satu simpanan (durable) dan kembalikan idempotency key-nya."""
+    write_key = f"{_OWNER}-{uuid.uuid4().hex}"
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO journal (write_key, activity_id, user_id, args, created_at) VALUES (?, ?, ?, ?, ?)",
+            (write_key, activity_id, user_id, json.dumps(args, ensure_ascii=False), time.time()),
+        )
+    finally:
+        conn.close()
+    return write_key
+
+
+def claim(write_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Ambil hak menerapkan satu entri. None bila entri sudah committed,
+    sedang diterapkan worker lain, atau masih ada entri lebih lama untuk
+    kegiatan yang sama.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cur = conn.execute(
+            "UPDATE journal SET state = 'applying', owner = ?, claimed_until = ? "
+            "WHERE write_key = ? "
+            "AND (state = 'pending' OR (state = 'applying' AND claimed_until < ?)) "
+            "AND NOT EXISTS (SELECT 1 FROM journal older WHERE older.activity_id = journal.activity_id "
+            "AND older.seq < journal.seq AND older.state NOT IN ('committed', 'failed'))",
+            (_OWNER, now + CLAIM_SECONDS, write_key, now),
+        )
+        if cur.rowcount != 1:
+            return None
+        row = conn.execute("SELECT * FROM journal WHERE write_key = ?", (write_key,)).fetchone()
+        return _entry(row)
+    finally:
+        conn.close()
+
+
+def claim_batch(limit: int = FLUSH_BATCH) -> List[Dict[str, Any]]:
+    """Klaim entri tertua yang siap dikirim, paling banyak satu per kegiatan."""
+    now = time.time()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT write_key, activity_id FROM journal "
+            "WHERE (state = 'pending' AND next_attempt_at <= ?) "
+            "OR (state = 'applying' AND claimed_until < ?) "
+            "ORDER BY seq LIMIT ?",
+            (now, now, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    out, seen = [], set()
+    for row in rows:
+        if row["activity_id"] in seen:
+            continue
+        seen.add(row["activity_id"])
+        entry = claim(row["write_key"])
+        if entry:
+            out.append(entry)
+    return out
+
+
+def committed(write_key: str) -> None:
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE journal SET state = 'committed', committed_at = ?, last_error = NULL, owner = NULL "
+            "WHERE write_key = ?",
+            (time.time(), write_key),
+        )
+    finally:
+        conn.close()
+
+
+def failed(write_key: str, error: str) -> None:
+    """
+    Kembalikan entri ke antrean dengan backoff eksponensial; setelah
+    MAX_ATTEMPTS percobaan entri berhenti dicoba (state 'failed').
+    """
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE journal SET state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, attempts = attempts + 1, last_error = ?, "
+            "next_attempt_at = ? + MIN(?, 1 << MIN(attempts, 16)) WHERE write_key = ?",
+            (MAX_ATTEMPTS, error, time.time(), MAX_BACKOFF_SECONDS, write_key),
+        )
+    finally:
+        conn.close()
+
+
+def give_up(write_key: str, error: str) -> None:
+    """Hentikan entri yang tidak mungkin berhasil bila dicoba ulang (state 'failed')."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE journal SET state = 'failed', owner = NULL, attempts = attempts + 1, last_error = ? "
+            "WHERE write_key = ?",
+            (error, write_key),
+        )
+    finally:
+        conn.close()
+    logger.error(f"journal entry {write_key} failed permanently: {error}")
+
+
+def status(activity_id: Optional[str] = None) -> Dict[str, Any]:
+    """Jumlah simpanan yang belum terkirim, yang gagal permanen, dan terakhir kali terkirim."""
+    where, params = ("WHERE activity_id = ?", [activity_id]) if activity_id else ("", [])
+    conn = _connect()
+    try:
+        row = conn.execute(
+            f"SELECT SUM(state IN ('pending', 'applying')) AS pending, SUM(state = 'failed') AS failed, "
+            f"MIN(CASE WHEN state IN ('pending', 'applying') THEN created_at END) AS oldest_pending_at, "
+            f"MAX(committed_at) AS last_committed_at FROM journal {where}",
+            params,
+        ).fetchone()
+        error = conn.execute(
+            f"SELECT last_error FROM journal {where} {'AND' if where else 'WHERE'} "
+            f"state != 'committed' AND last_error IS NOT NULL ORDER BY seq DESC LIMIT 1",
+            params,
+        ).fetchone()
+    finally:
+        conn.close()
+    with _lock:
+        flushed, failures = _flusher["flushed"], _flusher["failed"]
+    return {
+        "pending": row["pending"] or 0,
+        "failed": row["failed"] or 0,
+        "oldest_pending_at": row["oldest_pending_at"],
+        "last_committed_at": row["last_committed_at"],
+        "last_error": error["last_error"] if error else None,
+        "flushed": flushed,
+        "flush_failures": failures,
+    }
+
+
+def wake() -> None:
+    """Minta flusher mencoba lagi sekarang (mis. setelah simpanan baru masuk antrean)."""
+    _flusher["wake"].set()
+
+
+def start(apply: Callable[[Dict[str, Any]], bool]) -> None:
+    """
+    Jalankan flusher (sekali per proses). `apply(entry)` menulis satu entri
+    ke storage dan mengembalikan True bila berhasil; error-nya dicatat
+    sebagai last_error, PermanentError menghentikan entri seketika.
+    """
+    with _lock:
+        if _flusher["thread"] is not None:
+            return
+        thread = threading.Thread(target=_run, args=(apply,), name="journal-flusher", daemon=True)
+        _flusher["thread"] = thread
+    thread.start()
+
+
+# -------------------------------------------------
+# Internals
+# -------------------------------------------------
+def flush(apply: Callable[[Dict[str, Any]], bool], limit: int = FLUSH_BATCH) -> int:
+    """Kirim satu batch entri tertunda; mengembalikan jumlah yang berhasil."""
+    done = 0
+    for entry in claim_batch(limit):
+        try:
+            ok = apply(entry)
+            error = None if ok else "write failed"
+        except PermanentError as e:
+            give_up(entry["write_key"], str(e))
+            ok, error = False, None
+        except Exception as e:
+            logger.exception("journal apply failed")
+            ok, error = False, f"{type(e).__name__}: {e}"
+
+        if ok:
+            committed(entry["write_key"])
+            done += 1
+        elif error:
+            failed(entry["write_key"], error)
+
+        with _lock:
+            _flusher["flushed" if ok else "failed"] += 1
+    return done
+
+
+def _prune() -> None:
+    conn = _connect()
+    try:
+        now = time.time()
+        conn.execute(
+            "DELETE FROM journal WHERE (state = 'committed' AND committed_at < ?) "
+            "OR (state = 'failed' AND created_at < ?)",
+            (now - RETENTION_SECONDS, now - FAILED_RETENTION_SECONDS),
+        )
+    finally:
+        conn.close()
+
+
+def _run(apply: Callable[[Dict[str, Any]], bool]) -> None:
+    rounds = 0
+    while True:
+        try:
+            # keep going while full batches succeed, then wait
+            while flush(apply) == FLUSH_BATCH:
+                pass
+            rounds += 1
+            if rounds % 1000 == 0:
+                _prune()
+        except Exception:
+            logger.exception("journal flush failed")
+
+        _flusher["wake"].wait(FLUSH_SECONDS)
+        _flusher["wake"].clear()
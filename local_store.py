@@ -0,0 +1,263 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import datetime
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+# -------------------------------------------------
+# Host-local SQLite files (shared by all Streamlit workers on the host)
+# -------------------------------------------------
+LOCAL_STORE_DIR = os.environ.get("MS_FORM_LOCAL_DIR", ".local_store")
+
+
+def path(name: str) -> str:
+    os.makedirs(LOCAL_STORE_DIR, exist_ok=True)
+    return os.path.join(LOCAL_STORE_DIR, name)
+
+
+def connect(name: str, schema: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Buka koneksi baru (satu per pemanggilan, aman dipakai dari thread mana
+    pun). WAL membuat pembaca tidak terblokir oleh penulis dari proses lain.
+    """
+    conn = sqlite3.connect(path(name), timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if schema:
+        conn.executescript(schema)
+    return conn
+
+
+# -------------------------------------------------
+# Per-activity derived stores
+# -------------------------------------------------
+# search_index, catalog and dependency_graph each derive their own tables
+# from part of every activity's payload. The bookkeeping they share lives
+# here. `activities` keeps the derived part of the payload (`source`),
+# its fingerprint and the status: unchanged text is not derived again,
+# and a partial patch is merged without reading the sheet. `synced` keeps
+# the storage updated_at each activity was derived from, so a sync with
+# the sheet only fetches what another host changed (NULL = written on
+# this host, compared again at the next sync).
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS synced (
+    activity_id TEXT PRIMARY KEY,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def fingerprint(source: Dict[str, Any]) -> str:
+    content = json.dumps(source, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+class ActivityStore:
+    """
+    Satu store turunan per kegiatan. Modul indeks mengonfigurasinya dengan:
+    source(data) -> bagian payload yang dipakai; replace(conn, activity_id,
+    status, source, old) menulis ulang tabel turunannya (source None =
+    hapus; old = baris `activities` sebelumnya); opsional columns(source,
+    user_id) -> kolom tambahan `activities`, on_status(conn, activity_id,
+    status), load (pengganti replace saat rebuild) dan finish(conn) setelah
+    semua kegiatan dimuat.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        schema: str,
+        version: str,
+        tables: List[str],
+        source: Callable[[Dict[str, Any]], Dict[str, Any]],
+        replace: Callable[..., None],
+        logger: logging.Logger,
+        label: str,
+        columns: Optional[Callable[[Dict[str, Any], Optional[str]], Dict[str, Any]]] = None,
+        on_status: Optional[Callable[..., None]] = None,
+        load: Optional[Callable[..., None]] = None,
+        finish: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        self.name = name
+        self.schema = schema + STORE_SCHEMA
+        self.version = version
+        self.tables = tables
+        self.source = source
+        self.replace = replace
+        self.logger = logger
+        self.label = label
+        self.columns = columns or (lambda source, user_id: {})
+        self.on_status = on_status
+        self.load = load or replace
+        self.finish = finish
+
+    def connect(self) -> sqlite3.Connection:
+        return connect(self.name, self.schema)
+
+    def _write(self, conn, activity_id: str, status: Optional[str], source: Dict[str, Any], user_id: Optional[str]) -> None:
+        values = {
+            "status": status,
+            "fingerprint": fingerprint(source),
+            "source": json.dumps(source, ensure_ascii=False, default=str),
+            **self.columns(source, user_id),
+        }
+        names = ", ".join(values)
+        conn.execute(
+            f"INSERT INTO activities (activity_id, {names}) VALUES (?{', ?' * len(values)}) "
+            f"ON CONFLICT (activity_id) DO UPDATE SET {', '.join(f'{k} = excluded.{k}' for k in values)}",
+            (activity_id, *values.values()),
+        )
+
+    def _stamp(self, conn, activity_id: str, updated_at: Optional[str]) -> None:
+        conn.execute("INSERT OR REPLACE INTO synced (activity_id, updated_at) VALUES (?, ?)", (activity_id, updated_at))
+
+    def indexed_source(self, activity_id: str) -> Optional[Dict[str, Any]]:
+        """Bagian payload yang tercatat untuk satu kegiatan; None bila belum ada."""
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT source FROM activities WHERE activity_id = ?", (activity_id,)).fetchone()
+            return json.loads(row["source"]) if row else None
+        finally:
+            conn.close()
+
+    def put(
+        self,
+        activity_id: str,
+        user_id: Optional[str],
+        status: Optional[str],
+        data: Dict[str, Any],
+        updated_at: Optional[str] = None,
+    ) -> bool:
+        """
+        Perbarui bagian store milik satu kegiatan. Tabel turunan hanya
+        ditulis ulang bila isinya berubah; mengembalikan True bila itu terjadi.
+        """
+        source = self.source(data or {})
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute("SELECT * FROM activities WHERE activity_id = ?", (activity_id,)).fetchone()
+            status = status if status is not None else (old["status"] if old else None)
+            changed = old is None or old["fingerprint"] != fingerprint(source)
+            self._write(conn, activity_id, status, source, user_id)
+            if changed:
+                self.replace(conn, activity_id, status, source, old)
+            elif status != old["status"] and self.on_status:
+                self.on_status(conn, activity_id, status)
+            self._stamp(conn, activity_id, updated_at)
+            conn.execute("COMMIT")
+            return changed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def set_status(self, activity_id: str, status: str) -> None:
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute("SELECT status FROM activities WHERE activity_id = ?", (activity_id,)).fetchone()
+            if old is not None and old["status"] != status:
+                conn.execute("UPDATE activities SET status = ? WHERE activity_id = ?", (status, activity_id))
+                if self.on_status:
+                    self.on_status(conn, activity_id, status)
+                self._stamp(conn, activity_id, None)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def remove(self, activity_id: str) -> None:
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            old = conn.execute("SELECT * FROM activities WHERE activity_id = ?", (activity_id,)).fetchone()
+            conn.execute("DELETE FROM activities WHERE activity_id = ?", (activity_id,))
+            conn.execute("DELETE FROM synced WHERE activity_id = ?", (activity_id,))
+            self.replace(conn, activity_id, None, None, old)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _meta(self, key: str) -> Optional[str]:
+        conn = self.connect()
+        try:
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if not version or version["value"] != self.version:
+                return None     # built by an older version: rebuild
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row["value"] if row else None
+        finally:
+            conn.close()
+
+    def last_rebuilt(self) -> Optional[str]:
+        """Waktu rebuild penuh terakhir; None berarti store belum pernah dibangun."""
+        return self._meta("rebuilt_at")
+
+    def last_synced(self) -> Optional[str]:
+        """Waktu terakhir store disamakan dengan storage (rebuild atau sync)."""
+        return self._meta("synced_at")
+
+    def synced(self) -> Dict[str, Optional[str]]:
+        """activity_id -> updated_at storage yang terakhir dimuat (None = ditulis di host ini)."""
+        conn = self.connect()
+        try:
+            return {r["activity_id"]: r["updated_at"] for r in conn.execute("SELECT activity_id, updated_at FROM synced")}
+        finally:
+            conn.close()
+
+    def mark_synced(self) -> None:
+        conn = self.connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('synced_at', ?)",
+                (datetime.datetime.utcnow().isoformat(),),
+            )
+        finally:
+            conn.close()
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Bangun ulang seluruh store dari record kegiatan (memperbaiki drift)."""
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in self.tables + ["activities", "synced"]:
+                conn.execute(f"DELETE FROM {table}")
+            n = 0
+            for record in records:
+                activity_id = record.get("activity_id")
+                if not activity_id:
+                    continue
+                source = self.source(record.get("data") or {})
+                self._write(conn, activity_id, record.get("status"), source, record.get("user_id"))
+                self.load(conn, activity_id, record.get("status"), source, None)
+                self._stamp(conn, activity_id, record.get("updated_at"))
+                n += 1
+            if self.finish:
+                self.finish(conn)
+            now = datetime.datetime.utcnow().isoformat()
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('rebuilt_at', ?), ('synced_at', ?), ('version', ?)",
+                (now, now, self.version),
+            )
+            conn.execute("COMMIT")
+            self.logger.info(f"{self.label} rebuilt from {n} activities")
+            return n
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
@@ -1,7 +1,35 @@
 import streamlit as st
 from datetime import datetime
 import uuid
-from gsheet_client import (get_activity, upsert_activity, mark_status)
+from gsheet_client import (get_activity, save_activity, journal_status, breaker_status, mark_status, suggest_definitions,
+                          dependency_report, variable_dependents, SECTIONS)
+from catalog import DEFINITION_FIELD
+from dependency_graph import PROBLEMS
+import autosave
+import validation
+from form_options import (
+    SEKTOR_OPTIONS,
+    JENIS_STATISTIK_OPTIONS,
+    YA_TIDAK_OPTIONS,
+    CARA_PENGUMPULAN_OPTIONS,
+    FREKUENSI_OPTIONS,
+    TIPE_PENGUMPULAN_OPTIONS,
+    WILAYAH_OPTIONS,
+    METODE_PENGUMPULAN_OPTIONS,
+    SARANA_PENGUMPULAN_OPTIONS,
+    UNIT_PENGUMPULAN_OPTIONS,
+    RANCANGAN_SAMPEL_OPTIONS,
+    METODE_PROBABILITY_OPTIONS,
+    KERANGKA_SAMPEL_OPTIONS,
+    METODE_NONPROBABILITY_OPTIONS,
+    QC_OPTIONS,
+    INTERVIEW_BASED_SARANA,
+    PETUGAS_OPTIONS,
+    PENDIDIKAN_PETUGAS_OPTIONS,
+    METODE_ANALISIS_OPTIONS,
+    UNIT_ANALISIS_OPTIONS,
+    TINGKAT_PENYAJIAN_OPTIONS,
+)
 
 st.set_page_config(page_title="Formulir MS Kegiatan", page_icon="📝", layout="wide")
 
@@ -52,38 +80,80 @@ def load_form(activity_id, username, role):
     # Default (should not happen)
     return None
 
-def save_form(activity_id, username, data):
-    row = get_activity(activity_id)
-    if not row:
-        success, row = upsert_activity(
-            activity_id=activity_id,
-            user_id=username,
-            payload=data,
-            status="draft"
-        )
-        return success
-    
-    owner_id = row.get("user_id")   # ALWAYS USE ORIGINAL OWNER
-    success, row = upsert_activity(
+def save_form(activity_id, username, data, merge=False):
+    """
+    Simpan hanya section yang ada di `data`; section lain di storage tidak
+    disentuh. Pemilik asli baris dipertahankan oleh patch_activity.
+    Simpanan masuk journal lokal dulu: "committed", "pending" atau "failed".
+    """
+    sections = {sec: data[sec] for sec in SECTIONS if sec in data}
+    meta = {k: v for k, v in data.items() if k not in SECTIONS}
+    state, row = save_activity(
         activity_id=activity_id,
-        user_id=owner_id,     # <-- fixed
-        payload=data,
+        user_id=username,
+        sections=sections,
+        meta=meta,
         status="draft",
+        merge=merge,
     )
-    return success
+    return state
+
+def show_save_result(state):
+    if state == "committed":
+        st.success("✅ Tersimpan!")
+    elif state == "pending":
+        st.warning("⏳ Tersimpan di antrean lokal, akan dikirim otomatis ke server")
+    else:
+        st.error("❌ Gagal menyimpan")
     
 def submit_form(activity_id): 
     """Submit final ke temporary table.""" 
-    row = get_activity(activity_id)
-    owner_id = row.get("user_id")
-    
-    return upsert_activity(
+    data = st.session_state.form_data
+    return save_activity(
         activity_id=activity_id,
-        user_id=owner_id,   # ALWAYS OWNER
-        payload=st.session_state.form_data,
+        user_id=username,   # owner lama dipertahankan oleh patch_activity
+        sections={sec: data[sec] for sec in SECTIONS if sec in data},
+        meta={k: v for k, v in data.items() if k not in SECTIONS},
         status="submitted",
+        merge=False,
     )[0]
 
+def form_sections():
+    return {sec: st.session_state.get(sec) for sec in SECTIONS}
+
+def show_rule_problems(*fields):
+    """
+    Tampilkan pelanggaran rule lintas-field milik `fields` ("section.field")
+    di bawah widgetnya. State di session: tiap panggilan hanya menjalankan
+    ulang rule yang field-nya berubah.
+    """
+    state = st.session_state.setdefault("validation_state", validation.new_state())
+    for p in validation.evaluate(form_sections(), state):
+        if f"{p['section']}.{p['field']}" in fields:
+            (st.error if p["severity"] == "error" else st.warning)(f"⚠️ {p['message']}")
+
+def use_definition(items, i, prefix, fields):
+    """Salin definisi dari katalog ke item ke-i (on_click, jadi jalan sebelum widget dibuat)."""
+    items[i].update(fields)
+    for field, value in fields.items():
+        st.session_state[f"{prefix}_{field}_{i}"] = value
+
+def show_suggestions(kind, prefix, items, i, name):
+    """Tawarkan definisi variabel/indikator bernama mirip dari kegiatan lain."""
+    suggestions = suggest_definitions(kind, name, exclude_activity=st.session_state.get("current_activity_id"))
+    if not suggestions:
+        return
+    st.caption("💡 Sudah pernah didefinisikan di kegiatan lain:")
+    for n, s in enumerate(suggestions):
+        definition = str(s["fields"].get(DEFINITION_FIELD[kind]) or "-")
+        verified = ", verified" if s["verified"] else ""
+        st.button(
+            f"↪️ {s['name']} — {definition[:80]} ({s['uses']} kegiatan{verified})",
+            key=f"{prefix}_suggest_{i}_{n}",
+            on_click=use_definition,
+            args=(items, i, prefix, s["fields"]),
+        )
+
 # ===================================================== 
 # 3️⃣ LOAD STORAGE (EDIT MODE) 
 # ===================================================== 
@@ -104,6 +174,7 @@ if edit_id:
     if supa_data: 
         st.session_state.current_activity_id = edit_id
         st.session_state.form_data = supa_data.copy() 
+        autosave.prime(edit_id, supa_data)
     else: 
         st.warning("⚠️ Data tidak ditemukan. Membuat draft baru.")
         edit_id = None
@@ -116,6 +187,7 @@ if not edit_id:
         new_id = str(uuid.uuid4()) 
         st.session_state.current_activity_id = new_id
         save_form(new_id, username, {})
+        autosave.prime(new_id, {})
         st.session_state.form_data = {
             "activity_id": new_id,
             "owner": username,
@@ -179,7 +251,7 @@ with tab1:
         st.subheader("🧾 Halaman Awal")
 
         # 1. Jenis Statistik
-        jenis_options = ["Statistik Dasar", "Statistik Sektoral", "Statistik Khusus"]
+        jenis_options = JENIS_STATISTIK_OPTIONS
         stored_value = st.session_state["halaman_awal"].get("jenis_statistik", "")
         jenis_statistik = st.radio(
             "Jenis Statistik",
@@ -192,7 +264,7 @@ with tab1:
         st.session_state["halaman_awal"]["jenis_statistik"] = jenis_statistik
 
         # 2. Rekomendasi
-        rekomendasi_options = ["Ya", "Tidak"]
+        rekomendasi_options = YA_TIDAK_OPTIONS
         stored_value = st.session_state["halaman_awal"].get("rekomendasi", "")
         rekomendasi = st.radio(
             "Apakah kegiatan ini merupakan rekomendasi?",
@@ -210,6 +282,7 @@ with tab1:
         else:
             rekomendasi_id = st.text_input("Masukkan ID Rekomendasi", value="", placeholder="Wajib diisi jika kegiatan ini adalah rekomendasi", disabled = is_readonly)
         st.session_state["halaman_awal"]["rekomendasi_id"] = rekomendasi_id
+        show_rule_problems("halaman_awal.rekomendasi_id")
 
         # 3. Judul
         judul = st.text_input("Judul Kegiatan", value=st.session_state["halaman_awal"].get("judul", None), key = "judul", disabled = is_readonly)
@@ -220,7 +293,7 @@ with tab1:
         st.session_state["halaman_awal"]["tahun"] = tahun
 
         # 5. Cara Pengumpulan
-        pengumpulan_options = ["Pencacahan Lengkap", "Survei", "Kompilasi Produk Administrasi", "Cara Lain Sesuai dengan Perkembangan TI"]
+        pengumpulan_options = CARA_PENGUMPULAN_OPTIONS
         stored_value = st.session_state["halaman_awal"].get("cara_pengumpulan", "")
         cara_pengumpulan = st.selectbox(
             "Cara Pengumpulan Data",
@@ -232,12 +305,7 @@ with tab1:
         st.session_state["halaman_awal"]["cara_pengumpulan"] = cara_pengumpulan
 
         # 6. Sektor
-        sektor_options = ["Pertanian dan Perikanan", "Demografi dan Kependudukan", "Pembangunan", "Proyeksi Ekonomi", "Pendidikan dan Pelatihan",
-                "Lingkungan", "Keuangan", "Globalisasi", "Kesehatan", "Industri dan Jasa",
-                "Teknologi Informasi dan Komunikasi", "Perdagangan Internasional dan Neraca Perdagangan", "Ketenagakerjaan", "Neraca Nasional",
-                "Indikator Ekonomi Bulanan", "Produktivitas", "Harga dan Paritas Daya Beli", 
-                "Sektor Publik, Perpajakan, dan Regulasi Pasar", "Perwilayahan dan Perkotaan",
-                "Ilmu Pengetahuan dan Hak Paten", "Perlindungan Sosial dan Kesejahteraan", "Transportasi"]
+        sektor_options = SEKTOR_OPTIONS
         stored_value = st.session_state["halaman_awal"].get("sektor", "")
         sektor = st.selectbox(
             "Sektor",
@@ -264,15 +332,16 @@ with tab1:
                     "last_saved": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
             } 
-            success = save_form(
+            result = save_form(
                 activity_id=st.session_state.current_activity_id, 
                 username=username, 
-                data=new_entry,) 
+                data=new_entry,
+                merge=True,) 
             
-            if success: 
-                st.success("✅ Tersimpan!") 
-            else: 
-                st.error("❌ Gagal menyimpan")
+            if result != "failed":
+                # autosave compares against the session section, not new_entry
+                autosave.mark_saved(st.session_state.current_activity_id, {"halaman_awal": st.session_state["halaman_awal"]})
+            show_save_result(result)
     
 
     if "blok_1_3" not in st.session_state:
@@ -371,6 +440,7 @@ with tab1:
                     value=st.session_state["blok_1_3"].get(end_key, None),
                     key=end_key,disabled = is_readonly
                 )
+            show_rule_problems(f"blok_1_3.{end_key}")
 
         def save_date(start_key, end_key):
             start = st.session_state["blok_1_3"].get(start_key)
@@ -442,6 +512,9 @@ with tab1:
                     st.session_state.variables[i]["definition"] = st.text_area(
                         "Definisi", value=var.get("definition", ""), key=f"var_definition_{i}", disabled = is_readonly
                     )
+
+                if not is_readonly and len(var.get("name") or "") >= 3 and not var.get("definition"):
+                    show_suggestions("variabel", "var", st.session_state.variables, i, var["name"])
         
                 if st.button(f"🗑️ Hapus Variabel {i+1}", key=f"remove_var_{i}", disabled = is_readonly):
                     remove_var_index = i
@@ -456,7 +529,7 @@ with tab1:
     with st.expander("📘 BLOK 4 – DESAIN KEGIATAN", expanded=False):
 
         # Q4.1 & Q4.2
-        frekuensi_options = ["Hanya Sekali", "Harian", "Mingguan", "Bulanan", "Triwulanan", "Empat Bulanan", "Semesteran", "Tahunan", "Lebih dari Dua Tahunan"]
+        frekuensi_options = FREKUENSI_OPTIONS
         stored_value = st.session_state["blok_4"].get("iv_frekuensi_penyelenggaraan", "")
         st.markdown("##### 4.1 - 4.2 Frekuensi Penyelenggaraan", unsafe_allow_html=True)
         iv_frekuensi_penyelenggaraan = st.radio(
@@ -478,7 +551,7 @@ with tab1:
         st.session_state["blok_4"]["iv_kegiatan_ini_dilakukan"] = iv_kegiatan_ini_dilakukan
 
         # Q4.3
-        pengumpulan_options = ["Longitudinal Panel", "Longitudinal Cross Sectional", "Cross Sectional"]
+        pengumpulan_options = TIPE_PENGUMPULAN_OPTIONS
         stored_value = st.session_state["blok_4"].get("iv_tipe_pengumpulan_data", "")
         st.markdown("##### 4.3 Tipe Pengumpulan Data", unsafe_allow_html=True)
         iv_tipe_pengumpulan_data = st.radio(
@@ -494,12 +567,7 @@ with tab1:
 
         # Q4.4 & Q4.5
         st.markdown("##### 4.4 - 4.5 Cakupan Wilayah Pengumpulan Data", unsafe_allow_html=True)
-        wilayah_options = ['SELURUH WILAYAH INDONESIA', 'ACEH', 'SUMATERA UTARA', 'SUMATERA BARAT', 'RIAU', 'JAMBI', 'SUMATERA SELATAN', 'BENGKULU',
-                           'LAMPUNG','KEP. BANGKA BELITUNG', 'KEP. RIAU', 'DKI JAKARTA', 'JAWA BARAT', 'JAWA TENGAH', 'DI YOGYAKARTA', 'JAWA TIMUR',
-                           'BANTEN', 'BALI', 'NUSA TENGGARA BARAT', 'NUSA TENGGARA TIMUR', 'KALIMANTAN BARAT', 'KALIMANTAN TENGAH',
-                           'KALIMANTAN SELATAN', 'KALIMANTAN TIMUR', 'KALIMANTAN UTARA', 'SULAWESI UTARA', 'SULAWESI TENGAH', 'SULAWESI SELATAN',
-                           'SULAWESI TENGGARA', 'GORONTALO', 'SULAWESI BARAT', 'MALUKU', 'MALUKU UTARA', 'PAPUA', 'PAPUA BARAT', 'PAPUA SELATAN',
-                           'PAPUA TENGAH', 'PAPUA PEGUNUNGAN', 'PAPUA BARAT DAYA']
+        wilayah_options = WILAYAH_OPTIONS
         stored_value = st.session_state["blok_4"].get("iv_sebagian_cakupan_wilayah_pengumpulan_data", "")
         iv_sebagian_cakupan_wilayah_pengumpulan_data = st.multiselect(
             "4.5 Wilayah Kegiatan",
@@ -519,7 +587,7 @@ with tab1:
         st.session_state["blok_4"]["iv_sebagian_cakupan_wilayah_pengumpulan_data"] = iv_sebagian_cakupan_wilayah_pengumpulan_data
 
         # Q4.6
-        metode_options = ["Wawancara", "Mengisi Kuesioner Sendiri", "Pengamatan", "Pengumpulan Data Sekunder", "Lainnya"]
+        metode_options = METODE_PENGUMPULAN_OPTIONS
         stored_value = st.session_state["blok_4"].get("metode_utama", "")
         if isinstance(stored_value, list):
             valid_default = [m for m in stored_value if m in metode_options]
@@ -538,6 +606,7 @@ with tab1:
 
         metode_lain = st.text_input("Lainnya: Sebutkan metode pengumpulan lain", value=st.session_state["blok_4"].get("metode_lain", ""), key="metode_lain", placeholder = "Wajib diisi jika memilih opsi 'Lainnya'", disabled = is_readonly)
         st.session_state["blok_4"]["metode_lain"] = metode_lain
+        show_rule_problems("blok_4.metode_lain")
         iv_metode_pengumpulan_data = metode_utama.copy()
         if "Lainnya" in iv_metode_pengumpulan_data:
             if metode_lain.strip():  # only replace if user actually typed something
@@ -552,7 +621,7 @@ with tab1:
         # iv_metode_pengumpulan_data = metode_utama.append(f"Lainnya: {metode_lain}")
 
         # Q4.7
-        sarana_options = ["Paper-assisted Personal Interviewing (PAPI)", "Computer-assisted Personal Interviewing (CAPI)", "Computer-assisted Telephones Interviewing (CATI)", "Computer Aided Web Interviewing (CAWI)", "Mail", "Lainnya"]
+        sarana_options = SARANA_PENGUMPULAN_OPTIONS
         stored_value = st.session_state["blok_4"].get("sarana_utama", "")
         st.markdown("##### 4.7 Sarana Pengumpulan Data", unsafe_allow_html=True)
         sarana_utama = st.multiselect(
@@ -567,6 +636,7 @@ with tab1:
 
         sarana_lain = st.text_input("Lainnya: Sebutkan sarana pengumpulan lain", value=st.session_state["blok_4"].get("sarana_lain", ""), key="sarana_lain", placeholder = "Wajib diisi jika memilih opsi 'Lainnya'", disabled = is_readonly)
         st.session_state["blok_4"]["sarana_lain"] = sarana_lain
+        show_rule_problems("blok_4.sarana_lain")
         iv_sarana_pengumpulan_data = sarana_utama.copy()
         if "Lainnya" in iv_sarana_pengumpulan_data:
             if sarana_lain.strip():  # only replace if user actually typed something
@@ -580,7 +650,7 @@ with tab1:
         st.session_state["blok_4"]["iv_sarana_pengumpulan_data"] = iv_sarana_pengumpulan_data
 
         # Q4.8
-        unit_options = ["Individu", "Rumah Tangga", "Usaha/Perusahaan", "Lainnya"]
+        unit_options = UNIT_PENGUMPULAN_OPTIONS
         stored_value = st.session_state["blok_4"].get("unit_utama", "")
         st.markdown("##### 4.8 Unit Pengumpulan Data", unsafe_allow_html=True)
         unit_utama = st.multiselect(
@@ -595,6 +665,7 @@ with tab1:
 
         unit_lain = st.text_input("Lainnya: Sebutkan unit pengumpulan lain", value=st.session_state["blok_4"].get("unit_lain", ""), key="unit_lain", placeholder = "Wajib diisi jika memilih opsi 'Lainnya'", disabled = is_readonly)
         st.session_state["blok_4"]["unit_lain"] = unit_lain
+        show_rule_problems("blok_4.unit_lain")
         iv_unit_pengumpulan_data = unit_utama.copy()
         if "Lainnya" in iv_unit_pengumpulan_data:
             if unit_lain.strip():  # only replace if user actually typed something
@@ -615,7 +686,7 @@ with tab1:
         with st.expander("📘 BLOK 5 - DESAIN SAMPEL", expanded=False):        
     
             # 5.1 Jenis Rancangan Sampel
-            rancangan_options = ["Single Stage atau Phase Dasar", "Multi Stage atau Phase"]
+            rancangan_options = RANCANGAN_SAMPEL_OPTIONS
             stored_value = st.session_state["blok_5"].get("v_jenis_rancangan_sampel", "")
             st.markdown("##### 5.1 Jenis Rancangan Sampel")
             v_jenis_rancangan_sampel = st.radio(
@@ -646,8 +717,7 @@ with tab1:
             v_nilai_perkiraan_sampling_error_variabel_utama = ""
             if sampel_prob:
                 st.session_state["blok_5"]["pemilihan_sampel"] = "Sampel Probabilitas"
-                prob_options = ["Simple Random Sampling", "Systematic Random Sampling", "Stratified Random Sampling", "Cluster Sampling",
-                               "Probability Proportional to Size Sampling"] 
+                prob_options = METODE_PROBABILITY_OPTIONS
                 stored_value = st.session_state["blok_5"].get("v_metode_yang_digunakan", "")
                 st.markdown("##### 5.3 Metode yang Digunakan")
                 v_metode_yang_digunakan = st.radio(
@@ -661,7 +731,7 @@ with tab1:
                 )
                 st.session_state["blok_5"]["v_metode_yang_digunakan"] = v_metode_yang_digunakan
     
-                kerangka_options = ["List Frame", "Area Frame"] 
+                kerangka_options = KERANGKA_SAMPEL_OPTIONS
                 stored_value = st.session_state["blok_5"].get("v_kerangka_sampel_tahap_akhir", "")
                 st.markdown("##### 5.4 Kerangka Sampel Tahap Terakhir")
                 v_kerangka_sampel_tahap_akhir = st.radio(
@@ -695,7 +765,7 @@ with tab1:
     
             if sampel_nonprob:
                 st.session_state["blok_5"]["pemilihan_sampel"] = "Sampel Nonprobabilitas"
-                nonprob_options = ["Quota Sampling", "Accidental Sampling", "Purposive Sampling", "Snowball Sampling", "Saturation Sampling"] 
+                nonprob_options = METODE_NONPROBABILITY_OPTIONS
                 stored_value = st.session_state["blok_5"].get("v_metode_yang_digunakan", "")
                 st.markdown("##### 5.3 Metode yang Digunakan")
                 v_metode_yang_digunakan = st.radio(
@@ -747,7 +817,7 @@ with tab1:
             
         
         #Q6.2
-        qc_options = ["Kunjungan Kembali", "Supervisi", "Task Force", "Lainnya"]
+        qc_options = QC_OPTIONS
         stored_value = st.session_state["blok_6_8"].get("qc_utama", "")
         st.markdown("##### 6.2 Metode Pemeriksaan Kualitas Pengumpulan Data", unsafe_allow_html=True)
         qc_utama = st.multiselect(
@@ -762,6 +832,7 @@ with tab1:
 
         qc_lain = st.text_input("Lainnya: Sebutkan metode pemeriksaan kualitas lain", value=st.session_state["blok_6_8"].get("qc_lain", ""), key="qc_lain", placeholder = "Wajib diisi jika memilih opsi 'Lainnya'", disabled = is_readonly)
         st.session_state["blok_6_8"]["qc_lain"] = qc_lain
+        show_rule_problems("blok_6_8.qc_lain")
         vi_metode_pemeriksaan_kualitas_pengumpulan_data = qc_utama.copy()
         if "Lainnya" in vi_metode_pemeriksaan_kualitas_pengumpulan_data:
             if qc_lain.strip():  # only replace if user actually typed something
@@ -774,8 +845,7 @@ with tab1:
 
         st.session_state["blok_6_8"]["vi_metode_pemeriksaan_kualitas_pengumpulan_data"] = vi_metode_pemeriksaan_kualitas_pengumpulan_data
 
-        interview_based = ["Paper-assisted Personal Interviewing (PAPI)", "Computer-assisted Personal Interviewing (CAPI)",
-                           "Computer-assisted Telephones Interviewing (CATI)"]
+        interview_based = INTERVIEW_BASED_SARANA
         
         # Check if user selected one of the interview-based methods
         vi_petugas_pengumpulan_data = ""
@@ -785,7 +855,7 @@ with tab1:
         if any(opt in st.session_state["blok_4"].get("sarana_utama") for opt in interview_based):
             #Q6.4
             st.markdown("##### 6.4 Petugas Pengumpulan Data")
-            petugas_options = ["Staf Instansi Penyelenggara", "Mitra Atau Tenaga Kontrak", "Staf Instansi Penyelenggara & Mitra Atau Tenaga Kontrak"] 
+            petugas_options = PETUGAS_OPTIONS
             stored_value = st.session_state["blok_6_8"].get("vi_petugas_pengumpulan_data", "")
             vi_petugas_pengumpulan_data = st.radio(
                 "6.4 Petugas Pengumpulan Data",
@@ -800,7 +870,7 @@ with tab1:
 
             #Q6.5
             st.markdown("##### 6.5 Persyaratan Pendidikan Terendah Petugas Pengumpulan Data")
-            petugas_options = ["Kurang Dari Atau Sama Dengan SMP", "SMA Atau SMK", "Diploma I/II/III", "Diploma IV atau S1/S2/S3"] 
+            petugas_options = PENDIDIKAN_PETUGAS_OPTIONS
             stored_value = st.session_state["blok_6_8"].get("vi_persyaratan_pendidikan_terendah_petugas_pengumpulan_data", "")
             vi_persyaratan_pendidikan_terendah_petugas_pengumpulan_data = st.radio(
                 "6.5 Persyaratan Pendidikan Terendah Petugas Pengumpulan Data",
@@ -819,6 +889,7 @@ with tab1:
             st.session_state["blok_6_8"]["vi_jumlah_petugas_supervisor"] = vi_jumlah_petugas_supervisor
             vi_jumlah_petugas_enumerator = st.number_input("Pengumpul Data/Enumerator", min_value=0, max_value=3000, step=1, value=st.session_state["blok_6_8"].get("vi_jumlah_petugas_enumerator", None), key = "vi_jumlah_petugas_enumerator", placeholder = "Tidak boleh kurang dari jumlah Supervisor/Penyelia/Pengawas", disabled = is_readonly)
             st.session_state["blok_6_8"]["vi_jumlah_petugas_enumerator"] = vi_jumlah_petugas_enumerator          
+            show_rule_problems("blok_6_8.vi_jumlah_petugas_enumerator")
 
         #Q6.7
         stored_value = st.session_state["blok_6_8"].get("vi_apakah_melakukan_pelatihan_petugas", "")
@@ -861,7 +932,7 @@ with tab1:
 
         #Q7.2
         st.markdown("##### 7.2 Metode Analisis")
-        analisis_options = ["Deskriptif", "Inferensia", "Deskriptif dan Inferensia"] 
+        analisis_options = METODE_ANALISIS_OPTIONS
         stored_value = st.session_state["blok_6_8"].get("vii_metode_analisis", "")
         vii_metode_analisis = st.radio(
             "7.2 Metode Analisis",
@@ -875,7 +946,7 @@ with tab1:
         st.session_state["blok_6_8"]["vii_metode_analisis"] = vii_metode_analisis
 
         #Q7.3
-        unit_analisis_options = ["Individu", "Rumah Tangga", "Usaha/Perusahaan", "Lainnya"]
+        unit_analisis_options = UNIT_ANALISIS_OPTIONS
         stored_value = st.session_state["blok_6_8"].get("unit_analisis_utama", "")
         st.markdown("##### 7.3 Unit Analisis", unsafe_allow_html=True)
         unit_analisis_utama = st.multiselect(
@@ -890,6 +961,7 @@ with tab1:
 
         unit_analisis_lain = st.text_input("Lainnya: Sebutkan unit analisis lain", value=st.session_state["blok_6_8"].get("unit_analisis_lain", ""), key="unit_analisis_lain", placeholder = "Wajib diisi jika memilih opsi 'Lainnya'")
         st.session_state["blok_6_8"]["unit_analisis_lain"] = unit_analisis_lain
+        show_rule_problems("blok_6_8.unit_analisis_lain")
 
         vii_unit_analisis = unit_analisis_utama.copy()
         if "Lainnya" in vii_unit_analisis:
@@ -904,7 +976,7 @@ with tab1:
         st.session_state["blok_6_8"]["vii_unit_analisis"] = vii_unit_analisis
 
         #Q7.4
-        penyajian_options = ["Nasional", "Provinsi", "Kabupaten/Kota", "Lainnya"]
+        penyajian_options = TINGKAT_PENYAJIAN_OPTIONS
         stored_value = st.session_state["blok_6_8"].get("penyajian_utama", "")
         st.markdown("##### 7.4  Tingkat Penyajian Hasil Analisis", unsafe_allow_html=True)
         penyajian_utama = st.multiselect(
@@ -919,6 +991,7 @@ with tab1:
 
         penyajian_lain = st.text_input("Lainnya: Sebutkan tingkat penyajian lain", value=st.session_state["blok_6_8"].get("penyajian_lain", ""), key="penyajian_lain", placeholder = "Wajib diisi jika memilih opsi 'Lainnya'")
         st.session_state["blok_6_8"]["penyajian_lain"] = penyajian_lain
+        show_rule_problems("blok_6_8.penyajian_lain")
 
         vii_tingkat_penyajian_hasil_analisis = penyajian_utama.copy()
         if "Lainnya" in vii_tingkat_penyajian_hasil_analisis:
@@ -943,6 +1016,7 @@ with tab1:
         if viii_ketersediaan_produk_tercetak:
             viii_rencana_jadwal_rilis_produk_tercetak = st.date_input("8.2 Rencana Rilis Produk Kegiatan", value=st.session_state["blok_6_8"].get("viii_rencana_jadwal_rilis_produk_tercetak", None), key="viii_rencana_jadwal_rilis_produk_tercetak", disabled = is_readonly)
             st.session_state["blok_6_8"]["viii_rencana_jadwal_rilis_produk_tercetak"] = viii_rencana_jadwal_rilis_produk_tercetak
+            show_rule_problems("blok_6_8.viii_rencana_jadwal_rilis_produk_tercetak")
 
         stored_value = st.session_state["blok_6_8"].get("viii_ketersediaan_produk_digital", "")
         viii_ketersediaan_produk_digital = st.checkbox("Digital (Softcopy)", value=st.session_state["blok_6_8"].get("viii_ketersediaan_produk_digital", ""), disabled = is_readonly)
@@ -951,6 +1025,7 @@ with tab1:
         if viii_ketersediaan_produk_digital:
             viii_rencana_jadwal_rilis_produk_digital = st.date_input("8.2 Rencana Rilis Produk Kegiatan", value=st.session_state["blok_6_8"].get("viii_rencana_jadwal_rilis_produk_digital", None), key="viii_rencana_jadwal_rilis_produk_digital", disabled = is_readonly)
             st.session_state["blok_6_8"]["viii_rencana_jadwal_rilis_produk_digital"] = viii_rencana_jadwal_rilis_produk_digital
+            show_rule_problems("blok_6_8.viii_rencana_jadwal_rilis_produk_digital")
 
         stored_value = st.session_state["blok_6_8"].get("viii_ketersediaan_produk_mikrodata", "")
         viii_ketersediaan_produk_mikrodata = st.checkbox("Data Mikro", value=st.session_state["blok_6_8"].get("viii_ketersediaan_produk_mikrodata", ""), disabled = is_readonly)
@@ -959,9 +1034,20 @@ with tab1:
         if viii_ketersediaan_produk_mikrodata:
             viii_rencana_jadwal_rilis_produk_mikrodata= st.date_input("8.2 Rencana Rilis Produk Kegiatan", value=st.session_state["blok_6_8"].get("viii_rencana_jadwal_rilis_produk_mikrodata", None), key="viii_rencana_jadwal_rilis_produk_mikrodata", disabled = is_readonly)
             st.session_state["blok_6_8"]["viii_rencana_jadwal_rilis_produk_mikrodata"] = viii_rencana_jadwal_rilis_produk_mikrodata
+            show_rule_problems("blok_6_8.viii_rencana_jadwal_rilis_produk_mikrodata")
 
 with tab2:
     st.header("📊 MS Indikator")
+    if st.session_state.current_activity_id:
+        # based on the last saved version, like the rest of the graph
+        graph = dependency_report(st.session_state.current_activity_id)
+        for link in graph["dangling"]:
+            st.warning(
+                f"🔗 {link['src_name']}: {link['target_kind']} pembangun \"{link['target_name']}\" "
+                f"{PROBLEMS.get(link['problem'], link['problem'])}"
+            )
+        for cycle in graph["cycles"]:
+            st.error("🔁 Indikator saling bergantung: " + " → ".join(n["name"] for n in cycle))
     if "indicators" not in st.session_state or not isinstance(st.session_state.indicators, list):
         # If it's an empty dict or string from old saves, reset to []
         st.session_state.indicators = []
@@ -1002,6 +1088,8 @@ with tab2:
             ind["nama"] = st.text_input(
                 "Nama Indikator", value=ind.get("nama", ""), key=f"ind_nama_{i}", disabled = is_readonly
             )
+            if not is_readonly and len(ind["nama"] or "") >= 3 and not ind.get("definisi"):
+                show_suggestions("indikator", "ind", st.session_state.indicators, i, ind["nama"])
             ind["definisi"] = st.text_area(
                 "Definisi", value=ind.get("definisi", ""), key=f"ind_definisi_{i}", disabled = is_readonly
             )
@@ -1116,6 +1204,13 @@ with tab3:
                         key=f"alias_{i}", disabled = is_readonly
                     )
                     var["alias"] = alias  # store in session_state
+
+                    if st.session_state.current_activity_id and var.get("name"):
+                        users_of = variable_dependents(st.session_state.current_activity_id, var["name"])
+                        if users_of:
+                            st.caption("🔗 Dipakai oleh indikator: " + ", ".join(
+                                f"{d['name']} ({d['judul'] or d['activity_id']})" for d in users_of
+                            ))
                     
                     st.write(f"**Definisi Variabel:** {var.get('definition', '-')}")
                     st.write(f"**Konsep:** {var.get('concept', '-')}")
@@ -1176,8 +1271,8 @@ with tab3:
     else:
         st.info("Belum ada variabel yang terdeteksi pada MS Kegiatan. Input daftar variabel pada MS Kegiatan BLOK 3")
     
-if st.button("💾 Simpan Semua Progress", disabled = is_readonly): 
-    combined_entry = {
+def build_combined_entry():
+    return {
         "activity_id": st.session_state.current_activity_id,
         "owner": username,
         "status": st.session_state.form_data.get("status", "Draft"),
@@ -1199,22 +1294,80 @@ if st.button("💾 Simpan Semua Progress", disabled = is_readonly):
         "verified_by": st.session_state.form_data.get("verified_by", ""),
         "verifier_comment": st.session_state.form_data.get("verifier_comment", "") 
     } 
-    success = save_form(
+
+# =====================================================
+# AUTOSAVE (opt-in)
+# =====================================================
+owner_id = row.get("user_id") if edit_id else username
+autosave_on = st.sidebar.toggle("⏱️ Simpan otomatis", key="autosave_enabled", disabled = is_readonly)
+if autosave_on and not is_readonly:
+    autosave.schedule_save(st.session_state.current_activity_id, owner_id, build_combined_entry())
+
+@st.fragment(run_every="2s")
+def autosave_status():
+    info = autosave.get_status(st.session_state.current_activity_id)
+    if info["status"] == "pending":
+        st.caption(f"🕓 Menunggu simpan otomatis: {', '.join(info['pending_sections'])}")
+    elif info["status"] == "saving":
+        st.caption("💾 Menyimpan...")
+    elif info["status"] == "queued":
+        st.caption("⏳ Tersimpan di antrean lokal, menunggu koneksi ke server")
+    elif info["status"] == "error":
+        st.caption(f"❌ {info['error']}")
+    elif info["last_saved_at"]:
+        saved_at = datetime.fromtimestamp(info["last_saved_at"]).strftime("%H:%M:%S")
+        st.caption(f"✅ Tersimpan otomatis pukul {saved_at}")
+
+if autosave_on:
+    with st.sidebar:
+        autosave_status()
+
+@st.fragment(run_every="5s")
+def journal_indicator():
+    if breaker_status()["state"] != "closed":
+        st.caption("⚠️ Google Sheets tidak terjangkau, simpanan diantrekan")
+    info = journal_status(st.session_state.current_activity_id)
+    if info.get("failed"):
+        st.caption(f"❌ {info['failed']} simpanan gagal dan tidak dikirim ulang: {info['last_error']}")
+    if info["pending"]:
+        st.caption(f"⏳ {info['pending']} simpanan belum terkirim ke server")
+        if info["last_error"]:
+            st.caption(f"Terakhir: {info['last_error']}")
+    elif info["last_committed_at"]:
+        sent_at = datetime.fromtimestamp(info["last_committed_at"]).strftime("%H:%M:%S")
+        st.caption(f"☁️ Semua simpanan terkirim (terakhir {sent_at})")
+
+with st.sidebar:
+    journal_indicator()
+
+if st.button("💾 Simpan Semua Progress", disabled = is_readonly): 
+    combined_entry = build_combined_entry()
+    result = save_form(
         activity_id=st.session_state.current_activity_id, 
         username=username, 
         data=combined_entry,) 
     
-    if success: 
-        st.success("✅ Tersimpan!") 
-    else: 
-        st.error("❌ Gagal menyimpan")
+    if result != "failed": 
+        autosave.mark_saved(st.session_state.current_activity_id, combined_entry)
+    show_save_result(result)
+
 
+rule_problems = validation.evaluate(form_sections(), st.session_state.setdefault("validation_state", validation.new_state()))
+hard_errors = validation.errors(rule_problems)
+if rule_problems:
+    st.caption(f"🧪 {len(hard_errors)} error dan {len(rule_problems) - len(hard_errors)} peringatan pada isian form")
 
 if st.button("📤 Submit", disabled = is_readonly): 
-    ok = submit_form(st.session_state.current_activity_id) 
-    if ok: 
-        st.session_state.form_data["status"] = "Submitted" 
-        st.success("🎉 Submitted!") 
-        st.rerun() 
-    else: 
-        st.error("❌ Submit gagal.")
+    if hard_errors:
+        st.error("❌ Submit diblokir, perbaiki dulu:\n\n" + "\n".join(f"- {p['message']}" for p in hard_errors))
+    else:
+        result = submit_form(st.session_state.current_activity_id) 
+        if result == "committed": 
+            st.session_state.form_data["status"] = "Submitted" 
+            st.success("🎉 Submitted!") 
+            st.rerun() 
+        elif result == "pending": 
+            st.session_state.form_data["status"] = "Submitted" 
+            st.warning("⏳ Submit tersimpan di antrean lokal, akan dikirim otomatis ke server") 
+        else: 
+            st.error("❌ Submit gagal.")
@@ -1,11 +1,31 @@
 import streamlit as st
-from datetime import datetime
+import copy
+import os
+import tempfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from gsheet_client import (
-    list_submitted_activities,
-    mark_status,
+    list_activity_summaries,
     get_activity,
-    upsert_activity
+    save_activity,
+    diff_payload,
+    list_claims,
+    claim_activities,
+    renew_claims,
+    release_claims,
+    bulk_mark_status,
+    view_max_age,
+    search_activities,
+    dependency_report,
+    LEASE_SECONDS,
+    RENEW_BEFORE_SECONDS,
 )
+import export
+import documents
+import render_jobs
+import validation
+from form_options import STATUS_OPTIONS
+from dependency_graph import PROBLEMS
 
 st.set_page_config(page_title="Verification Dashboard", page_icon="✅", layout="wide")
 
@@ -27,9 +47,89 @@ if st.sidebar.button("🚪 Logout"):
 
 
 # =====================================================
-# LOAD SUBMITTED ACTIVITIES FROM SUPABASE
+# EXPORT (WHOLE SHEET, STREAMED PAGE BY PAGE)
 # =====================================================
-submitted = list_submitted_activities()
+with st.sidebar.expander("⬇️ Export all activities"):
+    export_format = st.selectbox("Format", export.FORMATS, key="verif_export_format")
+    if st.button("Prepare export", key="verif_export_prepare"):
+        previous = st.session_state.pop("verif_export", None)
+        if previous and os.path.exists(previous["path"]):
+            os.remove(previous["path"])
+        fd, path = tempfile.mkstemp(prefix="ms_form_export_", suffix=".zip")
+        try:
+            with st.spinner("Exporting..."), os.fdopen(fd, "wb") as f:
+                counts = export.export_archive(f, export_format)
+            st.session_state.verif_export = {"path": path, "format": export_format, "counts": counts}
+        except Exception as e:
+            os.remove(path)
+            st.error(f"❌ Export failed: {e}")
+
+    prepared = st.session_state.get("verif_export")
+    if prepared and os.path.exists(prepared["path"]):
+        st.caption(", ".join(f"{table}: {n}" for table, n in prepared["counts"].items()))
+        with open(prepared["path"], "rb") as f:
+            st.download_button(
+                "💾 Download .zip",
+                f,
+                file_name=f"ms_kegiatan_{prepared['format']}_{datetime.now():%Y%m%d}.zip",
+                mime="application/zip",
+                key="verif_export_download",
+            )
+
+
+# =====================================================
+# PRINTABLE DOCUMENTS (BACKGROUND RENDER JOB)
+# =====================================================
+@st.fragment(run_every="2s")
+def render_progress():
+    job_id = st.session_state.get("verif_doc_job")
+    job = render_jobs.job_status(job_id) if job_id else render_jobs.latest_job(st.session_state.get("username"))
+    if not job:
+        return
+
+    total = f"{job['total']}+" if job["scanning"] else str(job["total"])
+    summary = f"{job['processed']}/{total} activities · {job['cached']} from cache · {job['failed']} failed"
+    if job["state"] == "running":
+        st.progress(job["processed"] / job["total"] if job["total"] else 0.0, text=summary)
+    elif job["state"] == "done" and job["archive"] and os.path.exists(job["archive"]):
+        st.caption(f"✅ {summary}")
+        with open(job["archive"], "rb") as f:
+            st.download_button(
+                "💾 Download documents (.zip)",
+                f,
+                file_name=f"ms_documents_{job['fmt']}_{datetime.fromtimestamp(job['finished_at']):%Y%m%d_%H%M}.zip",
+                mime="application/zip",
+                key=f"verif_doc_download_{job['job_id']}",
+            )
+    elif job["state"] in ("failed", "interrupted"):
+        st.error(f"❌ Rendering {job['state']}: {job['error'] or summary}")
+
+with st.sidebar.expander("🖨️ Printable documents"):
+    doc_format = st.selectbox("Format", documents.FORMATS, key="verif_doc_format")
+    doc_statuses = st.multiselect("Status", STATUS_OPTIONS, default=render_jobs.DEFAULT_STATUSES, key="verif_doc_statuses")
+    if st.button("Render MS Kegiatan / Indikator / Variabel", key="verif_doc_start", disabled=not doc_statuses):
+        try:
+            st.session_state.verif_doc_job = render_jobs.start_job(
+                doc_format, statuses=doc_statuses, requested_by=st.session_state.get("username")
+            )
+        except Exception as e:
+            st.error(f"❌ {e}")
+    render_progress()
+
+
+# =====================================================
+# LOAD SUBMITTED QUEUE (SUMMARY ROWS ONLY)
+# =====================================================
+PAGE_SIZES = [10, 20, 50]
+verifier = st.session_state.get("username")
+
+st.session_state.setdefault("verif_page", 0)
+st.session_state.setdefault("verif_open_id", None)
+st.session_state.setdefault("verif_prefetch", {})
+st.session_state.setdefault("verif_loaded", {})
+st.session_state.setdefault("verif_bulk_result", None)
+
+submitted = list_activity_summaries(status="submitted", max_age=view_max_age("verification"))
 
 st.title("✅ Verification Dashboard")
 st.markdown("Review, revise, verify, or reject submitted activities.")
@@ -38,6 +138,44 @@ if not submitted:
     st.info("No submitted activities available for verification.")
     st.stop()
 
+# activity_id -> {"verifier", "expires_at"} for every live lease
+claims = list_claims()
+
+
+@st.cache_resource
+def prefetch_pool():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="verif_prefetch")
+
+
+# Full payload of the next queue item is loaded in the background so that
+# opening it does not wait on another sheet read.
+def prefetch(activity_id):
+    futures = st.session_state.verif_prefetch
+    if activity_id and activity_id not in futures:
+        futures[activity_id] = prefetch_pool().submit(get_activity, activity_id)
+
+
+# The opened record is kept for the reruns of its editor and dropped
+# once it is saved or another activity is opened.
+def load_opened(activity_id):
+    loaded = st.session_state.verif_loaded
+    if activity_id in loaded:
+        return loaded[activity_id]
+
+    record = None
+    future = st.session_state.verif_prefetch.pop(activity_id, None)
+    if future is not None:
+        try:
+            record = future.result()
+        except Exception:
+            pass
+    if record is None:
+        record = get_activity(activity_id)
+    loaded.clear()
+    if record:
+        loaded[activity_id] = record
+    return record
+
 
 # =====================================================
 # UTILS (RECURSIVE INPUT EDITOR)
@@ -57,11 +195,12 @@ def edit_value(value, key_path):
             if isinstance(item, dict):
                 value[i] = edit_value(item, key_path + [i])
             else:
-                value[i] = st.text_input(
+                text = st.text_input(
                     f"{key_path[-1]} [{i}]",
                     value=str(item),
                     key="_".join(map(str, key_path + [i]))
                 )
+                value[i] = item if text == str(item) else text
         return value
 
     elif isinstance(value, bool):
@@ -71,101 +210,351 @@ def edit_value(value, key_path):
         return st.number_input(key_path[-1], value=value, key=key_str)
 
     else:
-        return st.text_input(key_path[-1], value=str(value), key=key_str)
+        # keep the stored value (None, dates, ...) unless the verifier typed something
+        text = st.text_input(key_path[-1], value=str(value), key=key_str)
+        return value if text == str(value) else text
 
 
 # =====================================================
-# DISPLAY EACH SUBMITTED ACTIVITY
+# FILTERS
 # =====================================================
-for idx, act in enumerate(submitted):
-    activity_id = act.get("activity_id")
-    data = act.get("data", {})
+def distinct(field):
+    return sorted({str(a[field]) for a in submitted if a.get(field) not in (None, "")})
+
+search_query = st.text_input("🔎 Search titles, background, variables and indicators", key="verif_search")
+
+# activity_id -> rank and matched variable / indicator names
+search_rank, search_matches = {}, {}
+if search_query.strip():
+    for hit in search_activities(search_query, status="submitted", limit=200):
+        search_rank.setdefault(hit["activity_id"], len(search_rank))
+        if hit["kind"] != "kegiatan" and hit["label"]:
+            search_matches.setdefault(hit["activity_id"], []).append(f"{hit['kind']}: {hit['label']}")
+
+f1, f2, f3, f4 = st.columns([0.35, 0.15, 0.3, 0.2])
+with f1:
+    sektor_filter = st.multiselect("Sektor", distinct("sektor"), key="verif_f_sektor")
+with f2:
+    tahun_filter = st.multiselect("Tahun", distinct("tahun"), key="verif_f_tahun")
+with f3:
+    owner_filter = st.multiselect("Owner", distinct("user_id"), key="verif_f_owner")
+with f4:
+    page_size = st.selectbox("Per page", PAGE_SIZES, index=1, key="verif_page_size")
+
+only_mine = st.sidebar.toggle("🔒 Only my claims", key="verif_only_mine")
+
+queue = [
+    a for a in submitted
+    if (not sektor_filter or str(a.get("sektor")) in sektor_filter)
+    and (not tahun_filter or str(a.get("tahun")) in tahun_filter)
+    and (not owner_filter or str(a.get("user_id")) in owner_filter)
+    and (not only_mine or claims.get(a["activity_id"], {}).get("verifier") == verifier)
+]
+queue.sort(key=lambda a: a.get("updated_at") or "")
+if search_query.strip():
+    queue = sorted((a for a in queue if a["activity_id"] in search_rank), key=lambda a: search_rank[a["activity_id"]])
 
-    title = data.get("halaman_awal", {}).get("judul", f"Untitled {idx}")
-    tahun = data.get("halaman_awal", {}).get("tahun", "-")
 
-    with st.expander(f"📄 {title} ({tahun})", expanded=False):
+# =====================================================
+# CLAIMS (LEASES)
+# =====================================================
+st.sidebar.markdown("---")
+claim_n = st.sidebar.number_input("Claim batch size", min_value=1, max_value=50, value=5, step=1)
+if st.sidebar.button("🙋 Claim next batch"):
+    candidates = [a["activity_id"] for a in queue if a["activity_id"] not in claims]
+    claim_activities(verifier, candidates, claim_n)
+    st.rerun()
 
-        # --- Allow editing the payload data ---
-        for section in ["halaman_awal", "blok_1_3", "variables", "blok_4", "blok_5", "blok_6_8", "indicators"]:
-            if section in data:
-                data[section] = edit_value(data[section], key_path=[idx, section])
 
-        st.markdown("---")
+# Runs while the page is open (closing the tab lets the leases expire) and
+# on every full rerun too, so it only writes when a lease is near expiry.
+# `claims` is the list the page already read; the expiry our own last
+# renewal gave is kept in the session because that list may predate it.
+@st.fragment(run_every=RENEW_BEFORE_SECONDS // 2)
+def keep_claims_alive():
+    mine = [aid for aid, h in claims.items() if h["verifier"] == verifier]
+    renewed_until = st.session_state.get("verif_renewed_until", datetime.min)
+    now = datetime.utcnow()
+    if mine and min(max(claims[aid]["expires_at"], renewed_until) for aid in mine) - now < timedelta(seconds=RENEW_BEFORE_SECONDS):
+        renew_claims(verifier, mine)
+        st.session_state.verif_renewed_until = now + timedelta(seconds=LEASE_SECONDS)
+    st.caption(f"🔒 {len(mine)} activities claimed by you")
 
-        col1, col2, col3 = st.columns(3)
 
-        # =====================================================
-        # 1️⃣ ACCEPT → VERIFIED
-        # =====================================================
-        with col1:
-            if st.button(f"✅ Accept", key=f"accept_{idx}"):
-                data["verified_at"] = datetime.now().isoformat()
+with st.sidebar:
+    keep_claims_alive()
 
-                ok, _ = upsert_activity(
-                    activity_id=activity_id,
-                    user_id=act["user_id"],
-                    payload=data,
-                    status="verified",
-                )
+if not queue:
+    st.info("No submitted activities match the selected filters.")
+    st.stop()
+
+page_count = (len(queue) - 1) // page_size + 1
+st.session_state.verif_page = min(st.session_state.verif_page, page_count - 1)
+page = st.session_state.verif_page
+page_items = queue[page * page_size:(page + 1) * page_size]
+
+
+# =====================================================
+# QUEUE (ONE LIGHTWEIGHT ROW PER ACTIVITY)
+# =====================================================
+st.caption(f"{len(queue)} submitted activities · page {page + 1} of {page_count}")
+
+if st.button("☑️ Select all on this page"):
+    # must run before the row checkboxes below are created
+    for item in page_items:
+        if claims.get(item["activity_id"], {}).get("verifier") in (None, verifier):
+            st.session_state[f"sel_{item['activity_id']}"] = True
+
+for idx, item in enumerate(page_items):
+    activity_id = item["activity_id"]
+    c0, c1, c2, c3, c4 = st.columns([0.05, 0.45, 0.2, 0.15, 0.15])
+    with c0:
+        holder = claims.get(activity_id, {}).get("verifier")
+        st.checkbox(
+            "Select",
+            key=f"sel_{activity_id}",
+            label_visibility="collapsed",
+            disabled=holder is not None and holder != verifier,
+        )
+    with c1:
+        st.markdown(f"📄 **{item.get('judul') or 'Untitled'}** ({item.get('tahun') or '-'})")
+        if activity_id in search_matches:
+            st.caption("🔎 " + " · ".join(search_matches[activity_id][:3]))
+    with c2:
+        st.caption(item.get("sektor") or "-")
+    with c3:
+        st.caption(item.get("user_id") or "-")
+    with c4:
+        taken = holder is not None and holder != verifier
+        is_open = st.session_state.verif_open_id == activity_id
+        if taken:
+            st.caption(f"🔒 {holder}")
+        elif st.button("🔽 Close" if is_open else "🔍 Open", key=f"open_{activity_id}"):
+            if not is_open and holder is None:
+                # opening an unclaimed item takes a lease on it
+                claim_activities(verifier, [activity_id], 1)
+            st.session_state.verif_open_id = None if is_open else activity_id
+            st.rerun()
+
+p1, p2, _ = st.columns([0.15, 0.15, 0.7])
+with p1:
+    if st.button("⬅️ Prev", disabled=page == 0):
+        st.session_state.verif_page -= 1
+        st.rerun()
+with p2:
+    if st.button("Next ➡️", disabled=page >= page_count - 1):
+        st.session_state.verif_page += 1
+        st.rerun()
+
+
+# =====================================================
+# BULK ACTIONS (SELECTED ROWS, ONE BATCHED WRITE, RE-CHECKED FIRST)
+# =====================================================
+selected = [
+    a["activity_id"] for a in queue
+    if st.session_state.get(f"sel_{a['activity_id']}")
+    and claims.get(a["activity_id"], {}).get("verifier") in (None, verifier)
+]
+
+if st.session_state.verif_bulk_result:
+    outcome = st.session_state.verif_bulk_result
+    if outcome["committed"]:
+        st.success(f"✅ {len(outcome['committed'])} activities updated.")
+    if outcome["pending"]:
+        st.warning(f"⏳ {len(outcome['pending'])} activities queued locally, sent as soon as Google Sheets answers.")
+    if outcome["skipped"]:
+        st.info("↪️ Skipped (no longer submitted or claimed by another verifier): " + ", ".join(outcome["skipped"]))
+    if outcome["failed"]:
+        st.error("❌ Failed: " + ", ".join(outcome["failed"]))
+    st.session_state.verif_bulk_result = None
+
+if selected:
+    with st.container(border=True):
+        st.markdown(f"**{len(selected)} selected**")
+        bulk_note = st.text_area("Shared note (required for revision / rejection)", key="verif_bulk_note")
+        b1, b2, b3 = st.columns(3)
+        now = datetime.now().isoformat()
+        action = None
+        with b1:
+            if st.button("✅ Accept selected"):
+                action = ("verified", {"verified_at": now})
+        with b2:
+            if st.button("📝 Request revision for selected"):
+                action = ("revision_requested", {"revision_note": bulk_note, "revision_requested_at": now})
+        with b3:
+            if st.button("❌ Reject selected"):
+                action = ("rejected", {"rejection_reason": bulk_note, "rejected_at": now})
+
+        if action and action[0] != "verified" and not bulk_note.strip():
+            st.error("⚠️ Please provide a note.")
+        elif action:
+            status, meta = action
+            # status and claims are read again inside; stale selections come back "skipped"
+            results = bulk_mark_status(
+                selected,
+                status,
+                verifier=verifier,
+                comment=bulk_note.strip() or None,
+                meta={**meta, "verified_by": verifier},
+                expected_status="submitted",
+            )
+            done = [aid for aid, state in results.items() if state in ("committed", "pending")]
+            release_claims(verifier, done)
+            for aid, state in results.items():
+                if state != "failed":
+                    st.session_state.pop(f"sel_{aid}", None)
+            titles = {a["activity_id"]: a.get("judul") or a["activity_id"] for a in queue}
+            st.session_state.verif_bulk_result = {
+                state: [titles[aid] for aid, s in results.items() if s == state]
+                for state in ("committed", "pending", "skipped", "failed")
+            }
+            st.rerun()
+
+
+# =====================================================
+# EDITOR (ONLY FOR THE OPENED ACTIVITY)
+# =====================================================
+activity_id = st.session_state.verif_open_id
+queue_ids = [a["activity_id"] for a in queue]
+if activity_id not in queue_ids:
+    st.stop()
+
+if claims.get(activity_id, {}).get("verifier") not in (None, verifier):
+    st.warning("🔒 This activity has been claimed by another verifier.")
+    st.session_state.verif_open_id = None
+    st.stop()
+
+act = load_opened(activity_id)
+if not act:
+    st.error("❌ Activity could not be loaded.")
+    st.stop()
+
+# next item in the filtered queue is fetched while the verifier reads this one
+position = queue_ids.index(activity_id)
+if position + 1 < len(queue_ids):
+    prefetch(queue_ids[position + 1])
+
+idx = activity_id
+# edit_value mutates what it is given; the kept record must stay as loaded
+data = copy.deepcopy(act.get("data", {}))
+original = copy.deepcopy(data)
+title = data.get("halaman_awal", {}).get("judul", "Untitled")
+tahun = data.get("halaman_awal", {}).get("tahun", "-")
+
+st.markdown("---")
+st.subheader(f"📄 {title} ({tahun})")
+
+graph = dependency_report(activity_id)
+if graph["dangling"] or graph["cycles"]:
+    with st.expander(f"🔗 {len(graph['dangling'])} unresolved link(s), {len(graph['cycles'])} cycle(s)", expanded=True):
+        for link in graph["dangling"]:
+            st.markdown(
+                f"- **{link['src_name']}** → {link['target_kind']} \"{link['target_name']}\": "
+                f"{PROBLEMS.get(link['problem'], link['problem'])}"
+            )
+        for cycle in graph["cycles"]:
+            st.markdown("- 🔁 " + " → ".join(n["name"] for n in cycle))
+
+rule_problems = validation.evaluate(data)
+if rule_problems:
+    hard = len(validation.errors(rule_problems))
+    with st.expander(f"🧪 {hard} rule error(s), {len(rule_problems) - hard} warning(s)", expanded=bool(hard)):
+        for p in rule_problems:
+            st.markdown(f"- {'❌' if p['severity'] == 'error' else '⚠️'} `{p['section']}.{p['field']}`: {p['message']}")
+
+with st.container(border=True):
+
+    # --- Allow editing the payload data ---
+    for section in ["halaman_awal", "blok_1_3", "variables", "blok_4", "blok_5", "blok_6_8", "indicators"]:
+        if section in data:
+            data[section] = edit_value(data[section], key_path=[idx, section])
+
+    # only what the verifier actually edited is written back
+    changed_sections, _ = diff_payload(original, data)
+    changed_count = sum(len(v) if isinstance(v, dict) else 1 for v in changed_sections.values())
+
+    st.markdown("---")
+    if changed_count:
+        st.caption(f"✏️ {changed_count} edited field(s) in: {', '.join(changed_sections)}")
+
+    def save_verification(status, meta):
+        # "pending" = queued in the local journal, sent as soon as the sheet answers
+        state, result = save_activity(
+            activity_id=activity_id,
+            user_id=act["user_id"],
+            sections=changed_sections,
+            meta={**meta, "verified_by": verifier},
+            status=status,
+            actor=verifier,
+        )
+        return state != "failed", result
+
+    def finish():
+        release_claims(verifier, [activity_id])
+        st.session_state.verif_loaded.pop(activity_id, None)
+        st.session_state.verif_open_id = None
+
+    col1, col2, col3 = st.columns(3)
+
+    # =====================================================
+    # 1️⃣ ACCEPT → VERIFIED
+    # =====================================================
+    with col1:
+        if st.button(f"✅ Accept", key=f"accept_{idx}"):
+            ok, _ = save_verification("verified", {
+                "verified_at": datetime.now().isoformat(),
+            })
+
+            if ok:
+                st.success(f"✅ {title} verified.")
+                finish()
+                st.rerun()
+            else:
+                st.error("❌ Failed to verify.")
+
+    # =====================================================
+    # 2️⃣ REQUEST REVISION
+    # =====================================================
+    with col2:
+        revise_note = st.text_area("Revision note", key=f"rev_{idx}")
+
+        if st.button(f"📝 Request Revision", key=f"revbtn_{idx}"):
+
+            if not revise_note.strip():
+                st.error("⚠️ Please provide a revision note.")
+            else:
+                # Inject revision metadata
+                ok, _ = save_verification("revision_requested", {
+                    "revision_note": revise_note,
+                    "revision_requested_at": datetime.now().isoformat(),
+                })
 
                 if ok:
-                    st.success(f"✅ {title} verified.")
+                    st.warning(f"📝 Sent back for revision: {title}")
+                    finish()
                     st.rerun()
                 else:
-                    st.error("❌ Failed to verify.")
+                    st.error("❌ Failed to update revision status.")
 
-        # =====================================================
-        # 2️⃣ REQUEST REVISION
-        # =====================================================
-        with col2:
-            revise_note = st.text_area("Revision note", key=f"rev_{idx}")
+    # =====================================================
+    # 3️⃣ REJECT
+    # =====================================================
+    with col3:
+        reject_note = st.text_area("Rejection reason", key=f"reject_{idx}")
 
-            if st.button(f"📝 Request Revision", key=f"revbtn_{idx}"):
+        if st.button(f"❌ Reject", key=f"rejectbtn_{idx}"):
 
-                if not revise_note.strip():
-                    st.error("⚠️ Please provide a revision note.")
-                else:
-                    # Inject revision metadata
-                    data["revision_note"] = revise_note
-                    data["revision_requested_at"] = datetime.now().isoformat()
-
-                    ok, _ = upsert_activity(
-                        activity_id=activity_id,
-                        user_id=act["user_id"],
-                        payload=data,
-                        status="revision_requested",
-                    )
-
-                    if ok:
-                        st.warning(f"📝 Sent back for revision: {title}")
-                        st.rerun()
-                    else:
-                        st.error("❌ Failed to update revision status.")
-
-        # =====================================================
-        # 3️⃣ REJECT
-        # =====================================================
-        with col3:
-            reject_note = st.text_area("Rejection reason", key=f"reject_{idx}")
-
-            if st.button(f"❌ Reject", key=f"rejectbtn_{idx}"):
-
-                if not reject_note.strip():
-                    st.error("⚠️ Please provide a rejection reason.")
+            if not reject_note.strip():
+                st.error("⚠️ Please provide a rejection reason.")
+            else:
+                ok, _ = save_verification("rejected", {
+                    "rejection_reason": reject_note,
+                    "rejected_at": datetime.now().isoformat(),
+                })
+
+                if ok:
+                    st.error(f"❌ Rejected: {title}")
+                    finish()
+                    st.rerun()
                 else:
-                    data["rejection_reason"] = reject_note
-                    data["rejected_at"] = datetime.now().isoformat()
-
-                    ok, _ = upsert_activity(
-                        activity_id=activity_id,
-                        user_id=act["user_id"],
-                        payload=data,
-                        status="rejected",
-                    )
-
-                    if ok:
-                        st.error(f"❌ Rejected: {title}")
-                        st.rerun()
-                    else:
-                        st.error("❌ Failed to reject the activity.")
+                    st.error("❌ Failed to reject the activity.")
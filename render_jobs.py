@@ -0,0 +1,263 @@
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import documents
+import local_store
+from gsheet_client import iter_activities
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("render_jobs")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Settings
+# -------------------------------------------------
+# A job streams the selected activities out of the sheet, hands the ones
+# without a cached document to a process pool, and adds every document to
+# one zip as it becomes ready. Documents are cached on disk under
+# <activity_id>/<version>/, where the version is a hash of status and
+# payload (documents.version), so an unchanged activity is never rendered
+# twice. Job progress is kept in SQLite, so every Streamlit worker on the
+# host can show it.
+DB_NAME = "documents.sqlite3"
+CACHE_DIR = "documents"
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+MAX_INFLIGHT = MAX_WORKERS * 2      # records waiting in the pool (bounds memory)
+STALE_SECONDS = 120                 # a running job without progress this long was interrupted
+JOB_RETENTION_SECONDS = 24 * 3600   # finished jobs (and their zip) are removed after this
+DEFAULT_STATUSES = ["verified"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    requested_by TEXT,
+    fmt TEXT NOT NULL,
+    kinds TEXT NOT NULL,
+    statuses TEXT NOT NULL,
+    state TEXT NOT NULL,
+    scanning INTEGER NOT NULL DEFAULT 1,
+    total INTEGER NOT NULL DEFAULT 0,
+    rendered INTEGER NOT NULL DEFAULT 0,
+    cached INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    archive TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_requested ON jobs (requested_by, created_at);
+"""
+
+_lock = threading.Lock()
+_pool: Dict[str, Any] = {"executor": None}
+
+
+def _connect():
+    return local_store.connect(DB_NAME, SCHEMA)
+
+
+def _executor() -> ProcessPoolExecutor:
+    # spawn: worker processes start clean instead of forking a process full of threads
+    with _lock:
+        if _pool["executor"] is None:
+            _pool["executor"] = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool["executor"]
+
+
+def _cache_root() -> str:
+    return local_store.path(CACHE_DIR)
+
+
+def _document_paths(activity_id: str, version: str, kinds: List[str], fmt: str) -> Dict[str, str]:
+    folder = os.path.join(_cache_root(), re.sub(r"[^\w.-]", "_", activity_id), version)
+    return {kind: os.path.join(folder, f"{kind}.{fmt}") for kind in kinds}
+
+
+def _prune_versions(activity_id: str, keep: str) -> None:
+    folder = os.path.join(_cache_root(), re.sub(r"[^\w.-]", "_", activity_id))
+    for name in os.listdir(folder):
+        if name != keep:
+            shutil.rmtree(os.path.join(folder, name), ignore_errors=True)
+
+
+def _archive_name(record: Dict[str, Any]) -> str:
+    judul = ((record.get("data") or {}).get("halaman_awal") or {}).get("judul") or "kegiatan"
+    slug = re.sub(r"[^\w]+", "_", str(judul)).strip("_")[:60] or "kegiatan"
+    return f"{slug}_{str(record['activity_id'])[:8]}"
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def start_job(
+    fmt: str = "html",
+    kinds: Optional[List[str]] = None,
+    statuses: Optional[List[str]] = None,
+    activity_ids: Optional[Iterable[str]] = None,
+    requested_by: Optional[str] = None,
+) -> str:
+    """
+    Mulai job render di background dan kembalikan job_id. Secara default
+    semua dokumen (kegiatan, indikator, variabel) kegiatan berstatus verified.
+    """
+    kinds = list(kinds or documents.KINDS)
+    statuses = list(statuses or DEFAULT_STATUSES)
+    if fmt not in documents.FORMATS:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {documents.FORMATS}")
+    if fmt == "pdf" and not documents.pdf_available():
+        raise RuntimeError("PDF rendering needs weasyprint (pip install weasyprint)")
+
+    _prune_jobs()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (job_id, requested_by, fmt, kinds, statuses, state, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'running', ?, ?)",
+            (job_id, requested_by, fmt, ",".join(kinds), ",".join(statuses), now, now),
+        )
+    finally:
+        conn.close()
+
+    ids = set(activity_ids) if activity_ids is not None else None
+    thread = threading.Thread(
+        target=_run, args=(job_id, fmt, kinds, statuses, ids), name=f"render-{job_id[:8]}", daemon=True
+    )
+    thread.start()
+    return job_id
+
+
+def job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Progres satu job: state (running / done / failed / interrupted), jumlah dan arsip zip."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+
+    job = dict(row)
+    job["processed"] = job["rendered"] + job["cached"] + job["failed"]
+    if job["state"] == "running" and time.time() - job["updated_at"] > STALE_SECONDS:
+        job["state"] = "interrupted"
+    return job
+
+
+def latest_job(requested_by: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT job_id FROM jobs WHERE ? IS NULL OR requested_by = ? ORDER BY created_at DESC LIMIT 1",
+            (requested_by, requested_by),
+        ).fetchone()
+    finally:
+        conn.close()
+    return job_status(row["job_id"]) if row else None
+
+
+# -------------------------------------------------
+# Internals
+# -------------------------------------------------
+def _update(job_id: str, **fields) -> None:
+    fields["updated_at"] = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE job_id = ?",
+            (*fields.values(), job_id),
+        )
+    finally:
+        conn.close()
+
+
+def _prune_jobs() -> None:
+    conn = _connect()
+    try:
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        old = conn.execute("SELECT job_id, archive FROM jobs WHERE updated_at < ?", (cutoff,)).fetchall()
+        for row in old:
+            if row["archive"] and os.path.exists(row["archive"]):
+                os.remove(row["archive"])
+        conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+    finally:
+        conn.close()
+
+
+def _run(job_id: str, fmt: str, kinds: List[str], statuses: List[str], ids: Optional[set]) -> None:
+    counts = {"total": 0, "rendered": 0, "cached": 0, "failed": 0}
+    archive_path = os.path.join(_cache_root(), "jobs", f"{job_id}.zip")
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    inflight = {}   # future -> (record name, activity_id, version)
+
+    def collect(done_futures, archive):
+        for future in done_futures:
+            name, activity_id, version = inflight.pop(future)
+            try:
+                paths = future.result()
+            except Exception:
+                logger.exception(f"render failed activity_id={activity_id}")
+                counts["failed"] += 1
+                continue
+            counts["rendered"] += 1
+            _add(archive, name, paths)
+            _prune_versions(activity_id, version)
+
+    try:
+        executor = _executor()
+        with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for record in iter_activities():
+                if record.get("status") not in statuses or (ids is not None and record["activity_id"] not in ids):
+                    continue
+                counts["total"] += 1
+                version = documents.version(record)
+                paths = _document_paths(record["activity_id"], version, kinds, fmt)
+                name = _archive_name(record)
+
+                if all(os.path.exists(p) for p in paths.values()):
+                    counts["cached"] += 1
+                    _add(archive, name, paths)
+                else:
+                    if len(inflight) >= MAX_INFLIGHT:
+                        done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                        collect(done, archive)
+                    future = executor.submit(documents.render_files, record, kinds, fmt, paths)
+                    inflight[future] = (name, record["activity_id"], version)
+                _update(job_id, **counts)
+
+            _update(job_id, scanning=0, **counts)
+            while inflight:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done, archive)
+                _update(job_id, **counts)
+
+        _update(job_id, state="done", archive=archive_path, finished_at=time.time(), **counts)
+        logger.info(f"render job {job_id} done: {counts}")
+
+    except Exception as e:
+        logger.exception(f"render job {job_id} failed")
+        _update(job_id, state="failed", scanning=0, error=str(e), finished_at=time.time(), **counts)
+
+
+def _add(archive: zipfile.ZipFile, name: str, paths: Dict[str, str]) -> None:
+    for kind, path in paths.items():
+        archive.write(path, arcname=f"{name}/{os.path.basename(path)}")
@@ -0,0 +1,351 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import local_store
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("replica")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# Local mirror of the activities sheet. One worker per host at a time
+# (holder of the `sync` lease) pulls the whole sheet every SYNC_SECONDS;
+# every worker applies its own writes immediately. Rows written locally
+# after a sync started are kept, so a slow sync cannot undo them.
+DB_NAME = "replica.sqlite3"
+SYNC_SECONDS = 10.0
+LEASE_SECONDS = 60.0
+
+# JSON1 expressions over the payload; the indexes below use the same text,
+# so queries written with these constants can use them.
+SEKTOR = "json_extract(data, '$.halaman_awal.sektor')"
+TAHUN = "CAST(json_extract(data, '$.halaman_awal.tahun') AS TEXT)"
+JUDUL = "COALESCE(json_extract(data, '$.halaman_awal.judul'), json_extract(data, '$.judul'))"
+# last_saved is "YYYY-MM-DD HH:MM:SS" from the form, updated_at ISO ("...T..."):
+# one separator makes them compare in time order
+LAST_SAVED = "replace(COALESCE(json_extract(data, '$.last_saved'), updated_at), 'T', ' ')"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS activities (
+    activity_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL DEFAULT '{{}}',
+    local_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_activities_status ON activities (status);
+CREATE INDEX IF NOT EXISTS idx_activities_user ON activities (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_activities_sektor ON activities ({SEKTOR});
+CREATE INDEX IF NOT EXISTS idx_activities_tahun ON activities ({TAHUN});
+DROP INDEX IF EXISTS idx_activities_last_saved;
+CREATE INDEX IF NOT EXISTS idx_activities_last_saved_ts ON activities ({LAST_SAVED});
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    until REAL NOT NULL
+);
+"""
+
+SORT_COLUMNS = {"last_saved": LAST_SAVED, "updated_at": "updated_at", "judul": JUDUL, "tahun": TAHUN, "sektor": SEKTOR}
+
+_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_lock = threading.Lock()
+_daemon: Dict[str, Any] = {"thread": None}
+
+
+def _connect():
+    return local_store.connect(DB_NAME, SCHEMA)
+
+
+def _record(row) -> Dict[str, Any]:
+    return {
+        "activity_id": row["activity_id"],
+        "user_id": row["user_id"],
+        "status": row["status"],
+        "updated_at": row["updated_at"],
+        "data": json.loads(row["data"] or "{}"),
+    }
+
+
+def _summary(row) -> Dict[str, Any]:
+    return {k: row[k] for k in ("activity_id", "user_id", "status", "updated_at", "judul", "tahun", "sektor", "last_saved")}
+
+
+def _where(user_id=None, status=None, sektor=None, tahun=None) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    if user_id:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if sektor:
+        clauses.append(f"{SEKTOR} = ?")
+        params.append(sektor)
+    if tahun:
+        clauses.append(f"{TAHUN} = ?")
+        params.append(str(tahun))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+_SUMMARY_COLUMNS = (
+    f"activity_id, user_id, status, updated_at, {JUDUL} AS judul, "
+    f"json_extract(data, '$.halaman_awal.tahun') AS tahun, {SEKTOR} AS sektor, {LAST_SAVED} AS last_saved"
+)
+
+
+# -------------------------------------------------
+# Reads
+# -------------------------------------------------
+def summaries(status: Optional[str] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    where, params = _where(user_id=user_id, status=status)
+    conn = _connect()
+    try:
+        rows = conn.execute(f"SELECT {_SUMMARY_COLUMNS} FROM activities{where} ORDER BY rowid", params)
+        return [_summary(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def query(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    sektor: Optional[str] = None,
+    tahun: Optional[str] = None,
+    sort_by: str = "last_saved",
+    descending: bool = True,
+    page: int = 0,
+    page_size: int = 20,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Satu halaman ringkasan yang lolos filter, plus jumlah totalnya."""
+    where, params = _where(user_id, status, sektor, tahun)
+    order = SORT_COLUMNS.get(sort_by, LAST_SAVED)
+    direction = "DESC" if descending else "ASC"
+    conn = _connect()
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM activities{where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {_SUMMARY_COLUMNS} FROM activities{where} "
+            f"ORDER BY {order} {direction} LIMIT ? OFFSET ?",
+            params + [page_size, max(page, 0) * page_size],
+        )
+        return [_summary(r) for r in rows], total
+    finally:
+        conn.close()
+
+
+def records(status: Optional[str] = None, user_id: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    where, params = _where(user_id=user_id, status=status)
+    sql = f"SELECT * FROM activities{where} ORDER BY rowid"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    conn = _connect()
+    try:
+        return [_record(r) for r in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def get(activity_id: str) -> Optional[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM activities WHERE activity_id = ?", (activity_id,)).fetchone()
+        return _record(row) if row else None
+    finally:
+        conn.close()
+
+
+def counts() -> Dict[str, Dict[str, int]]:
+    """Jumlah per status / sektor / tahun / owner, format sama dengan aggregates.counts()."""
+    dims = {"status": "status", "sektor": SEKTOR, "tahun": TAHUN, "owner": "user_id"}
+    conn = _connect()
+    try:
+        out = {}
+        for dim, expr in dims.items():
+            rows = conn.execute(f"SELECT COALESCE({expr}, '') AS v, COUNT(*) AS n FROM activities GROUP BY v")
+            out[dim] = {r["v"]: r["n"] for r in rows}
+        return out
+    finally:
+        conn.close()
+
+
+# -------------------------------------------------
+# Writes
+# -------------------------------------------------
+def put(record: Dict[str, Any]) -> None:
+    """Terapkan tulisan lokal ke replika (langsung, tanpa menunggu sync)."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO activities (activity_id, user_id, status, updated_at, data, local_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (activity_id) DO UPDATE SET user_id = excluded.user_id, status = excluded.status, "
+            "updated_at = excluded.updated_at, data = excluded.data, local_at = excluded.local_at",
+            (
+                record["activity_id"], record.get("user_id"), record.get("status"), record.get("updated_at"),
+                json.dumps(record.get("data") or {}, ensure_ascii=False), time.time(),
+            ),
+        )
+    finally:
+        conn.close()
+
+
+def delete(activity_id: str) -> None:
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM activities WHERE activity_id = ?", (activity_id,))
+        # remember the delete so a sync that started earlier does not revive the row
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (f"deleted:{activity_id}", str(time.time())),
+        )
+    finally:
+        conn.close()
+
+
+# -------------------------------------------------
+# Sync
+# -------------------------------------------------
+def sync(loader: Callable[[], Iterable[Dict[str, Any]]]) -> int:
+    """Tarik seluruh sheet lewat `loader` dan samakan replika. Mengembalikan jumlah baris."""
+    started = time.time()
+    fetched = list(loader())
+
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        local = {
+            r["activity_id"]: r["local_at"]
+            for r in conn.execute("SELECT activity_id, local_at FROM activities")
+        }
+        deleted = {
+            r["key"].split(":", 1)[1]: float(r["value"])
+            for r in conn.execute("SELECT key, value FROM meta WHERE key LIKE 'deleted:%'")
+        }
+
+        seen = set()
+        for rec in fetched:
+            aid = rec.get("activity_id")
+            if not aid:
+                continue
+            seen.add(aid)
+            if local.get(aid, 0) > started or deleted.get(aid, 0) > started:
+                continue    # written here after this sync began
+            conn.execute(
+                "INSERT INTO activities (activity_id, user_id, status, updated_at, data, local_at) "
+                "VALUES (?, ?, ?, ?, ?, 0) "
+                "ON CONFLICT (activity_id) DO UPDATE SET user_id = excluded.user_id, status = excluded.status, "
+                "updated_at = excluded.updated_at, data = excluded.data, local_at = 0",
+                (aid, rec.get("user_id"), rec.get("status"), rec.get("updated_at"),
+                 json.dumps(rec.get("data") or {}, ensure_ascii=False)),
+            )
+
+        stale = [aid for aid, at in local.items() if aid not in seen and at <= started]
+        conn.executemany("DELETE FROM activities WHERE activity_id = ?", [(aid,) for aid in stale])
+        conn.execute("DELETE FROM meta WHERE key LIKE 'deleted:%' AND CAST(value AS REAL) <= ?", (started,))
+
+        finished = time.time()
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ("synced_at", str(started)),
+            ("sync_seconds", f"{finished - started:.3f}"),
+            ("rows", str(len(seen))),
+        ])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return len(seen)
+
+
+def last_synced() -> Optional[float]:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'synced_at'").fetchone()
+        return float(row["value"]) if row else None
+    finally:
+        conn.close()
+
+
+def status() -> Dict[str, Any]:
+    """Lag sync: umur data dari sheet (detik), durasi sync terakhir, jumlah baris."""
+    conn = _connect()
+    try:
+        meta = {r["key"]: r["value"] for r in conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('synced_at', 'sync_seconds', 'rows')"
+        )}
+    finally:
+        conn.close()
+    synced_at = float(meta["synced_at"]) if "synced_at" in meta else None
+    return {
+        "synced_at": synced_at,
+        "lag": time.time() - synced_at if synced_at else None,
+        "sync_seconds": float(meta.get("sync_seconds", 0) or 0),
+        "rows": int(meta.get("rows", 0) or 0),
+    }
+
+
+def _take_lease() -> bool:
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT owner, until FROM lease WHERE name = 'sync'").fetchone()
+        if row and row["owner"] != _OWNER and row["until"] > now:
+            conn.execute("COMMIT")
+            return False
+        conn.execute(
+            "INSERT OR REPLACE INTO lease (name, owner, until) VALUES ('sync', ?, ?)",
+            (_OWNER, now + LEASE_SECONDS),
+        )
+        conn.execute("COMMIT")
+        return True
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _run(loader: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+    while True:
+        try:
+            synced_at = last_synced()
+            due = synced_at is None or time.time() - synced_at >= SYNC_SECONDS
+            if due and _take_lease():
+                n = sync(loader)
+                logger.info(f"replica synced rows={n}")
+        except Exception:
+            logger.exception("replica sync failed")
+        time.sleep(SYNC_SECONDS / 2)
+
+
+def start(loader: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+    """Jalankan daemon sync (sekali per proses; hanya satu worker per host yang menarik data)."""
+    with _lock:
+        if _daemon["thread"] is not None:
+            return
+        thread = threading.Thread(target=_run, args=(loader,), name="replica-sync", daemon=True)
+        _daemon["thread"] = thread
+    thread.start()
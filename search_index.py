@@ -0,0 +1,362 @@
+from typing import Any, Dict, List, Optional, Tuple
+import functools
+import logging
+import math
+import re
+
+import local_store
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("search_index")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Store
+# -------------------------------------------------
+# Inverted index over the searchable text of every activity. Each activity
+# becomes several documents: the activity itself (judul, latar belakang,
+# tujuan), one per variable and one per indicator. `postings` holds the
+# weighted term frequency of every stemmed term per document; ranking is
+# BM25 over those frequencies. `words` keeps the unstemmed lowercase words
+# of every document for the search-as-you-type prefix: stems lose their
+# affixes ("pengeluaran" is stored as "eluar"), so a typed "pengel" has to
+# be matched against the words and only then mapped to their stems.
+#
+# A write only touches its own activity: the indexed text is fingerprinted,
+# a status-only change just updates `activities`, and changed text replaces
+# that activity's documents in one transaction (see local_store.ActivityStore).
+DB_NAME = "search.sqlite3"
+STORE_VERSION = "2"         # 2: words table, synced stamps
+
+# (section, field, weight) per document kind; the weight multiplies the
+# term frequency, so a hit in a name / title ranks above one in a definition
+KEGIATAN_FIELDS = [
+    ("halaman_awal", "judul", 3.0),
+    ("blok_1_3", "iii_latar_belakang_kegiatan", 1.0),
+    ("blok_1_3", "iii_tujuan_kegiatan", 1.0),
+]
+ITEM_FIELDS = {
+    "variables": ("variabel", "name", [("name", 3.0), ("concept", 1.0), ("definition", 1.0)]),
+    "indicators": ("indikator", "nama", [("nama", 3.0), ("konsep", 1.0), ("definisi", 1.0), ("interpretasi", 1.0)]),
+}
+KINDS = ["kegiatan", "variabel", "indikator"]
+SOURCE_SECTIONS = ["halaman_awal", "blok_1_3"] + list(ITEM_FIELDS)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MIN_PREFIX = 3      # the last query word also matches longer words from this length
+MAX_PREFIX_WORDS = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    activity_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT,
+    judul TEXT,
+    fingerprint TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER,
+    label TEXT,
+    length REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_activity ON docs (activity_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf REAL NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id);
+CREATE TABLE IF NOT EXISTS words (
+    word TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    PRIMARY KEY (word, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_words_doc ON words (doc_id);
+"""
+
+
+def _connect():
+    return _store.connect()
+
+
+# -------------------------------------------------
+# Indonesian text analysis
+# -------------------------------------------------
+# Light rule-based stemmer after Tala (2003): particles, possessive
+# pronouns, then prefixes and suffixes, always keeping at least two
+# syllables. It over- and under-stems a little, but queries go through
+# the same function, so "kemiskinan" and "miskin" still meet.
+STOPWORDS = frozenset("""
+ada adalah agar akan antara apa atas atau bagi bahwa banyak belum berupa
+bila dalam dan dapat dari dengan di dilakukan hal hanya harus ini itu jika
+juga kami karena ke kepada lain lebih maupun melalui menjadi merupakan
+mereka nya oleh pada para per sebagai secara sejak selain serta setiap
+sudah tahun telah terhadap tersebut tidak untuk yaitu yakni yang
+""".split())
+
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+_VOWELS = re.compile(r"[aeiou]")
+_PARTICLES = ("kah", "lah", "tah", "pun")
+_POSSESSIVES = ("nya", "ku", "mu")
+_SUFFIXES = ("kan", "an", "i")
+# prefix -> replacement (peny-/meny- drop an s: menyusun -> susun)
+_FIRST_PREFIXES = [
+    ("meng", ""), ("meny", "s"), ("men", ""), ("mem", ""), ("me", ""),
+    ("peng", ""), ("peny", "s"), ("pen", ""), ("pem", ""),
+    ("di", ""), ("ter", ""), ("ke", ""),
+]
+_SECOND_PREFIXES = [("ber", ""), ("bel", ""), ("be", ""), ("per", ""), ("pel", ""), ("pe", "")]
+
+
+def _syllables(word: str) -> int:
+    return len(_VOWELS.findall(word))
+
+
+def _strip_prefix(word: str, prefixes) -> Tuple[str, bool]:
+    for prefix, replacement in prefixes:
+        if word.startswith(prefix):
+            rest = replacement + word[len(prefix):]
+            if _syllables(rest) >= 2:
+                return rest, True
+    return word, False
+
+
+def _strip_suffix(word: str, suffixes) -> Tuple[str, bool]:
+    for suffix in suffixes:
+        if word.endswith(suffix):
+            rest = word[: -len(suffix)]
+            if _syllables(rest) >= 2:
+                return rest, True
+    return word, False
+
+
+@functools.lru_cache(maxsize=50_000)
+def stem(word: str) -> str:
+    """Kata dasar (kurang lebih) dari satu kata Indonesia berhuruf kecil."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    word, _ = _strip_suffix(word, _PARTICLES)
+    word, _ = _strip_suffix(word, _POSSESSIVES)
+    word, stripped = _strip_prefix(word, _FIRST_PREFIXES)
+    if stripped:
+        word, suffixed = _strip_suffix(word, _SUFFIXES)
+        if not suffixed:
+            word, _ = _strip_prefix(word, _SECOND_PREFIXES)
+    else:
+        word, stripped = _strip_prefix(word, _SECOND_PREFIXES)
+        word, _ = _strip_suffix(word, _SUFFIXES)
+    return word
+
+
+def words(text: Any) -> List[str]:
+    if text is None:
+        return []
+    return [w for w in _TOKEN.findall(str(text).lower()) if w not in STOPWORDS]
+
+
+def tokenize(text: Any) -> List[str]:
+    """Token yang diindeks: huruf kecil, tanpa stopword, sudah di-stem."""
+    return [stem(w) for w in words(text)]
+
+
+# -------------------------------------------------
+# Documents
+# -------------------------------------------------
+def _source(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Bagian payload yang diindeks saja."""
+    source: Dict[str, Any] = {}
+    for sec in ("halaman_awal", "blok_1_3"):
+        fields = [f for s, f, _ in KEGIATAN_FIELDS if s == sec]
+        values = data.get(sec)
+        if isinstance(values, dict):
+            source[sec] = {f: values[f] for f in fields if values.get(f)}
+    for sec, (_, _, fields) in ITEM_FIELDS.items():
+        items = data.get(sec)
+        if isinstance(items, list):
+            source[sec] = [
+                {f: item[f] for f, _ in fields if item.get(f)} if isinstance(item, dict) else {}
+                for item in items
+            ]
+    return source
+
+
+def _documents(source: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """(kind, position, label, {term: bobot}, kata asli) untuk setiap dokumen satu kegiatan."""
+    def weigh(pairs):
+        tf: Dict[str, float] = {}
+        raw = set()
+        for text, weight in pairs:
+            for word in words(text):
+                term = stem(word)
+                tf[term] = tf.get(term, 0.0) + weight
+                raw.add(word)
+        return tf, raw
+
+    judul = (source.get("halaman_awal") or {}).get("judul")
+    tf, raw = weigh(((source.get(sec) or {}).get(field), w) for sec, field, w in KEGIATAN_FIELDS)
+    docs = [{"kind": "kegiatan", "position": None, "label": judul, "tf": tf, "words": raw}]
+    for sec, (kind, label_field, fields) in ITEM_FIELDS.items():
+        for i, item in enumerate(source.get(sec) or []):
+            tf, raw = weigh((item.get(f), w) for f, w in fields)
+            docs.append({"kind": kind, "position": i, "label": item.get(label_field), "tf": tf, "words": raw})
+    return [d for d in docs if d["tf"]]
+
+
+def _replace_docs(conn, activity_id: str, source: Dict[str, Any]) -> None:
+    old = [r["doc_id"] for r in conn.execute("SELECT doc_id FROM docs WHERE activity_id = ?", (activity_id,))]
+    if old:
+        marks = ",".join("?" * len(old))
+        conn.execute(f"DELETE FROM postings WHERE doc_id IN ({marks})", old)
+        conn.execute(f"DELETE FROM words WHERE doc_id IN ({marks})", old)
+        conn.execute(f"DELETE FROM docs WHERE doc_id IN ({marks})", old)
+
+    for doc in _documents(source):
+        cur = conn.execute(
+            "INSERT INTO docs (activity_id, kind, position, label, length) VALUES (?, ?, ?, ?, ?)",
+            (activity_id, doc["kind"], doc["position"], doc["label"], sum(doc["tf"].values())),
+        )
+        conn.executemany(
+            "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+            [(term, cur.lastrowid, tf) for term, tf in doc["tf"].items()],
+        )
+        conn.executemany(
+            "INSERT INTO words (word, doc_id) VALUES (?, ?)",
+            [(word, cur.lastrowid) for word in doc["words"]],
+        )
+
+
+def _replace(conn, activity_id: str, status: Optional[str], source: Optional[Dict[str, Any]], old) -> None:
+    _replace_docs(conn, activity_id, source or {})
+
+
+def _columns(source: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+    columns = {"judul": (source.get("halaman_awal") or {}).get("judul")}
+    if user_id is not None:
+        # None (a partial patch) keeps the owner already indexed
+        columns["user_id"] = user_id
+    return columns
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+_store = local_store.ActivityStore(
+    DB_NAME, SCHEMA, STORE_VERSION, ["postings", "words", "docs"],
+    source=_source, replace=_replace, columns=_columns, logger=logger, label="search index",
+)
+indexed_source = _store.indexed_source
+put = _store.put
+set_status = _store.set_status
+remove = _store.remove
+last_rebuilt = _store.last_rebuilt
+last_synced = _store.last_synced
+synced = _store.synced
+mark_synced = _store.mark_synced
+rebuild = _store.rebuild
+
+
+def _query_terms(conn, query: str) -> Dict[str, float]:
+    """
+    term -> bobot kueri. Kata terakhir juga dicocokkan sebagai awalan
+    (ketik-sambil-cari) terhadap kata asli yang diindeks, lalu di-stem.
+    """
+    raw = words(query)
+    terms = {stem(w): 1.0 for w in raw}
+    if raw and len(raw[-1]) >= MIN_PREFIX:
+        prefix = raw[-1]
+        for row in conn.execute(
+            "SELECT DISTINCT word FROM words WHERE word >= ? AND word < ? LIMIT ?",
+            (prefix, prefix + "\uffff", MAX_PREFIX_WORDS),
+        ):
+            terms.setdefault(stem(row["word"]), 0.5)
+    return terms
+
+
+def search(
+    query: str,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    kinds: Optional[List[str]] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    Cari kegiatan, variabel dan indikator. Hasil diurutkan menurut skor
+    BM25; setiap hit memuat activity_id, kind, position (indeks di list
+    variables / indicators), label, judul, status, user_id dan score.
+    """
+    conn = _connect()
+    try:
+        terms = _query_terms(conn, query)
+        if not terms:
+            return []
+
+        stats = conn.execute("SELECT COUNT(*) AS n, AVG(length) AS avg FROM docs").fetchone()
+        n_docs, avg_length = stats["n"], stats["avg"] or 1.0
+
+        filters, params = [], []
+        if status:
+            filters.append("a.status = ?")
+            params.append(status)
+        if user_id:
+            filters.append("a.user_id = ?")
+            params.append(user_id)
+        if kinds:
+            filters.append(f"d.kind IN ({','.join('?' * len(kinds))})")
+            params.extend(kinds)
+        where = "".join(f" AND {f}" for f in filters)
+        join = " JOIN activities a ON a.activity_id = d.activity_id" if status or user_id else ""
+
+        scores: Dict[int, float] = {}
+        for term, weight in terms.items():
+            df = conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for row in conn.execute(
+                f"SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id{join} "
+                f"WHERE p.term = ?{where}",
+                (term, *params),
+            ):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * row["length"] / avg_length)
+                scores[row["doc_id"]] = scores.get(row["doc_id"], 0.0) + \
+                    weight * idf * row["tf"] * (BM25_K1 + 1) / (row["tf"] + norm)
+
+        best = sorted(scores.items(), key=lambda kv: -kv[1])[:limit]
+        if not best:
+            return []
+        rows = {
+            r["doc_id"]: r
+            for r in conn.execute(
+                "SELECT d.doc_id, d.activity_id, d.kind, d.position, d.label, a.judul, a.status, a.user_id "
+                "FROM docs d JOIN activities a ON a.activity_id = d.activity_id "
+                f"WHERE d.doc_id IN ({','.join('?' * len(best))})",
+                [doc_id for doc_id, _ in best],
+            )
+        }
+        return [
+            {
+                "activity_id": rows[doc_id]["activity_id"],
+                "kind": rows[doc_id]["kind"],
+                "position": rows[doc_id]["position"],
+                "label": rows[doc_id]["label"],
+                "judul": rows[doc_id]["judul"],
+                "status": rows[doc_id]["status"],
+                "user_id": rows[doc_id]["user_id"],
+                "score": round(score, 4),
+            }
+            for doc_id, score in best
+        ]
+    finally:
+        conn.close()
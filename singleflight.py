@@ -0,0 +1,68 @@
+from typing import Any, Callable, Dict, Hashable
+import threading
+
+# -------------------------------------------------
+# Single-flight: callers asking for the same key while a fetch is running
+# wait for that fetch and share its result instead of issuing their own.
+# -------------------------------------------------
+_lock = threading.Lock()
+_calls: Dict[Hashable, Dict[str, Any]] = {}
+_stats: Dict[str, Any] = {"fetches": 0, "merged": 0, "by_key": {}}
+
+
+def _count(key: Hashable, field: str) -> None:
+    # caller holds _lock
+    _stats[field] += 1
+    name = key[0] if isinstance(key, tuple) else key
+    per_key = _stats["by_key"].setdefault(str(name), {"fetches": 0, "merged": 0})
+    per_key[field] += 1
+
+
+def do(key: Hashable, fn: Callable[[], Any]) -> Any:
+    """
+    Run `fn` once per key at a time. The result (or exception) is handed to
+    every caller that joined while it was running, so it must not be
+    mutated by callers.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = {"done": threading.Event(), "result": None, "error": None}
+            _calls[key] = call
+            _count(key, "fetches")
+        else:
+            _count(key, "merged")
+
+    if not leader:
+        call["done"].wait()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    try:
+        call["result"] = fn()
+        return call["result"]
+    except BaseException as e:
+        call["error"] = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call["done"].set()
+
+
+def stats() -> Dict[str, Any]:
+    """Fetches issued vs callers merged into an in-flight fetch, total and per worksheet."""
+    with _lock:
+        return {
+            "fetches": _stats["fetches"],
+            "merged": _stats["merged"],
+            "inflight": len(_calls),
+            "by_key": {k: dict(v) for k, v in _stats["by_key"].items()},
+        }
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.update({"fetches": 0, "merged": 0, "by_key": {}})
@@ -0,0 +1,166 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------------------
+# Logger
+# -------------------------------------------------
+logger = logging.getLogger("swr_cache")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+# -------------------------------------------------
+# Settings
+# -------------------------------------------------
+FRESH_SECONDS = 5.0         # younger entries are served without a refresh
+MAX_AGE_SECONDS = 120.0     # default bound: older entries block on a fetch
+MAX_ENTRIES = 256
+PATCH_RETENTION = 300.0     # local patches kept for replay onto slow refreshes
+
+# Stale-while-revalidate: an entry younger than the caller's max_age is
+# returned at once; past FRESH_SECONDS a single background refresh is
+# started. Keys are tuples whose first item names the kind of list, so
+# local writes can be applied to every cached list of that kind.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="swr")
+_lock = threading.Lock()
+_entries: Dict[Hashable, Dict[str, Any]] = {}
+_patches: List[Dict[str, Any]] = []
+_seq = 0
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0, "patches": 0, "stale_on_error": 0}
+
+# returned by an update function when it cannot patch a value: the entry
+# is dropped and the next reader loads it again
+DROP = object()
+
+
+# -------------------------------------------------
+# Public API
+# -------------------------------------------------
+def get(key: Hashable, loader: Callable[[], Any], max_age: Optional[float] = None) -> Any:
+    """
+    Cached value for `key`, loading it with `loader` when missing or older
+    than `max_age` seconds. If that load fails, an older value is returned
+    rather than the error. The value is shared: callers must not mutate it.
+    """
+    max_age = MAX_AGE_SECONDS if max_age is None else max_age
+    with _lock:
+        entry = _entries.get(key)
+        age = time.time() - entry["fetched_at"] if entry else None
+        if entry is not None and age <= max_age:
+            if age > FRESH_SECONDS and not entry["refreshing"]:
+                entry["refreshing"] = True
+                _stats["stale_hits"] += 1
+                _executor.submit(_refresh, key, loader)
+            else:
+                _stats["hits"] += 1
+            return entry["value"]
+        _stats["misses"] += 1
+
+    try:
+        return _load(key, loader)
+    except Exception:
+        with _lock:
+            entry = _entries.get(key)
+            if entry is None:
+                raise
+            _stats["stale_on_error"] += 1
+        logger.warning(f"load failed, serving a {time.time() - entry['fetched_at']:.0f}s old value key={key}")
+        return entry["value"]
+
+
+def update(kind: str, fn: Callable[[Hashable, Any], Any]) -> None:
+    """
+    Apply a local write to every cached value of `kind`: fn(key, value)
+    returns the new value (without mutating the old one). The patch is
+    replayed onto refreshes that were already running, so a fetch started
+    before the write cannot bring the old state back.
+    """
+    global _seq
+    now = time.time()
+    with _lock:
+        _seq += 1
+        _patches.append({"seq": _seq, "at": now, "kind": kind, "fn": fn})
+        while _patches and now - _patches[0]["at"] > PATCH_RETENTION:
+            _patches.pop(0)
+
+        for key, entry in list(_entries.items()):
+            if _kind(key) != kind:
+                continue
+            value = _apply(fn, key, entry["value"])
+            if value is DROP:
+                del _entries[key]
+            else:
+                entry["value"] = value
+        _stats["patches"] += 1
+
+
+def invalidate(kind: Optional[str] = None) -> None:
+    """Drop all entries, or those of one kind; the next reader loads again."""
+    with _lock:
+        for key in [k for k in _entries if kind is None or _kind(k) == kind]:
+            del _entries[key]
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        now = time.time()
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "oldest_age": max((now - e["fetched_at"] for e in _entries.values()), default=None),
+        }
+
+
+# -------------------------------------------------
+# Internals
+# -------------------------------------------------
+def _kind(key: Hashable) -> Any:
+    return key[0] if isinstance(key, tuple) else key
+
+
+def _apply(fn, key, value):
+    try:
+        return fn(key, value)
+    except Exception:
+        logger.exception(f"cache patch failed key={key}")
+        return DROP
+
+
+def _load(key: Hashable, loader: Callable[[], Any]) -> Any:
+    with _lock:
+        started = _seq
+    value = loader()
+
+    with _lock:
+        # writes made while the fetch was running may be missing from it
+        for patch in _patches:
+            if patch["seq"] > started and patch["kind"] == _kind(key):
+                patched = _apply(patch["fn"], key, value)
+                if patched is DROP:
+                    _entries.pop(key, None)
+                    return value
+                value = patched
+
+        _entries[key] = {"value": value, "fetched_at": time.time(), "refreshing": False}
+        if len(_entries) > MAX_ENTRIES:
+            oldest = min(_entries, key=lambda k: _entries[k]["fetched_at"])
+            del _entries[oldest]
+    return value
+
+
+def _refresh(key: Hashable, loader: Callable[[], Any]) -> None:
+    try:
+        _load(key, loader)
+        with _lock:
+            _stats["refreshes"] += 1
+    except Exception:
+        logger.exception(f"background refresh failed key={key}")
+        with _lock:
+            _stats["refresh_errors"] += 1
+            if key in _entries:
+                _entries[key]["refreshing"] = False
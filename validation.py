@@ -0,0 +1,267 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import collections
+import datetime
+
+# -------------------------------------------------
+# Cross-field rules
+# -------------------------------------------------
+# Rules are plain data (RULES) compiled once at import into a check
+# function plus the "section.field" paths it reads. `evaluate` keeps the
+# values it saw last time in a state dict and only runs the rules that
+# read a field whose value changed, so the Form Page can call it after
+# every widget group on every rerun. Without a state every rule runs
+# (batch report, Verification page).
+#
+# severity "error" blocks Submit, "warning" is shown only.
+OTHER_OPTION = "Lainnya"
+
+SCHEDULE_STAGES = [
+    ("iii_jadwal_perencanaan_kegiatan", "Perencanaan Kegiatan"),
+    ("iii_jadwal_desain", "Desain"),
+    ("iii_jadwal_pengumpulan_data", "Pengumpulan Data"),
+    ("iii_jadwal_pengolahan_data", "Pengolahan Data"),
+    ("iii_jadwal_analisis", "Analisis"),
+    ("iii_jadwal_diseminasi_hasil", "Diseminasi Hasil"),
+    ("iii_jadwal_evaluasi", "Evaluasi"),
+]
+# multiselect field -> free text field used when "Lainnya" is picked
+OTHER_TEXT_FIELDS = [
+    ("blok_4", "metode_utama", "metode_lain", "4.6 Metode Pengumpulan Data"),
+    ("blok_4", "sarana_utama", "sarana_lain", "4.7 Sarana Pengumpulan Data"),
+    ("blok_4", "unit_utama", "unit_lain", "4.8 Unit Pengumpulan Data"),
+    ("blok_6_8", "qc_utama", "qc_lain", "6.2 Metode Pemeriksaan Kualitas"),
+    ("blok_6_8", "unit_analisis_utama", "unit_analisis_lain", "7.3 Unit Analisis"),
+    ("blok_6_8", "penyajian_utama", "penyajian_lain", "7.4 Tingkat Penyajian Hasil Analisis"),
+]
+RELEASE_FIELDS = [
+    ("viii_rencana_jadwal_rilis_produk_tercetak", "produk tercetak"),
+    ("viii_rencana_jadwal_rilis_produk_digital", "produk digital"),
+    ("viii_rencana_jadwal_rilis_produk_mikrodata", "data mikro"),
+]
+
+RULES: List[Dict[str, Any]] = [
+    {
+        "id": "rekomendasi_id",
+        "kind": "required_if",
+        "severity": "error",
+        "field": "halaman_awal.rekomendasi_id",
+        "when": "halaman_awal.rekomendasi",
+        "equals": "Ya",
+        "message": "ID Rekomendasi wajib diisi jika kegiatan ini adalah rekomendasi",
+    },
+    *[
+        {
+            "id": f"{text}_required",
+            "kind": "other_text",
+            "severity": "error",
+            "field": f"{section}.{text}",
+            "choices": f"{section}.{choices}",
+            "message": f"{label}: opsi '{OTHER_OPTION}' dipilih, sebutkan isiannya",
+        }
+        for section, choices, text, label in OTHER_TEXT_FIELDS
+    ],
+    {
+        "id": "enumerator_vs_supervisor",
+        "kind": "not_less",
+        "severity": "error",
+        "field": "blok_6_8.vi_jumlah_petugas_enumerator",
+        "than": "blok_6_8.vi_jumlah_petugas_supervisor",
+        "message": "Jumlah Pengumpul Data/Enumerator tidak boleh kurang dari jumlah Supervisor/Penyelia/Pengawas",
+    },
+    *[
+        {
+            "id": f"{stage}_range",
+            "kind": "date_order",
+            "severity": "error",
+            "field": f"blok_1_3.{stage}_end",
+            "start": f"blok_1_3.{stage}_start",
+            "message": f"3.3 {label}: tanggal selesai lebih awal dari tanggal mulai",
+        }
+        for stage, label in SCHEDULE_STAGES
+    ],
+    *[
+        {
+            "id": f"{field}_after_collection",
+            "kind": "date_order",
+            "severity": "warning",
+            "field": f"blok_6_8.{field}",
+            "start": "blok_1_3.iii_jadwal_pengumpulan_data_end",
+            "message": f"8.2 Rencana rilis {label} lebih awal dari selesainya pengumpulan data",
+        }
+        for field, label in RELEASE_FIELDS
+    ],
+]
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip()) or value == [] or value == ()
+
+
+def _as_date(value: Any) -> Optional[datetime.date]:
+    # widgets give date objects, stored payloads ISO strings
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return datetime.date.fromisoformat(value.strip()[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or _blank(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# kind -> (rule -> (paths read, check(values) -> failed?))
+def _required_if(rule):
+    return (rule["field"], rule["when"]), lambda v: v[rule["when"]] == rule["equals"] and _blank(v[rule["field"]])
+
+
+def _other_text(rule):
+    def check(v):
+        choices = v[rule["choices"]]
+        return isinstance(choices, (list, tuple)) and OTHER_OPTION in choices and _blank(v[rule["field"]])
+    return (rule["field"], rule["choices"]), check
+
+
+def _not_less(rule):
+    def check(v):
+        value, than = _as_number(v[rule["field"]]), _as_number(v[rule["than"]])
+        return value is not None and than is not None and value < than
+    return (rule["field"], rule["than"]), check
+
+
+def _date_order(rule):
+    def check(v):
+        start, end = _as_date(v[rule["start"]]), _as_date(v[rule["field"]])
+        return start is not None and end is not None and end < start
+    return (rule["field"], rule["start"]), check
+
+
+RULE_KINDS: Dict[str, Callable[[Dict[str, Any]], Tuple[Tuple[str, ...], Callable[[Dict[str, Any]], bool]]]] = {
+    "required_if": _required_if,
+    "other_text": _other_text,
+    "not_less": _not_less,
+    "date_order": _date_order,
+}
+
+
+def compile_rules(rules: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[str]]]:
+    """Ubah RULES jadi (rule id -> rule siap jalan, path field -> rule id yang membacanya)."""
+    compiled: Dict[str, Dict[str, Any]] = {}
+    readers: Dict[str, List[str]] = collections.defaultdict(list)
+    for rule in rules:
+        if rule["id"] in compiled:
+            raise ValueError(f"duplicate rule id {rule['id']!r}")
+        if rule["severity"] not in ("error", "warning"):
+            raise ValueError(f"rule {rule['id']!r}: unknown severity {rule['severity']!r}")
+        paths, check = RULE_KINDS[rule["kind"]](rule)
+        section, field = rule["field"].split(".", 1)
+        compiled[rule["id"]] = {**rule, "section": section, "field_name": field, "reads": paths, "check": check}
+        for path in paths:
+            readers[path].append(rule["id"])
+    return compiled, dict(readers)
+
+
+_COMPILED, _READERS = compile_rules(RULES)
+
+
+# -------------------------------------------------
+# Evaluation
+# -------------------------------------------------
+def _lookup(data: Dict[str, Any], path: str) -> Any:
+    section, field = path.split(".", 1)
+    values = data.get(section)
+    value = values.get(field) if isinstance(values, dict) else None
+    # lists are copied: the Form Page mutates its session lists in place
+    return tuple(value) if isinstance(value, list) else value
+
+
+def new_state() -> Dict[str, Any]:
+    return {"values": {}, "failed": {}, "runs": 0}
+
+
+def _problem(rule: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "rule": rule["id"],
+        "severity": rule["severity"],
+        "section": rule["section"],
+        "field": rule["field_name"],
+        "message": rule["message"],
+    }
+
+
+def evaluate(data: Dict[str, Any], state: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Jalankan rule lintas-field atas payload (atau section di session
+    state). Dengan `state` (dari new_state) hanya rule yang membaca field
+    yang berubah sejak panggilan sebelumnya yang dijalankan ulang.
+    Mengembalikan daftar masalah, error dulu.
+    """
+    state = state if state is not None else new_state()
+    values = {path: _lookup(data, path) for path in _READERS}
+    seen = state["values"]
+    if not seen:
+        due = set(_COMPILED)
+    else:
+        due = {rid for path, value in values.items() if seen.get(path) != value for rid in _READERS[path]}
+
+    for rid in due:
+        rule = _COMPILED[rid]
+        if rule["check"](values):
+            state["failed"][rid] = _problem(rule)
+        else:
+            state["failed"].pop(rid, None)
+    state["values"] = values
+    state["runs"] += len(due)
+    return sorted(state["failed"].values(), key=lambda p: (p["severity"] != "error", p["section"], p["rule"]))
+
+
+def errors(problems: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Masalah yang memblokir Submit."""
+    return [p for p in problems if p["severity"] == "error"]
+
+
+def report(records: Iterable[Dict[str, Any]], statuses: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Laporan kualitas data atas banyak kegiatan (mis. iter_activities()):
+    jumlah pelanggaran per rule dan daftar kegiatan yang bermasalah.
+    """
+    counts: Dict[str, int] = collections.Counter()
+    activities = []
+    checked = 0
+    for record in records:
+        if statuses and record.get("status") not in statuses:
+            continue
+        checked += 1
+        data = record.get("data") or {}
+        problems = evaluate(data)
+        if not problems:
+            continue
+        counts.update(p["rule"] for p in problems)
+        activities.append({
+            "activity_id": record.get("activity_id"),
+            "user_id": record.get("user_id"),
+            "status": record.get("status"),
+            "judul": (data.get("halaman_awal") or {}).get("judul"),
+            "errors": len(errors(problems)),
+            "warnings": len(problems) - len(errors(problems)),
+            "problems": problems,
+        })
+    activities.sort(key=lambda a: (-a["errors"], -a["warnings"], str(a["judul"] or "")))
+    return {
+        "checked": checked,
+        "rules": [
+            {"rule": rid, "severity": _COMPILED[rid]["severity"], "message": _COMPILED[rid]["message"], "count": n}
+            for rid, n in counts.most_common()
+        ],
+        "activities": activities,
+    }